@@ -0,0 +1,123 @@
+"""
+Build the ICD-10 code table and the disease-name index from their sources.
+
+The generated files (ICD10_TABLE_PATH, ICD10_INDEX_PATH) are not kept in
+the repository: the Docker image builds them, and a local checkout runs
+this once. Sources, by priority (the first name given for a code wins):
+    app/data/icd10_kcd.tsv  codes KCD still uses that neither release has
+    WHO ICD-10 2019         which Korean KCD codes follow
+    ICD-10-CM (April 2026)  6 and 7 character codes
+The WHO and CM releases come from the simple_icd_10 and simple_icd_10_cm
+packages, downloaded from PyPI at the pinned URLs below and checked
+against their SHA-256 digests before use.
+
+ICD-10-CM is a US government work in the public domain. WHO ICD-10 titles
+are copyright of the World Health Organization, which is why they are not
+committed here; whoever builds and deploys an image with them is
+responsible for WHO's terms of use. --no-who builds from ICD-10-CM and the
+KCD file only (codes are then named after their ICD-10-CM titles).
+
+Run from the backend directory:
+    python -m app.commands.build_icd10
+    python -m app.commands.build_icd10 --no-who --cache-dir ~/.cache/icd10
+"""
+import os
+import sys
+import hashlib
+import argparse
+import tempfile
+import importlib
+import urllib.request
+from typing import List, NamedTuple, Tuple
+
+from app.utils.icd10 import ICD10_TABLE_PATH, build_table, read_source
+from app.utils.icd10_index import ICD10_INDEX_PATH, build_index
+
+ICD10_KCD_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "icd10_kcd.tsv")
+
+
+class Release(NamedTuple):
+    module: str
+    url: str
+    sha256: str
+
+
+WHO_RELEASE = Release(
+    "simple_icd_10",
+    "https://files.pythonhosted.org/packages/e9/eb/6dad1294d683f66ac174fc148e307c0cc0b39cf41421357fef068494d41a/"
+    "simple_icd_10-2.1.1-py3-none-any.whl",
+    "2a96844b7ebf92d684f23b0b70813e5acd262c254672739b5a2637e1b372b9e8",
+)
+CM_RELEASE = Release(
+    "simple_icd_10_cm",
+    "https://files.pythonhosted.org/packages/64/a5/588ca7abe3afff6f7374604e36a230819a68f5a6546b0037322f41f1fd54/"
+    "simple_icd_10_cm-1.5.0-py3-none-any.whl",
+    "6d461d71dc26aedc530ae65f02cfb578a154e49507c32e8241e75f701d4b7e42",
+)
+
+
+def fetch(release: Release, cache_dir: str) -> str:
+    """
+    Download a release into the cache directory unless it is already there,
+    and check its digest.
+
+    Returns:
+        Path of the downloaded file
+
+    Raises:
+        ValueError: If the file does not match the pinned digest
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, release.url.rsplit("/", 1)[1])
+    if not os.path.exists(path):
+        print(f"Downloading {release.url}")
+        temporary = f"{path}.{os.getpid()}.tmp"
+        urllib.request.urlretrieve(release.url, temporary)
+        os.replace(temporary, path)
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    if digest.hexdigest() != release.sha256:
+        os.unlink(path)
+        raise ValueError(f"{path} does not match its pinned SHA-256 digest")
+    return path
+
+
+def read_release(release: Release, cache_dir: str) -> List[Tuple[str, str]]:
+    """(code, name) of every category and subcategory in a release, imported straight from its wheel."""
+    sys.path.insert(0, fetch(release, cache_dir))
+    module = importlib.import_module(release.module)
+    return [
+        (code, module.get_description(code))
+        for code in module.get_all_codes(True)
+        if module.is_category_or_subcategory(code)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cache-dir", default=os.path.join(tempfile.gettempdir(), "icd10-sources"),
+                        help="Where downloaded releases are kept")
+    parser.add_argument("--no-who", action="store_true", help="Leave out the WHO ICD-10 titles")
+    args = parser.parse_args()
+
+    entries = read_source(ICD10_KCD_PATH)
+    if not args.no_who:
+        entries += read_release(WHO_RELEASE, args.cache_dir)
+    entries += read_release(CM_RELEASE, args.cache_dir)
+
+    temporary = f"{ICD10_TABLE_PATH}.{os.getpid()}.tmp"
+    count = build_table(entries, temporary)
+    os.replace(temporary, ICD10_TABLE_PATH)
+    print(f"Wrote {count:,} codes to {ICD10_TABLE_PATH} ({os.path.getsize(ICD10_TABLE_PATH):,} bytes)")
+
+    index = build_index()
+    index.save(ICD10_INDEX_PATH, index.fingerprint)
+    print(f"Wrote {len(index):,} names to {ICD10_INDEX_PATH} ({os.path.getsize(ICD10_INDEX_PATH):,} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
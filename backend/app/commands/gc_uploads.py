@@ -0,0 +1,46 @@
+"""
+Delete uploads that no report, profile picture or extraction job refers to.
+
+Runs one pass of the collector the app runs in the background every
+UPLOAD_GC_INTERVAL seconds (see app/services/upload_gc_service.py). Files
+younger than the grace period are kept, since an extraction's image is only
+referenced once the report is saved.
+
+Run from the backend directory:
+    python -m app.commands.gc_uploads --dry-run
+    python -m app.commands.gc_uploads --grace-period 3600 --rate 500
+"""
+import sys
+import asyncio
+import argparse
+
+from app.services.upload_gc_service import (
+    UPLOAD_GC_DELETE_RATE,
+    UPLOAD_GC_GRACE_PERIOD,
+    collect_orphaned_uploads,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grace-period", type=float, default=UPLOAD_GC_GRACE_PERIOD,
+                        help="Minimum age in seconds of a deleted file")
+    parser.add_argument("--rate", type=int, default=UPLOAD_GC_DELETE_RATE, help="Maximum files deleted per second")
+    parser.add_argument("--dry-run", action="store_true", help="Count orphans without deleting them")
+    args = parser.parse_args()
+
+    stats = asyncio.run(collect_orphaned_uploads(args.grace_period, args.rate, args.dry_run))
+    if stats is None:
+        print("Another process is already collecting uploads")
+        return 1
+
+    print(
+        f"{stats['scanned']:,} files scanned, {stats['orphaned']:,} orphaned, "
+        f"{stats['deleted']:,} deleted, {stats['reclaimed_bytes'] / (1024 * 1024):,.1f} MB "
+        f"{'reclaimable' if args.dry_run else 'reclaimed'}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
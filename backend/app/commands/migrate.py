@@ -0,0 +1,59 @@
+"""
+Apply pending database migrations.
+
+Safe to run while the app is up and from several places at once: migrating
+takes an advisory lock, and each migration is recorded in schema_version as
+soon as it is applied. Deploys that set DB_MIGRATE_ON_STARTUP=false run this
+before starting the new code.
+
+Run from the backend directory:
+    python -m app.commands.migrate --status
+    python -m app.commands.migrate
+"""
+import sys
+import argparse
+
+from app.database import engine
+from app.migrations.runner import (
+    DB_MIGRATION_LOCK_TIMEOUT,
+    LATEST_VERSION,
+    MigrationLockTimeout,
+    get_schema_version,
+    migrate,
+    pending_migrations,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="Show the schema version and pending migrations")
+    parser.add_argument("--target", type=int, help=f"Version to migrate to (default: latest, {LATEST_VERSION})")
+    parser.add_argument("--lock-timeout", type=int, default=DB_MIGRATION_LOCK_TIMEOUT,
+                        help="Seconds to wait for another process to finish migrating")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        current = get_schema_version(conn)
+    pending = pending_migrations(current, args.target)
+
+    if args.status:
+        print(f"Schema version {current}, latest {LATEST_VERSION}")
+        for migration in pending:
+            print(f"  pending {migration.version}: {migration.name}")
+        return 0
+
+    if not pending:
+        print(f"Schema is up to date (version {current})")
+        return 0
+
+    try:
+        current = migrate(args.target, args.lock_timeout)
+    except MigrationLockTimeout as e:
+        print(e)
+        return 1
+    print(f"Schema migrated to version {current}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Move uploads saved before the content-addressed store into it.
+
+Older uploads were saved flat, as uploads/reports/report_<user>_<time>_<id>.jpg
+and uploads/members/member_<user>_<time>_<id>.jpg. Each flat file is hashed,
+linked into the store under its content address (identical files collapse
+into one blob), the rows referring to it are pointed at the new URL, and
+only then is the flat file removed. Interrupting the command leaves every
+URL working; rerunning it picks up where it stopped.
+
+Run from the backend directory:
+    python -m app.commands.migrate_uploads --dry-run
+    python -m app.commands.migrate_uploads
+"""
+import os
+import sys
+import shutil
+import hashlib
+import argparse
+from pathlib import Path
+
+from sqlalchemy import update
+
+from app.database import engine
+from app.models.extraction_job import ExtractionJob
+from app.models.report import Report
+from app.models.user import User
+from app.services.file_service import (
+    MEMBERS_DIR,
+    REPORTS_DIR,
+    PARTIAL_SUFFIX,
+    UPLOAD_CHUNK_SIZE,
+    blob_path,
+    detect_image_type,
+    upload_url,
+)
+
+REFERENCES = (
+    (Report.__table__, "image_url"),
+    (User.__table__, "picture_url"),
+    (ExtractionJob.__table__, "image_url"),
+)
+
+
+def hash_file(filepath: Path) -> str:
+    """SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def migrate_file(filepath: Path, directory: Path, dry_run: bool = False) -> bool:
+    """
+    Move one flat upload into the store and repoint the rows referring to it.
+
+    Args:
+        filepath: The flat file
+        directory: Upload directory it belongs to
+        dry_run: Only report what would be done
+
+    Returns:
+        True if the file was a new blob, False if its content was already stored
+    """
+    with open(filepath, "rb") as f:
+        extension = detect_image_type(f.read(16)) or filepath.suffix.lower() or ".jpg"
+    target = blob_path(directory, hash_file(filepath), extension)
+    is_new = not target.exists()
+    old_url, new_url = upload_url(filepath), upload_url(target)
+    print(f"{old_url} -> {new_url}{'' if is_new else ' (duplicate)'}")
+    if dry_run:
+        return is_new
+
+    if is_new:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(filepath, target)
+        except OSError:
+            shutil.copy2(filepath, target)
+
+    with engine.begin() as conn:
+        for table, column in REFERENCES:
+            conn.execute(update(table).where(table.c[column] == old_url).values({column: new_url}))
+
+    filepath.unlink()
+    return is_new
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="List the moves without making them")
+    args = parser.parse_args()
+
+    moved = duplicates = 0
+    for directory in (REPORTS_DIR, MEMBERS_DIR):
+        if not directory.exists():
+            continue
+        # Flat uploads sit directly in the directory; blobs are two shard levels down
+        for entry in os.scandir(directory):
+            if not entry.is_file() or entry.name.endswith(PARTIAL_SUFFIX):
+                continue
+            if migrate_file(Path(entry.path), directory, args.dry_run):
+                moved += 1
+            else:
+                duplicates += 1
+
+    print(f"{moved} files {'to move' if args.dry_run else 'moved'}, {duplicates} duplicates {'to drop' if args.dry_run else 'dropped'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
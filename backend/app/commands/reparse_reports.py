@@ -0,0 +1,245 @@
+"""
+Re-run the parser and ICD-10 validation over stored reports.
+
+Reports are read in primary-key order through a server-side cursor, one
+batch at a time, so memory use does not grow with the table. Each batch
+is parsed in a process pool and only the fields that changed are written
+back, with one executemany UPDATE per set of changed columns. After every
+committed batch the last report ID is saved to the checkpoint file, and a
+rerun with the same file resumes after it.
+
+Modes:
+    parse     - re-run parse_icd_codes on full_description
+    validate  - normalize the spelling of disease_icd_code; a value that is
+                not shaped like a code is replaced by the code found from
+                disease_name (well-formed codes the table lacks are kept)
+    both      - parse, then validate whatever the parser left unchanged
+
+Parsed values only replace stored ones when the parser finds a value, so
+fields entered by hand are kept when the description does not mention
+them. report_type is only rewritten when listed in --fields.
+
+Run from the backend directory:
+    python -m app.commands.reparse_reports --dry-run
+    python -m app.commands.reparse_reports --mode both --checkpoint reparse.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, select, update
+
+from app.database import engine
+from app.models.report import Report
+from app.utils.icd10 import normalize_icd_code
+from app.utils.icd10_index import infer_icd_code
+from app.utils.icd_parser import parse_icd_codes
+
+MODES = ("parse", "validate", "both")
+PARSED_FIELDS = ("report_type", "disease_name", "disease_icd_code", "medicine_name")
+DEFAULT_FIELDS = ("disease_name", "disease_icd_code", "medicine_name")
+
+# Column lengths in the reports table; longer parsed values are cut to fit
+FIELD_LENGTHS = {"report_type": 50, "disease_name": 255, "disease_icd_code": 50, "medicine_name": 255}
+
+# A report as sent to the workers: (id, full_description, {field: stored value})
+ReportRow = Tuple[str, Optional[str], Dict[str, Optional[str]]]
+# Changes for one report: (id, {field: new value})
+ReportChange = Tuple[str, Dict[str, str]]
+
+
+def reparse_report(row: ReportRow, mode: str, fields: Sequence[str]) -> Optional[ReportChange]:
+    """
+    Compute the new field values of one report.
+
+    Args:
+        row: Report ID, full description and stored field values
+        mode: One of MODES
+        fields: Fields that may be rewritten
+
+    Returns:
+        (report ID, changed fields), or None if nothing changes
+    """
+    report_id, full_description, stored = row
+    values = dict(stored)
+
+    if mode in ("parse", "both") and full_description:
+        parsed = parse_icd_codes(full_description)
+        for field in fields:
+            if parsed[field]:
+                values[field] = parsed[field][:FIELD_LENGTHS[field]]
+
+    if mode in ("validate", "both") and "disease_icd_code" in fields and values["disease_icd_code"]:
+        code = values["disease_icd_code"]
+        values["disease_icd_code"] = normalize_icd_code(code) or infer_icd_code(values["disease_name"]) or code
+
+    changes = {field: values[field] for field in fields if values[field] != stored[field]}
+    if not changes:
+        return None
+    return report_id, changes
+
+
+def reparse_batch(rows: List[ReportRow], mode: str, fields: Sequence[str]) -> List[ReportChange]:
+    """Worker entry point: compute the changes of a batch of reports."""
+    changes = []
+    for row in rows:
+        change = reparse_report(row, mode, fields)
+        if change is not None:
+            changes.append(change)
+    return changes
+
+
+def read_batches(batch_size: int, after_id: Optional[str] = None) -> Iterator[List[ReportRow]]:
+    """
+    Stream reports in ID order through a server-side cursor.
+
+    Args:
+        batch_size: Reports per batch (also the cursor fetch size)
+        after_id: Resume after this report ID
+
+    Yields:
+        Lists of up to batch_size reports
+    """
+    columns = [Report.id, Report.full_description] + [getattr(Report, field) for field in PARSED_FIELDS]
+    query = select(*columns).order_by(Report.id)
+    if after_id:
+        query = query.where(Report.id > after_id)
+
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(query)
+        for partition in result.partitions():
+            yield [(row[0], row[1], dict(zip(PARSED_FIELDS, row[2:]))) for row in partition]
+
+
+def write_changes(changes: List[ReportChange]):
+    """Write changed fields back, one executemany UPDATE per set of changed columns."""
+    groups: Dict[Tuple[str, ...], List[Dict]] = {}
+    for report_id, fields in changes:
+        columns = tuple(sorted(fields))
+        groups.setdefault(columns, []).append({"report_id": report_id, **fields})
+
+    table = Report.__table__
+    with engine.begin() as conn:
+        for columns, rows in groups.items():
+            statement = (
+                update(table)
+                .where(table.c.id == bindparam("report_id"))
+                .values({column: bindparam(column) for column in columns})
+            )
+            conn.execute(statement, rows)
+
+
+def load_checkpoint(path: Optional[str]) -> Dict:
+    """Read the checkpoint file, or start from scratch if there is none."""
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"last_id": None, "scanned": 0, "updated": 0}
+
+
+def save_checkpoint(path: Optional[str], checkpoint: Dict):
+    """Write the checkpoint file atomically."""
+    if not path:
+        return
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(temporary, path)
+
+
+def run(
+    mode: str = "parse",
+    fields: Sequence[str] = DEFAULT_FIELDS,
+    batch_size: int = 1000,
+    workers: int = 0,
+    checkpoint_path: Optional[str] = None,
+    dry_run: bool = False,
+) -> Dict:
+    """
+    Re-parse every report after the checkpoint.
+
+    Args:
+        mode: One of MODES
+        fields: Fields that may be rewritten
+        batch_size: Reports read, parsed and written per batch
+        workers: Parser processes (0 parses in this process)
+        checkpoint_path: JSON file recording progress, for resuming
+        dry_run: Count changes without writing them or the checkpoint
+
+    Returns:
+        The final checkpoint: last_id, scanned, updated
+    """
+    checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint["last_id"]:
+        print(f"Resuming after report {checkpoint['last_id']} ({checkpoint['scanned']:,} already scanned)")
+
+    started = time.perf_counter()
+    scanned = updated = 0
+
+    def finish_batch(last_id: str, count: int, changes: List[ReportChange]):
+        nonlocal scanned, updated
+        if changes and not dry_run:
+            write_changes(changes)
+        scanned += count
+        updated += len(changes)
+        checkpoint.update(
+            last_id=last_id,
+            scanned=checkpoint["scanned"] + count,
+            updated=checkpoint["updated"] + len(changes),
+        )
+        if not dry_run:
+            save_checkpoint(checkpoint_path, checkpoint)
+        elapsed = time.perf_counter() - started
+        print(
+            f"{scanned:,} scanned, {updated:,} {'to update' if dry_run else 'updated'}, "
+            f"{scanned / elapsed:,.0f} reports/s, last id {last_id}",
+            flush=True,
+        )
+
+    batches = read_batches(batch_size, checkpoint["last_id"])
+    if workers <= 0:
+        for rows in batches:
+            finish_batch(rows[-1][0], len(rows), reparse_batch(rows, mode, fields))
+    else:
+        # Results are applied in submission order so the checkpoint only moves
+        # past batches that are written; a few batches are kept in flight to
+        # keep the workers busy without reading ahead of them.
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for rows in batches:
+                pending.append((rows[-1][0], len(rows), pool.submit(reparse_batch, rows, mode, list(fields))))
+                if len(pending) >= workers * 2:
+                    last_id, count, future = pending.popleft()
+                    finish_batch(last_id, count, future.result())
+            while pending:
+                last_id, count, future = pending.popleft()
+                finish_batch(last_id, count, future.result())
+
+    elapsed = time.perf_counter() - started
+    print(f"Done: {scanned:,} reports scanned, {updated:,} {'would change' if dry_run else 'updated'} in {elapsed:.1f}s")
+    return checkpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=MODES, default="parse")
+    parser.add_argument("--fields", nargs="+", choices=PARSED_FIELDS, default=list(DEFAULT_FIELDS),
+                        help="Fields that may be rewritten")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Parser processes (0 parses in the main process)")
+    parser.add_argument("--checkpoint", help="Progress file; rerunning with it resumes where the last run stopped")
+    parser.add_argument("--dry-run", action="store_true", help="Count changes without writing them")
+    args = parser.parse_args()
+
+    run(args.mode, args.fields, args.batch_size, args.workers, args.checkpoint, args.dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,7 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -15,8 +17,48 @@ DATABASE_URL = os.getenv(
     f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
 )
 
-engine = create_engine(DATABASE_URL)
+# Connection pool settings, per engine and per process
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds, below MySQL's wait_timeout
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# Async drivers for the request path
+ASYNC_DRIVERS = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+
+
+def _async_url(url: str) -> str:
+    """The async-driver form of a database URL (mysql+aiomysql, sqlite+aiosqlite)."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend} databases")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def _engine_options(url: str) -> dict:
+    """Pool settings for an engine; SQLite (local tests) keeps SQLAlchemy's default pool."""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+# Sync engine: startup, migrations, commands and services run in the thread pool
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine: request handlers, so queries never block the event loop.
+# Objects stay usable after commit; lazy loads are not available in async code.
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -29,20 +71,19 @@ def get_db():
         db.close()
 
 
-def init_db():
-    """Initialize database tables."""
-    # Import models to register them with Base.metadata
-    from app.models import User, Report  # noqa: F401
-    Base.metadata.create_all(bind=engine)
-    
-    # Run migrations
-    run_migrations()
+async def get_async_db():
+    """Dependency to get an async database session."""
+    async with AsyncSessionLocal() as db:
+        yield db
 
 
-def run_migrations():
-    """Run database migrations."""
-    try:
-        from app.migrations.add_report_type import migrate as add_report_type_migration
-        add_report_type_migration()
-    except Exception as e:
-        print(f"Migration error: {e}")
+def init_db():
+    """
+    Check the database schema is current, migrating it if allowed.
+    See app/migrations/runner.py.
+
+    Raises:
+        SchemaVersionError: If migrations are pending and DB_MIGRATE_ON_STARTUP is off
+    """
+    from app.migrations.runner import check_schema
+    check_schema()
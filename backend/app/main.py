@@ -1,13 +1,19 @@
-from pathlib import Path
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 from app.routers import users
 from app.routers import reports
-from app.database import init_db
+from app.routers import uploads
+from app.database import init_db, async_engine
 from app.services.file_service import ensure_directories
+from app.services.groq_client import close_client
+from app.services.image_service import shutdown_image_pool
+from app.services.job_service import start_workers, stop_workers
+from app.services.upload_gc_service import start_upload_gc, stop_upload_gc
+from app.services.groq_service import TRANSLATION_MODEL_NAME
+from app.services.cache_service import purge_expired_extractions, purge_stale_translations
+from app.utils.icd10_index import get_icd10_index
 
 # Load environment variables
 load_dotenv()
@@ -30,25 +36,51 @@ app.add_middleware(
 # Include routers
 app.include_router(users.router)
 app.include_router(reports.router)
+app.include_router(uploads.router)
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database tables and upload directories on startup."""
+    """Check the database schema and initialize upload directories on startup."""
+    # Not caught: serving requests against an outdated schema is worse than not starting
+    init_db()
+    print("Database schema is up to date")
+
     try:
-        init_db()
-        print("Database tables initialized successfully")
+        # Drop translation memory entries produced by a previous model
+        purged = purge_stale_translations(TRANSLATION_MODEL_NAME)
+        if purged:
+            print(f"Purged {purged} stale translation memory entries")
+
+        # Drop extraction results past their TTL (also done periodically by the job workers)
+        purged = purge_expired_extractions()
+        if purged:
+            print(f"Purged {purged} expired extraction cache entries")
     except Exception as e:
-        print(f"Error initializing database: {e}")
+        print(f"Error purging caches: {e}")
     
     # Create upload directories
     ensure_directories()
     print("Upload directories initialized")
     
-    # Mount static files for uploads
-    uploads_path = Path("/app/uploads")
-    if uploads_path.exists():
-        app.mount("/uploads", StaticFiles(directory=str(uploads_path)), name="uploads")
+    # Build the ICD-10 name index now rather than in the first request that needs it
+    get_icd10_index()
+    
+    # Start background extraction workers
+    start_workers()
+    
+    # Start the orphaned upload collector
+    start_upload_gc()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers and close pooled connections and worker pools on shutdown."""
+    await stop_workers()
+    await stop_upload_gc()
+    await close_client()
+    await async_engine.dispose()
+    shutdown_image_pool()
 
 
 @app.get("/health")
@@ -0,0 +1,21 @@
+"""
+Migration 9: Add token_hash column to extraction_jobs table
+
+Jobs are read back with a per-job token returned when they are queued;
+the column holds its SHA-256. Jobs queued before this migration have none
+and can no longer be read, which only affects results until they expire.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from app.migrations.helpers import column_exists
+
+
+def upgrade(conn: Connection):
+    """Add token_hash column if it doesn't exist."""
+    if column_exists(conn, "extraction_jobs", "token_hash"):
+        print("token_hash column already exists")
+        return
+
+    after = " AFTER status" if conn.dialect.name == "mysql" else ""
+    conn.execute(text(f"ALTER TABLE extraction_jobs ADD COLUMN token_hash VARCHAR(64) NULL{after}"))
+    print("Added token_hash column to extraction_jobs table")
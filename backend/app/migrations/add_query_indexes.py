@@ -0,0 +1,19 @@
+"""
+Migration 7: Index the report list and job cleanup queries
+
+GET /api/reports filters on user_id and sorts by created_at; with both in
+one index MySQL reads a user's reports in order instead of sorting them.
+The periodic job cleanup deletes finished jobs by status and finished_at.
+"""
+from sqlalchemy.engine import Connection
+from app.migrations.helpers import create_indexes
+
+INDEXES = (
+    ("reports", "ix_reports_user_id_created_at", ("user_id", "created_at")),
+    ("extraction_jobs", "ix_extraction_jobs_status_finished_at", ("status", "finished_at")),
+)
+
+
+def upgrade(conn: Connection):
+    """Add the query indexes if they don't exist."""
+    create_indexes(conn, INDEXES)
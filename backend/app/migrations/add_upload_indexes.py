@@ -0,0 +1,18 @@
+"""
+Migration 6: Index reports.image_url and users.picture_url
+
+Uploads are content-addressed and shared between rows, so a file is only
+deleted once no row refers to it; these indexes keep that lookup cheap.
+"""
+from sqlalchemy.engine import Connection
+from app.migrations.helpers import create_indexes
+
+INDEXES = (
+    ("reports", "ix_reports_image_url", ("image_url",)),
+    ("users", "ix_users_picture_url", ("picture_url",)),
+)
+
+
+def upgrade(conn: Connection):
+    """Add the upload reference indexes if they don't exist."""
+    create_indexes(conn, INDEXES)
@@ -0,0 +1,55 @@
+"""
+Migration 1: Create the users and reports tables
+
+The schema as it was before versioned migrations. The tables are defined
+here rather than taken from the models, so this migration creates the same
+tables however the models change later.
+"""
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, MetaData, String, Table, Text, func
+from sqlalchemy.engine import Connection
+from app.migrations.helpers import create_tables
+
+metadata = MetaData()
+
+Table(
+    "users",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True, autoincrement=True),
+    Column("google_id", String(255), unique=True, nullable=True),
+    Column("email", String(255), unique=True, nullable=False),
+    Column("name", String(255), nullable=True),
+    Column("picture_url", String(512), nullable=True),
+    Column("language", String(10), nullable=True),
+    Column("phone", String(50), nullable=True),
+    Column("nickname", String(100), nullable=True),
+    Column("birth_year", String(4), nullable=True),
+    Column("birth_month", String(2), nullable=True),
+    Column("birth_day", String(2), nullable=True),
+    Column("gender", String(20), nullable=True),
+    Column("visit_purpose", String(100), nullable=True),
+    Column("onboarding_completed", Boolean),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True)),
+)
+
+Table(
+    "reports",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("disease_name", String(255), nullable=True),
+    Column("disease_icd_code", String(50), nullable=True),
+    Column("medicine_name", String(255), nullable=True),
+    Column("full_description", Text, nullable=True),
+    Column("translated_text", Text, nullable=True),
+    Column("original_language", String(10), nullable=True),
+    Column("target_language", String(10), nullable=True),
+    Column("image_url", String(512), nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True)),
+)
+
+
+def upgrade(conn: Connection):
+    """Create the baseline tables if they don't exist."""
+    create_tables(conn, metadata)
@@ -0,0 +1,26 @@
+"""
+Migration 3: Create the extraction_cache table
+"""
+from sqlalchemy import Column, DateTime, MetaData, String, Table, Text, func
+from sqlalchemy.engine import Connection
+from app.migrations.helpers import create_tables
+
+metadata = MetaData()
+
+Table(
+    "extraction_cache",
+    metadata,
+    Column("image_hash", String(64), primary_key=True),
+    Column("model_name", String(255), nullable=False),
+    Column("report_type", String(50), nullable=True),
+    Column("disease_name", String(255), nullable=True),
+    Column("disease_icd_code", String(50), nullable=True),
+    Column("medicine_name", String(255), nullable=True),
+    Column("full_description", Text, nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+def upgrade(conn: Connection):
+    """Create the extraction_cache table if it doesn't exist."""
+    create_tables(conn, metadata)
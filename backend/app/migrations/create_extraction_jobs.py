@@ -0,0 +1,31 @@
+"""
+Migration 5: Create the extraction_jobs table
+"""
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, MetaData, String, Table, Text, func
+from sqlalchemy.engine import Connection
+from app.migrations.helpers import create_tables
+
+metadata = MetaData()
+
+Table(
+    "extraction_jobs",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("status", String(20), nullable=False),
+    Column("image_url", String(512), nullable=False),
+    Column("fields_only", Boolean, nullable=False),
+    Column("result", Text, nullable=True),
+    Column("error", Text, nullable=True),
+    Column("attempts", Integer, nullable=False),
+    Column("available_at", DateTime, nullable=False),
+    Column("locked_by", String(128), nullable=True),
+    Column("started_at", DateTime, nullable=True),
+    Column("finished_at", DateTime, nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Index("ix_extraction_jobs_status_available_at", "status", "available_at"),
+)
+
+
+def upgrade(conn: Connection):
+    """Create the extraction_jobs table if it doesn't exist."""
+    create_tables(conn, metadata)
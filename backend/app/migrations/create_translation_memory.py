@@ -0,0 +1,24 @@
+"""
+Migration 4: Create the translation_memory table
+"""
+from sqlalchemy import Column, DateTime, MetaData, String, Table, Text, func
+from sqlalchemy.engine import Connection
+from app.migrations.helpers import create_tables
+
+metadata = MetaData()
+
+Table(
+    "translation_memory",
+    metadata,
+    Column("text_hash", String(64), primary_key=True),
+    Column("source_language", String(10), primary_key=True),
+    Column("target_language", String(10), primary_key=True),
+    Column("model_name", String(255), primary_key=True, index=True),
+    Column("translated_text", Text, nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+def upgrade(conn: Connection):
+    """Create the translation_memory table if it doesn't exist."""
+    create_tables(conn, metadata)
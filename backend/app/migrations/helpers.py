@@ -0,0 +1,47 @@
+"""
+Schema checks shared by the migrations.
+
+Databases created before the version table already have some of the
+tables, columns and indexes that migrations 1-7 add, so those migrations
+check before they change anything. The checks go through SQLAlchemy's
+inspector, which looks in the connection's own schema and works on SQLite.
+"""
+from typing import Iterable, Tuple
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.engine import Connection
+
+# (table, index name, indexed columns)
+IndexSpec = Tuple[str, str, Tuple[str, ...]]
+
+
+def column_exists(conn: Connection, table: str, column: str) -> bool:
+    """Whether a table has a column."""
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def index_exists(conn: Connection, table: str, index: str) -> bool:
+    """Whether a table has an index (unique or not) of this name."""
+    inspector = inspect(conn)
+    names = {i["name"] for i in inspector.get_indexes(table)}
+    names.update(c["name"] for c in inspector.get_unique_constraints(table))
+    return index in names
+
+
+def create_tables(conn: Connection, metadata: MetaData):
+    """Create the tables of a migration's metadata that don't exist yet."""
+    for table in metadata.sorted_tables:
+        if inspect(conn).has_table(table.name):
+            print(f"{table.name} table already exists")
+            continue
+        table.create(conn)
+        print(f"Created {table.name} table")
+
+
+def create_indexes(conn: Connection, indexes: Iterable[IndexSpec]):
+    """Create the indexes that don't exist yet."""
+    for table, index, columns in indexes:
+        if index_exists(conn, table, index):
+            print(f"{index} index already exists")
+            continue
+        conn.execute(text(f"CREATE INDEX {index} ON {table} ({', '.join(columns)})"))
+        print(f"Added {index} index to {table} table")
@@ -0,0 +1,34 @@
+"""
+Migration 8: Key extraction_cache by image and pipeline
+
+The table was keyed by image_hash alone, so results from different
+extraction pipelines overwrote each other. It only holds results that can
+be extracted again, so it is dropped and recreated with the composite key
+rather than rewritten, which also discards rows older than any expiry.
+The created_at index serves the purge of expired rows.
+"""
+from sqlalchemy import Column, DateTime, Index, MetaData, String, Table, Text, func
+from sqlalchemy.engine import Connection
+
+metadata = MetaData()
+
+extraction_cache = Table(
+    "extraction_cache",
+    metadata,
+    Column("image_hash", String(64), primary_key=True),
+    Column("model_name", String(255), primary_key=True),
+    Column("report_type", String(50), nullable=True),
+    Column("disease_name", String(255), nullable=True),
+    Column("disease_icd_code", String(50), nullable=True),
+    Column("medicine_name", String(255), nullable=True),
+    Column("full_description", Text, nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Index("ix_extraction_cache_created_at", "created_at"),
+)
+
+
+def upgrade(conn: Connection):
+    """Recreate extraction_cache with the (image_hash, model_name) key."""
+    extraction_cache.drop(conn, checkfirst=True)
+    extraction_cache.create(conn)
+    print("Recreated extraction_cache table")
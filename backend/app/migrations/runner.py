@@ -0,0 +1,177 @@
+"""
+Versioned migrations.
+
+Applied migrations are recorded in the schema_version table, one row per
+version. Migrating takes a database-wide advisory lock (MySQL GET_LOCK), so
+when several workers start at once one of them applies the pending
+migrations and the others wait, then find nothing left to do. Once the
+schema is current, startup costs a single version query.
+
+Add a migration by writing a module with an upgrade(conn) function and
+appending it to MIGRATIONS with the next version number. A migration spells
+out the tables and columns it adds instead of using the models, so it does
+the same thing whenever it runs. Never change, renumber or remove one.
+"""
+import os
+from contextlib import contextmanager
+from typing import Callable, List, NamedTuple, Optional
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, insert, select, text
+from sqlalchemy.engine import Connection
+
+from app.database import engine
+from app.migrations import (
+    add_job_token,
+    add_query_indexes,
+    add_report_type,
+    add_upload_indexes,
+    create_baseline_tables,
+    create_extraction_cache,
+    create_extraction_jobs,
+    create_translation_memory,
+    rekey_extraction_cache,
+)
+
+# Apply pending migrations on app startup. Turn off where deploys run
+# `python -m app.commands.migrate` first; startup then only checks the version.
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "true").lower() == "true"
+# Seconds to wait for another process to finish migrating
+DB_MIGRATION_LOCK_TIMEOUT = int(os.getenv("DB_MIGRATION_LOCK_TIMEOUT", "300"))
+
+MIGRATION_LOCK_NAME = "schema_migrations"
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+
+MIGRATIONS = (
+    Migration(1, "create baseline tables", create_baseline_tables.upgrade),
+    Migration(2, "add report_type", add_report_type.upgrade),
+    Migration(3, "create extraction_cache", create_extraction_cache.upgrade),
+    Migration(4, "create translation_memory", create_translation_memory.upgrade),
+    Migration(5, "create extraction_jobs", create_extraction_jobs.upgrade),
+    Migration(6, "add upload indexes", add_upload_indexes.upgrade),
+    Migration(7, "add query indexes", add_query_indexes.upgrade),
+    Migration(8, "rekey extraction_cache", rekey_extraction_cache.upgrade),
+    Migration(9, "add extraction_jobs token_hash", add_job_token.upgrade),
+)
+LATEST_VERSION = MIGRATIONS[-1].version
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+class SchemaVersionError(RuntimeError):
+    """The database schema is not at the version this code expects."""
+
+
+class MigrationLockTimeout(RuntimeError):
+    """Another process held the migration lock for longer than the timeout."""
+
+
+def get_schema_version(conn: Connection) -> int:
+    """Highest applied migration version; 0 for a database that has none."""
+    if not inspect(conn).has_table(schema_version.name):
+        return 0
+    return conn.scalar(select(func.max(schema_version.c.version))) or 0
+
+
+@contextmanager
+def migration_lock(conn: Connection, timeout: int = DB_MIGRATION_LOCK_TIMEOUT):
+    """
+    Hold the migration advisory lock on this connection.
+    The lock belongs to the MySQL session, so it survives the commits (and
+    the implicit commits of DDL) made while migrating. SQLite, used for
+    local runs, has no advisory locks and is migrated unlocked.
+
+    Raises:
+        MigrationLockTimeout: If the lock is not free within `timeout` seconds
+    """
+    if conn.dialect.name != "mysql":
+        yield
+        return
+
+    acquired = conn.scalar(text("SELECT GET_LOCK(:name, :timeout)"), {"name": MIGRATION_LOCK_NAME, "timeout": timeout})
+    conn.commit()
+    if acquired != 1:
+        raise MigrationLockTimeout(f"Another process held the migration lock for over {timeout}s")
+    try:
+        yield
+    finally:
+        conn.scalar(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK_NAME})
+        conn.commit()
+
+
+def pending_migrations(current: int, target: Optional[int] = None) -> List[Migration]:
+    """Migrations after `current`, up to and including `target` (default: all)."""
+    target = LATEST_VERSION if target is None else target
+    return [m for m in MIGRATIONS if current < m.version <= target]
+
+
+def migrate(target: Optional[int] = None, lock_timeout: int = DB_MIGRATION_LOCK_TIMEOUT) -> int:
+    """
+    Apply pending migrations in order, each recorded as soon as it succeeds.
+    The version is re-read under the lock, so a process that waited for
+    another one to migrate applies nothing.
+
+    Args:
+        target: Version to migrate to (default: the latest)
+        lock_timeout: Seconds to wait for the migration lock
+
+    Returns:
+        Schema version afterwards
+
+    Raises:
+        MigrationLockTimeout: If another process kept the lock too long
+    """
+    with engine.connect() as conn:
+        with migration_lock(conn, lock_timeout):
+            schema_version.create(conn, checkfirst=True)
+            conn.commit()
+
+            current = get_schema_version(conn)
+            conn.commit()
+            for migration in pending_migrations(current, target):
+                print(f"Applying migration {migration.version}: {migration.name}")
+                try:
+                    migration.upgrade(conn)
+                    conn.execute(insert(schema_version).values(version=migration.version, name=migration.name))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                current = migration.version
+    return current
+
+
+def check_schema():
+    """
+    Make sure the schema is current (called on app startup).
+    Costs one version query when it is. Otherwise applies the pending
+    migrations if DB_MIGRATE_ON_STARTUP is set.
+
+    Raises:
+        SchemaVersionError: If migrations are pending and DB_MIGRATE_ON_STARTUP is off
+    """
+    with engine.connect() as conn:
+        current = get_schema_version(conn)
+
+    if current > LATEST_VERSION:
+        print(f"Database schema version {current} is newer than this code ({LATEST_VERSION})")
+        return
+    if current == LATEST_VERSION:
+        return
+    if not DB_MIGRATE_ON_STARTUP:
+        raise SchemaVersionError(
+            f"Database schema is at version {current}, expected {LATEST_VERSION}; "
+            "run `python -m app.commands.migrate`"
+        )
+    current = migrate()
+    print(f"Database schema migrated to version {current}")
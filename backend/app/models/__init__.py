@@ -1,4 +1,7 @@
 from app.models.user import User
 from app.models.report import Report
+from app.models.extraction_cache import ExtractionCache
+from app.models.translation_memory import TranslationMemory
+from app.models.extraction_job import ExtractionJob
 
-__all__ = ["User", "Report"]
+__all__ = ["User", "Report", "ExtractionCache", "TranslationMemory", "ExtractionJob"]
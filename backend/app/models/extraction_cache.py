@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, DateTime, Text, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class ExtractionCache(Base):
+    __tablename__ = "extraction_cache"
+    __table_args__ = (
+        Index("ix_extraction_cache_created_at", "created_at"),
+    )
+
+    # SHA-256 hex digest of the normalized image bytes, and the pipeline that read it
+    image_hash = Column(String(64), primary_key=True)
+    model_name = Column(String(255), primary_key=True)
+
+    # Cached parse_icd_codes output
+    report_type = Column(String(50), nullable=True)
+    disease_name = Column(String(255), nullable=True)
+    disease_icd_code = Column(String(50), nullable=True)
+    medicine_name = Column(String(255), nullable=True)
+    full_description = Column(Text, nullable=True)
+
+    # Timestamps (naive UTC, set by the cache service; rows expire after EXTRACTION_CACHE_TTL)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,43 @@
+from sqlalchemy import Column, String, DateTime, Text, Integer, Boolean, Index
+from sqlalchemy.sql import func
+from app.database import Base
+import uuid
+import enum
+
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class ExtractionJob(Base):
+    __tablename__ = "extraction_jobs"
+    __table_args__ = (
+        Index("ix_extraction_jobs_status_available_at", "status", "available_at"),
+        Index("ix_extraction_jobs_status_finished_at", "status", "finished_at"),
+    )
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    status = Column(String(20), default=JobStatus.QUEUED.value, nullable=False)
+    # SHA-256 of the token returned when the job was queued; reading the job requires it
+    token_hash = Column(String(64), nullable=True)
+
+    # Job input
+    image_url = Column(String(512), nullable=False)
+    fields_only = Column(Boolean, default=False, nullable=False)
+
+    # Job output (result is a JSON-encoded ExtractedReport)
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+
+    # Scheduling (naive UTC, set by the job service)
+    attempts = Column(Integer, default=0, nullable=False)
+    available_at = Column(DateTime, nullable=False)
+    locked_by = Column(String(128), nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Integer, Enum
+from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Integer, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -14,6 +14,9 @@ class ReportType(str, enum.Enum):
 
 class Report(Base):
     __tablename__ = "reports"
+    __table_args__ = (
+        Index("ix_reports_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -33,7 +36,7 @@ class Report(Base):
     target_language = Column(String(10), nullable=True)
     
     # Image URL (if stored)
-    image_url = Column(String(512), nullable=True)
+    image_url = Column(String(512), nullable=True, index=True)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, DateTime, Text
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class TranslationMemory(Base):
+    __tablename__ = "translation_memory"
+
+    # SHA-256 hex digest of the source text
+    text_hash = Column(String(64), primary_key=True)
+    source_language = Column(String(10), primary_key=True)
+    target_language = Column(String(10), primary_key=True)
+    model_name = Column(String(255), primary_key=True, index=True)
+
+    translated_text = Column(Text, nullable=False)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
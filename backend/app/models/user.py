@@ -10,7 +10,7 @@ class User(Base):
     google_id = Column(String(255), unique=True, nullable=True)
     email = Column(String(255), unique=True, nullable=False)
     name = Column(String(255), nullable=True)
-    picture_url = Column(String(512), nullable=True)
+    picture_url = Column(String(512), nullable=True, index=True)
     
     # Onboarding data
     language = Column(String(10), nullable=True)
@@ -1,39 +1,73 @@
-import base64
-from io import BytesIO
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
-from PIL import Image
-
-from app.database import get_db
+import json
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from fastapi import APIRouter, Depends, Header, HTTPException, status, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db
 from app.models.report import Report
 from app.models.user import User
+from app.models.extraction_job import JobStatus
 from app.schemas.report import (
     ReportCreate,
     ReportResponse,
     ExtractedReport,
+    ExtractionJobResponse,
     TranslateRequest,
     TranslateResponse,
 )
-from app.services.groq_service import call_groq_vlm
-from app.services.file_service import save_report_image, delete_file
-from app.utils.icd_parser import parse_icd_codes
+from app.services.groq_client import GroqUnavailableError, get_rate_limit_stats
+from app.services.groq_service import (
+    translate_with_groq,
+    get_extraction_pipeline,
+    TRANSLATION_MODEL_NAME,
+)
+from app.services.cache_service import (
+    get_cached_extraction,
+    get_cached_translation,
+    store_translation,
+    get_cache_stats,
+)
+from app.services.file_service import (
+    save_report_image,
+    release_upload,
+    get_upload_path,
+    InvalidUploadError,
+    UploadTooLargeError,
+)
+from app.services.image_service import (
+    prepare_image_async,
+    PreparedImage,
+    InvalidImageError,
+    ImageQueueFullError,
+)
+from app.services.extraction_service import stream_extraction, extract_prepared_image
+from app.services.job_service import (
+    enqueue_extraction,
+    get_job,
+    notify_workers,
+    FINISHED_STATUSES,
+    JOB_POLL_INTERVAL,
+)
+from app.utils.icd_parser import STRUCTURED_FIELDS
+from app.utils.icd10 import icd_code_name, normalize_icd_code
 from app.middleware.auth_middleware import get_current_user_dependency
 
 router = APIRouter(prefix="/api", tags=["reports"])
 
 
-@router.post("/extract-icd", response_model=ExtractedReport)
-async def extract_icd(file: UploadFile = File(...)):
+async def _save_upload(file: UploadFile) -> str:
     """
-    Extract ICD codes from prescription image.
-    Saves the image first, then processes it.
+    Check the upload is an image and stream it to uploads/reports.
     
     Args:
         file: Image file (prescription image)
         
     Returns:
-        JSON with disease_name, disease_icd_code, medicine_name, full_description, image_url
+        The saved image URL
     """
     # Validate file type
     if not file.content_type or not file.content_type.startswith('image/'):
@@ -42,62 +76,127 @@ async def extract_icd(file: UploadFile = File(...)):
             detail="File must be an image"
         )
     
+    # Save image to uploads/reports first; the format and size are checked while streaming
     try:
-        # Save image to uploads/reports first and get the bytes
-        image_url, image_bytes = await save_report_image(file)
+        image_url = await save_report_image(file)
+    except UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except InvalidUploadError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    
+    if not image_url:
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to save image"
+        )
+    
+    return image_url
+
+
+async def _prepare_image(file: UploadFile) -> Tuple[str, PreparedImage]:
+    """
+    Save, validate and normalize an uploaded image for the VLM.
+    Decoding and encoding run in the image worker pool.
+    
+    Args:
+        file: Image file (prescription image)
         
-        if not image_bytes:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to save image"
-            )
+    Returns:
+        Tuple of (saved image URL, prepared image)
+    """
+    image_url = await _save_upload(file)
+    
+    # Validate and downscale/re-encode for the VLM, reading the original from disk
+    try:
+        prepared = await prepare_image_async(str(get_upload_path(image_url)))
+    except InvalidImageError as e:
+        # Release the saved file; being fresh, it is left for the upload GC
+        if image_url:
+            await run_in_threadpool(release_upload, image_url)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid image file: {str(e)}"
+        )
+    except ImageQueueFullError as e:
+        if image_url:
+            await run_in_threadpool(release_upload, image_url)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    
+    print(
+        f"Normalized image {prepared.original_bytes} -> {prepared.normalized_bytes} bytes "
+        f"({prepared.reduction:.0%} smaller, {prepared.width}x{prepared.height})"
+    )
+    return image_url, prepared
+
+
+def _groq_unavailable(e: GroqUnavailableError) -> HTTPException:
+    """Map a Groq availability error to a 429/503 response with Retry-After."""
+    headers = None
+    if e.retry_after is not None:
+        headers = {"Retry-After": str(max(1, round(e.retry_after)))}
+    return HTTPException(
+        status_code=e.status_code,
+        detail=str(e),
+        headers=headers
+    )
+
+
+def _sse_event(event: str, data: Dict) -> str:
+    """Format a server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post(
+    "/extract-icd",
+    response_model=ExtractedReport,
+    responses={202: {"model": ExtractionJobResponse, "description": "Job queued (background=true)"}},
+)
+async def extract_icd(file: UploadFile = File(...), fields_only: bool = False, background: bool = False):
+    """
+    Extract ICD codes from prescription image.
+    Saves the image first, then processes it.
+    
+    Args:
+        file: Image file (prescription image)
+        fields_only: Stop once the structured fields are parsed; full_description
+            is then the first-pass document description
+        background: Queue the extraction and return a job ID (202) instead of
+            waiting; poll /api/jobs/{job_id} or subscribe to /api/jobs/{job_id}/events,
+            sending the returned job_token in the X-Job-Token header
         
-        # Validate image using Pillow
-        try:
-            image = Image.open(BytesIO(image_bytes))
-            image.verify()  # Verify it's a valid image
-        except Exception as e:
-            # Delete the saved file if validation fails
-            if image_url:
-                delete_file(image_url)
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid image file: {str(e)}"
+    Returns:
+        JSON with disease_name, disease_icd_code, medicine_name, full_description, image_url
+    """
+    try:
+        if background:
+            image_url = await _save_upload(file)
+            job_id, job_token = await run_in_threadpool(enqueue_extraction, image_url, fields_only)
+            notify_workers()
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content=ExtractionJobResponse(
+                    job_id=job_id,
+                    status=JobStatus.QUEUED.value,
+                    job_token=job_token,
+                ).model_dump(),
             )
         
-        # Reopen image after verification (verify() closes it)
-        image = Image.open(BytesIO(image_bytes))
+        image_url, prepared = await _prepare_image(file)
         
-        # Convert image to base64 data URL for API
-        buffered = BytesIO()
-        # Convert to RGB if necessary (for PNG with transparency)
-        if image.mode in ('RGBA', 'LA', 'P'):
-            rgb_image = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            rgb_image.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-            image = rgb_image
-        
-        # Determine format
-        image_format = image.format or 'JPEG'
-        if image_format not in ['JPEG', 'PNG', 'WEBP']:
-            image_format = 'JPEG'
-        
-        image.save(buffered, format=image_format)
-        image_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
-        
-        # Create data URL
-        mime_type = f"image/{image_format.lower()}"
-        image_data_url = f"data:{mime_type};base64,{image_base64}"
-        
-        # Call Groq API
+        # Call Groq API (or the extraction cache) and parse ICD codes from response
         try:
-            groq_response = call_groq_vlm(image_data_url)
-            if not groq_response:
-                raise HTTPException(
-                    status_code=500,
-                    detail="No response from Groq API"
-                )
+            result = await extract_prepared_image(prepared, fields_only)
+        except GroqUnavailableError as e:
+            raise _groq_unavailable(e)
         except ValueError as e:
             raise HTTPException(
                 status_code=500,
@@ -109,9 +208,6 @@ async def extract_icd(file: UploadFile = File(...)):
                 detail=f"Error calling Groq API: {str(e)}"
             )
         
-        # Parse ICD codes from response
-        result = parse_icd_codes(groq_response)
-        
         # Add the image URL to the result
         result["image_url"] = image_url
         
@@ -126,19 +222,163 @@ async def extract_icd(file: UploadFile = File(...)):
         )
 
 
+@router.post("/extract-icd/stream")
+async def extract_icd_stream(file: UploadFile = File(...), fields_only: bool = False):
+    """
+    Streaming variant of /extract-icd using server-sent events.
+    
+    Events:
+        token: {"pass": 1|2, "content": str} for each model token
+        field: {"name": str, "value": str} as soon as a structured section is parsed
+        result: the final ExtractedReport
+        error: {"detail": str} if extraction fails mid-stream (plus "retry_after"
+            in seconds when Groq is rate limited or unavailable)
+    """
+    try:
+        image_url, prepared = await _prepare_image(file)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+    
+    image_hash = prepared.image_hash
+    cached = await run_in_threadpool(get_cached_extraction, image_hash, get_extraction_pipeline())
+    
+    async def event_stream():
+        if cached is not None:
+            for field in STRUCTURED_FIELDS:
+                if cached.get(field):
+                    yield _sse_event("field", {"name": field, "value": cached[field]})
+            cached["image_url"] = image_url
+            yield _sse_event("result", ExtractedReport(**cached).model_dump())
+            return
+        
+        try:
+            async for event, data in stream_extraction(image_hash, prepared.data_url, fields_only):
+                if event == "result":
+                    data["image_url"] = image_url
+                    data = ExtractedReport(**data).model_dump()
+                yield _sse_event(event, data)
+        except GroqUnavailableError as e:
+            yield _sse_event("error", {"detail": str(e), "retry_after": e.retry_after})
+        except ValueError as e:
+            yield _sse_event("error", {"detail": str(e)})
+        except Exception as e:
+            yield _sse_event("error", {"detail": f"Error calling Groq API: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=ExtractionJobResponse, response_model_exclude={"job_token"})
+async def get_extraction_job(job_id: str, x_job_token: Optional[str] = Header(None)):
+    """
+    Get the status of a background extraction job, with its result once finished.
+    Requires the job token from the 202 response in the X-Job-Token header;
+    without it the job is reported as not found.
+    """
+    job = await run_in_threadpool(get_job, job_id, x_job_token)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return job
+
+
+@router.get("/jobs/{job_id}/events")
+async def extraction_job_events(job_id: str, x_job_token: Optional[str] = Header(None)):
+    """
+    Subscribe to a background extraction job using server-sent events.
+    Requires the job token in the X-Job-Token header, like /api/jobs/{job_id}.
+    
+    Events:
+        status: {"job_id", "status", "attempts"} whenever the status changes
+        result: the final ExtractionJobResponse once the job has finished
+    """
+    job = await run_in_threadpool(get_job, job_id, x_job_token)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    async def event_stream():
+        current = job
+        last_status = None
+        while True:
+            if current is None:
+                yield _sse_event("error", {"detail": "Job not found"})
+                return
+            if current["status"] in FINISHED_STATUSES:
+                yield _sse_event("result", ExtractionJobResponse(**current).model_dump(exclude={"job_token"}))
+                return
+            if (current["status"], current["attempts"]) != last_status:
+                last_status = (current["status"], current["attempts"])
+                yield _sse_event("status", {
+                    "job_id": current["job_id"],
+                    "status": current["status"],
+                    "attempts": current["attempts"],
+                })
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            current = await run_in_threadpool(get_job, job_id, x_job_token)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/cache/stats", dependencies=[Depends(get_current_user_dependency)])
+async def cache_stats():
+    """Get hit/miss counters for the extraction cache and translation memory (signed-in users only)."""
+    return get_cache_stats()
+
+
+@router.get("/groq/stats", dependencies=[Depends(get_current_user_dependency)])
+async def groq_stats():
+    """Get the Groq circuit breaker state and client-side rate limiter levels (signed-in users only)."""
+    return get_rate_limit_stats()
+
+
 @router.post("/translate", response_model=TranslateResponse)
 async def translate_text(request: TranslateRequest):
     """
     Translate text to target language using Groq.
+    Repeat translations are served from the translation memory.
     """
-    from app.services.groq_service import translate_with_groq
-    
     try:
-        translated = translate_with_groq(request.text, request.target_language)
+        translated = await run_in_threadpool(
+            get_cached_translation,
+            request.text,
+            request.source_language,
+            request.target_language,
+            TRANSLATION_MODEL_NAME,
+        )
+        if translated is None:
+            translated = await translate_with_groq(request.text, request.target_language)
+            await run_in_threadpool(
+                store_translation,
+                request.text,
+                request.source_language,
+                request.target_language,
+                TRANSLATION_MODEL_NAME,
+                translated,
+            )
         return TranslateResponse(
             translated_text=translated,
+            source_language=request.source_language,
             target_language=request.target_language
         )
+    except GroqUnavailableError as e:
+        raise _groq_unavailable(e)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -149,24 +389,44 @@ async def translate_text(request: TranslateRequest):
 @router.get("/reports", response_model=List[ReportResponse])
 async def get_reports(
     current_user: User = Depends(get_current_user_dependency),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all reports for the current user."""
-    reports = db.query(Report).filter(Report.user_id == current_user.id).order_by(Report.created_at.desc()).all()
-    return reports
+    reports = await db.scalars(
+        select(Report).where(Report.user_id == current_user.id).order_by(Report.created_at.desc())
+    )
+    return reports.all()
 
 
 @router.post("/reports", response_model=ReportResponse, status_code=status.HTTP_201_CREATED)
 async def create_report(
     report_data: ReportCreate,
     current_user: User = Depends(get_current_user_dependency),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Create a new report for the current user."""
+    """
+    Create a new report for the current user.
+    The ICD-10 code is normalized ("k29.7" -> "K29.7"); codes missing from the
+    bundled table are kept and flagged (codes deeper than the table allows are
+    cut back to their nearest known ancestor), only malformed ones are rejected.
+    """
+    disease_icd_code = None
+    if report_data.disease_icd_code and report_data.disease_icd_code.strip():
+        disease_icd_code = normalize_icd_code(report_data.disease_icd_code)
+        if disease_icd_code is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Not an ICD-10 code: {report_data.disease_icd_code}"
+            )
+    
+    disease_name = report_data.disease_name
+    if not disease_name and disease_icd_code:
+        disease_name = icd_code_name(disease_icd_code)
+    
     report = Report(
         user_id=current_user.id,
-        disease_name=report_data.disease_name,
-        disease_icd_code=report_data.disease_icd_code,
+        disease_name=disease_name,
+        disease_icd_code=disease_icd_code,
         medicine_name=report_data.medicine_name,
         full_description=report_data.full_description,
         translated_text=report_data.translated_text,
@@ -175,8 +435,8 @@ async def create_report(
         image_url=report_data.image_url,
     )
     db.add(report)
-    db.commit()
-    db.refresh(report)
+    await db.commit()
+    await db.refresh(report)
     return report
 
 
@@ -184,13 +444,13 @@ async def create_report(
 async def get_report(
     report_id: str,
     current_user: User = Depends(get_current_user_dependency),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific report by ID."""
-    report = db.query(Report).filter(
+    report = await db.scalar(select(Report).where(
         Report.id == report_id,
         Report.user_id == current_user.id
-    ).first()
+    ))
     
     if not report:
         raise HTTPException(
@@ -205,13 +465,13 @@ async def get_report(
 async def delete_report(
     report_id: str,
     current_user: User = Depends(get_current_user_dependency),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a specific report."""
-    report = db.query(Report).filter(
+    report = await db.scalar(select(Report).where(
         Report.id == report_id,
         Report.user_id == current_user.id
-    ).first()
+    ))
     
     if not report:
         raise HTTPException(
@@ -219,6 +479,12 @@ async def delete_report(
             detail="Report not found"
         )
     
-    db.delete(report)
-    db.commit()
+    image_url = report.image_url
+    await db.delete(report)
+    await db.commit()
+    
+    # The image may be shared with other reports; it is only deleted once
+    # unreferenced and past the upload GC grace period (the GC takes it otherwise)
+    if image_url:
+        await run_in_threadpool(release_upload, image_url)
     return None
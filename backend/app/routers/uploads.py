@@ -0,0 +1,194 @@
+import os
+import re
+import stat
+import mimetypes
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+from urllib.parse import quote
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+
+from app.services.file_service import UPLOAD_DIR, UPLOAD_CHUNK_SIZE, get_upload_path
+from app.services.image_service import InvalidImageError, ImageQueueFullError
+from app.services.thumbnail_service import get_derivative
+from app.utils.upload_urls import verify_upload_signature
+
+router = APIRouter(prefix="/uploads", tags=["uploads"])
+
+# Only serve uploads through the signed URLs in report and user responses
+# (image_src, picture_src; see app.utils.upload_urls). Turning this off
+# serves any upload to anyone who has its path.
+UPLOADS_REQUIRE_SIGNATURE = os.getenv("UPLOADS_REQUIRE_SIGNATURE", "true").lower() == "true"
+
+# Content-addressed files and variants never change under the same URL
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+CONTENT_ADDRESSED_NAME = re.compile(r'^[0-9a-f]{64}$')
+BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def check_upload_access(path: str, expires: Optional[str] = None, signature: Optional[str] = None):
+    """Reject requests without a valid, unexpired signature when UPLOADS_REQUIRE_SIGNATURE is set."""
+    if not UPLOADS_REQUIRE_SIGNATURE:
+        return
+    if not verify_upload_signature(f"/uploads/{path}", expires, signature):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid or expired upload URL",
+        )
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Whether If-None-Match lists the current ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def _accel_location(request: Request, filepath: Path) -> Optional[str]:
+    """
+    Internal nginx location for a file, if the request came through an nginx
+    that serves uploads itself. nginx announces this with the request headers
+    X-Sendfile-Type: X-Accel-Redirect and X-Accel-Mapping: <dir>/=<location>/.
+    """
+    if request.headers.get("x-sendfile-type", "").lower() != "x-accel-redirect":
+        return None
+    path = (UPLOAD_DIR / filepath.relative_to(UPLOAD_DIR.resolve())).as_posix()
+    for mapping in request.headers.get("x-accel-mapping", "").split(","):
+        root, _, location = mapping.strip().partition("=")
+        if root and location and path.startswith(root):
+            return quote(location + path[len(root):])
+    return None
+
+
+def _stat_file(filepath: Path) -> Optional[os.stat_result]:
+    """Stat a regular file, or None if it is missing or not a file."""
+    try:
+        result = filepath.stat()
+    except OSError:
+        return None
+    return result if stat.S_ISREG(result.st_mode) else None
+
+
+def _iter_range(filepath: Path, start: int, length: int) -> Iterator[bytes]:
+    with open(filepath, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(UPLOAD_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _serve_file(
+    request: Request,
+    filepath: Path,
+    size: int,
+    etag: str,
+    cache_control: str,
+    media_type: Optional[str] = None,
+    extra_headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Answer a GET for a file: 304 if the client's copy is current, an
+    X-Accel-Redirect when nginx can send the file itself, and otherwise the
+    file (or a single requested byte range) streamed from here.
+    """
+    media_type = media_type or mimetypes.guess_type(filepath.name)[0] or "application/octet-stream"
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes", **(extra_headers or {})}
+
+    if _etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # nginx handles Range and sendfile from here; it keeps Content-Type and
+    # Cache-Control and re-adds the ETag (see nginx/nginx.conf)
+    location = _accel_location(request, filepath)
+    if location:
+        headers["X-Accel-Redirect"] = location
+        return Response(headers=headers, media_type=media_type)
+
+    byte_range = BYTE_RANGE.match(request.headers.get("range", "").strip())
+    if_range = request.headers.get("if-range")
+    if byte_range and (not if_range or if_range.strip() == etag) and any(byte_range.groups()):
+        first, last = byte_range.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # bytes=-N is the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+        if start > end or start >= size:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{size}"},
+            )
+        length = end - start + 1
+        headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(length)})
+        return StreamingResponse(
+            _iter_range(filepath, start, length),
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type=media_type,
+            headers=headers,
+        )
+
+    return FileResponse(filepath, media_type=media_type, headers=headers)
+
+
+@router.get("/{path:path}", dependencies=[Depends(check_upload_access)])
+async def get_upload(path: str, request: Request, w: Optional[int] = Query(None, ge=1, le=4096)):
+    """
+    Serve an uploaded file, or a resized variant of an image with ?w=<width>.
+    The URL must carry the expires and signature parameters of a signed URL
+    from a report or user response.
+    Variants are WebP when the browser accepts it and JPEG otherwise; the
+    width is rounded up to one of THUMBNAIL_WIDTHS and images are never enlarged.
+    Supports If-None-Match and single byte ranges; behind nginx the bytes are
+    sent by nginx via X-Accel-Redirect.
+    """
+    filepath = get_upload_path(f"/uploads/{path}")
+    file_stat = await run_in_threadpool(_stat_file, filepath) if filepath is not None else None
+    if file_stat is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+
+    if w is None:
+        if CONTENT_ADDRESSED_NAME.match(filepath.stem):
+            return _serve_file(request, filepath, file_stat.st_size, f'"{filepath.stem}"', IMMUTABLE_CACHE_CONTROL)
+        etag = f'"{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}"'
+        return _serve_file(request, filepath, file_stat.st_size, etag, REVALIDATE_CACHE_CONTROL)
+
+    image_format = "webp" if "image/webp" in request.headers.get("accept", "") else "jpg"
+    try:
+        derivative = await get_derivative(filepath, w, image_format)
+        derivative_stat = await run_in_threadpool(_stat_file, derivative.path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    except InvalidImageError:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="File is not a resizable image"
+        )
+    except ImageQueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+
+    if derivative_stat is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+
+    return _serve_file(
+        request,
+        derivative.path,
+        derivative_stat.st_size,
+        derivative.etag,
+        IMMUTABLE_CACHE_CONTROL,
+        media_type=derivative.media_type,
+        extra_headers={"Vary": "Accept"},
+    )
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Form, UploadFile, File
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
-from app.database import get_db
+from app.database import get_async_db
 from app.models.user import User
+from app.models.report import Report
 from app.schemas.user import GoogleAuthRequest, TokenResponse, UserResponse, UserUpdate
 from app.services.auth_service import verify_google_token, create_or_update_user
-from app.services.file_service import save_member_image
+from app.services.file_service import save_member_image, release_upload, InvalidUploadError, UploadTooLargeError
 from app.utils.jwt_utils import create_access_token
 from app.middleware.auth_middleware import get_current_user_dependency
 
@@ -15,7 +18,7 @@ router = APIRouter(prefix="/api", tags=["users"])
 @router.post("/auth/google", response_model=TokenResponse)
 async def google_login(
     request: GoogleAuthRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Google OAuth login endpoint.
@@ -31,8 +34,8 @@ async def google_login(
     if GOOGLE_CLIENT_ID:
         print(f"Backend GOOGLE_CLIENT_ID: {GOOGLE_CLIENT_ID[:30]}...")
     
-    # Verify Google token
-    user_info = verify_google_token(request.token)
+    # Verify Google token (fetches Google's certificates, so off the event loop)
+    user_info = await run_in_threadpool(verify_google_token, request.token)
     
     if not user_info:
         print("ERROR: Token verification failed - user_info is None")
@@ -44,11 +47,11 @@ async def google_login(
     print(f"Token verified successfully for user: {user_info.get('email')}")
     
     # Check if user already exists
-    existing_user = db.query(User).filter(User.google_id == user_info['google_id']).first()
+    existing_user = await db.scalar(select(User).where(User.google_id == user_info['google_id']))
     is_new_user = existing_user is None or not existing_user.onboarding_completed
     
     # Create or update user in database
-    user = create_or_update_user(db, user_info)
+    user = await create_or_update_user(db, user_info)
     
     # Create JWT token
     access_token = create_access_token(data={"sub": str(user.id)})
@@ -72,13 +75,13 @@ async def register_with_onboarding(
     gender: str = Form(...),
     visit_purpose: str = Form(...),
     profile_image: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Complete registration with Google auth + onboarding data.
     """
     # Verify Google token
-    user_info = verify_google_token(google_token)
+    user_info = await run_in_threadpool(verify_google_token, google_token)
     
     if not user_info:
         raise HTTPException(
@@ -87,7 +90,7 @@ async def register_with_onboarding(
         )
     
     # Create or get user
-    user = create_or_update_user(db, user_info)
+    user = await create_or_update_user(db, user_info)
     
     # Update with onboarding data
     user.language = language
@@ -102,12 +105,23 @@ async def register_with_onboarding(
     
     # Save profile image if provided
     if profile_image and profile_image.filename:
-        image_url = await save_member_image(profile_image, user.id)
+        try:
+            image_url = await save_member_image(profile_image)
+        except UploadTooLargeError as e:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=str(e)
+            )
+        except InvalidUploadError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
         if image_url:
             user.picture_url = image_url
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     # Create JWT token
     access_token = create_access_token(data={"sub": str(user.id)})
@@ -131,7 +145,7 @@ async def get_current_user_profile(
 async def update_current_user(
     user_update: UserUpdate,
     current_user: User = Depends(get_current_user_dependency),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update current authenticated user's profile."""
     update_data = user_update.dict(exclude_unset=True)
@@ -139,8 +153,8 @@ async def update_current_user(
     for field, value in update_data.items():
         setattr(current_user, field, value)
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
     
     return UserResponse.model_validate(current_user)
 
@@ -148,10 +162,23 @@ async def update_current_user(
 @router.delete("/users/me", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_current_user(
     current_user: User = Depends(get_current_user_dependency),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Delete current authenticated user's account."""
-    db.delete(current_user)
-    db.commit()
+    """Delete current authenticated user's account along with their reports and images."""
+    image_urls = set(await db.scalars(
+        select(Report.image_url).where(Report.user_id == current_user.id, Report.image_url.isnot(None))
+    ))
+    if current_user.picture_url:
+        image_urls.add(current_user.picture_url)
+    
+    # Bulk deletes: removing the user through the ORM would lazy-load its reports
+    await db.execute(delete(Report).where(Report.user_id == current_user.id))
+    await db.execute(delete(User).where(User.id == current_user.id))
+    await db.commit()
+    
+    # Images shared with other accounts are kept until nothing refers to them;
+    # recently uploaded ones are left for the upload GC
+    for image_url in image_urls:
+        await run_in_threadpool(release_upload, image_url)
     return None
 
@@ -1,8 +1,11 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
 from typing import Optional, Literal
 from datetime import datetime
 from enum import Enum
 
+from app.utils.icd10 import is_known_icd_code
+from app.utils.upload_urls import sign_upload_url
+
 
 class ReportTypeEnum(str, Enum):
     PRESCRIPTION = "prescription"  # 처방전
@@ -18,6 +21,28 @@ class ExtractedReport(BaseModel):
     full_description: Optional[str] = None
     image_url: Optional[str] = None  # URL where the uploaded image is saved
 
+    @computed_field
+    @property
+    def disease_icd_code_verified(self) -> Optional[bool]:
+        """False for a code the ICD-10 table lacks (kept as written on the document)."""
+        return is_known_icd_code(self.disease_icd_code) if self.disease_icd_code else None
+
+    @computed_field
+    @property
+    def image_src(self) -> Optional[str]:
+        """Short-lived signed URL to display the image with (image_url is what is stored)."""
+        return sign_upload_url(self.image_url)
+
+
+class ExtractionJobResponse(BaseModel):
+    job_id: str
+    status: str  # queued, running, succeeded, failed
+    attempts: int = 0
+    result: Optional[ExtractedReport] = None
+    error: Optional[str] = None
+    # Only in the 202 response; send it as X-Job-Token to read the job
+    job_token: Optional[str] = None
+
 
 class ReportCreate(BaseModel):
     report_type: ReportTypeEnum = ReportTypeEnum.PRESCRIPTION
@@ -44,6 +69,18 @@ class ReportResponse(BaseModel):
     image_url: Optional[str] = None
     created_at: datetime
 
+    @computed_field
+    @property
+    def disease_icd_code_verified(self) -> Optional[bool]:
+        """False for a code the ICD-10 table lacks (kept as written on the document)."""
+        return is_known_icd_code(self.disease_icd_code) if self.disease_icd_code else None
+
+    @computed_field
+    @property
+    def image_src(self) -> Optional[str]:
+        """Short-lived signed URL to display the image with (image_url is what is stored)."""
+        return sign_upload_url(self.image_url)
+
     class Config:
         from_attributes = True
 
@@ -51,6 +88,7 @@ class ReportResponse(BaseModel):
 class TranslateRequest(BaseModel):
     text: str
     target_language: str
+    source_language: Optional[str] = None
 
 
 class TranslateResponse(BaseModel):
@@ -2,6 +2,8 @@ from pydantic import BaseModel
 from typing import Optional, Union
 from datetime import datetime
 
+from app.utils.upload_urls import sign_upload_url
+
 
 class GoogleAuthRequest(BaseModel):
     token: str
@@ -11,7 +13,7 @@ class UserResponse(BaseModel):
     id: Union[int, str]  # Support both int and UUID string IDs
     email: str
     name: Optional[str] = None
-    picture: Optional[str] = None
+    picture: Optional[str] = None  # Short-lived signed URL for uploaded pictures
     language: Optional[str] = None
     nickname: Optional[str] = None
     phone: Optional[str] = None
@@ -31,7 +33,7 @@ class UserResponse(BaseModel):
             id=obj.id,
             email=obj.email,
             name=obj.name,
-            picture=obj.picture_url,
+            picture=sign_upload_url(obj.picture_url),
             language=obj.language,
             nickname=obj.nickname,
             phone=obj.phone,
@@ -2,7 +2,8 @@ import os
 from typing import Optional, Dict
 from google.auth.transport import requests
 from google.oauth2 import id_token
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
 
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID", "")
@@ -88,7 +89,7 @@ def is_local_upload(picture_url: Optional[str]) -> bool:
     return '/uploads/' in picture_url or picture_url.startswith('uploads/')
 
 
-def create_or_update_user(db: Session, user_info: Dict) -> User:
+async def create_or_update_user(db: AsyncSession, user_info: Dict) -> User:
     """
     Create or update user in database based on Google OAuth info.
     
@@ -105,7 +106,7 @@ def create_or_update_user(db: Session, user_info: Dict) -> User:
     google_picture_url = user_info.get('picture_url')
     
     # Try to find user by google_id first
-    user = db.query(User).filter(User.google_id == google_id).first()
+    user = await db.scalar(select(User).where(User.google_id == google_id))
     
     if user:
         # Update existing user
@@ -120,7 +121,7 @@ def create_or_update_user(db: Session, user_info: Dict) -> User:
     else:
         # Try to find by email if google_id not found
         if email:
-            user = db.query(User).filter(User.email == email).first()
+            user = await db.scalar(select(User).where(User.email == email))
         
         if user:
             # Update existing user with google_id
@@ -140,7 +141,7 @@ def create_or_update_user(db: Session, user_info: Dict) -> User:
             )
             db.add(user)
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
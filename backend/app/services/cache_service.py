@@ -0,0 +1,296 @@
+import os
+import hashlib
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import SessionLocal
+from app.models.extraction_cache import ExtractionCache
+from app.models.translation_memory import TranslationMemory
+from app.utils.lru_cache import LRUCache
+
+# Extraction result cache settings
+EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "512"))
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+EXTRACTION_CACHE_TTL = float(os.getenv("EXTRACTION_CACHE_TTL", "3600"))  # seconds, both tiers
+
+# Translation memory settings
+TRANSLATION_CACHE_ENABLED = os.getenv("TRANSLATION_CACHE_ENABLED", "true").lower() == "true"
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "2048"))
+TRANSLATION_CACHE_MAX_BYTES = int(os.getenv("TRANSLATION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+TRANSLATION_CACHE_TTL = float(os.getenv("TRANSLATION_CACHE_TTL", "86400"))
+
+# Used in place of a missing source language (model auto-detects)
+AUTO_SOURCE_LANGUAGE = "auto"
+
+EXTRACTION_FIELDS = ("report_type", "disease_name", "disease_icd_code", "medicine_name", "full_description")
+
+_extraction_memory = LRUCache(
+    max_entries=EXTRACTION_CACHE_MAX_ENTRIES,
+    max_bytes=EXTRACTION_CACHE_MAX_BYTES,
+    ttl_seconds=EXTRACTION_CACHE_TTL,
+)
+_extraction_db_hits = 0
+_extraction_db_misses = 0
+
+_translation_memory = LRUCache(
+    max_entries=TRANSLATION_CACHE_MAX_ENTRIES,
+    max_bytes=TRANSLATION_CACHE_MAX_BYTES,
+    ttl_seconds=TRANSLATION_CACHE_TTL,
+)
+_translation_db_hits = 0
+_translation_db_misses = 0
+
+
+def _extraction_cutoff() -> datetime:
+    """Creation time (naive UTC) before which extraction cache rows have expired."""
+    return datetime.utcnow() - timedelta(seconds=EXTRACTION_CACHE_TTL)
+
+
+def _result_size(result: Dict[str, Optional[str]]) -> int:
+    """Approximate memory footprint of a cached result in bytes."""
+    return sum(len(value) for value in result.values() if value)
+
+
+def get_cached_extraction(image_hash: str, model_name: str) -> Optional[Dict[str, Optional[str]]]:
+    """
+    Look up a previous extraction result for an image.
+    Checks the in-process LRU first, then the persistent table; rows older
+    than EXTRACTION_CACHE_TTL are ignored.
+
+    Args:
+        image_hash: SHA-256 of the normalized image bytes (PreparedImage.image_hash)
+        model_name: Extraction pipeline that produced the result; rows from others are ignored
+
+    Returns:
+        Copy of the parse_icd_codes result, or None on miss
+    """
+    global _extraction_db_hits, _extraction_db_misses
+
+    if not EXTRACTION_CACHE_ENABLED:
+        return None
+
+    key = (image_hash, model_name)
+    cached = _extraction_memory.get(key)
+    if cached is not None:
+        return dict(cached)
+
+    db = SessionLocal()
+    try:
+        row = db.query(ExtractionCache).filter(
+            ExtractionCache.image_hash == image_hash,
+            ExtractionCache.model_name == model_name,
+            ExtractionCache.created_at >= _extraction_cutoff()
+        ).first()
+    except SQLAlchemyError as e:
+        print(f"Extraction cache lookup failed: {e}")
+        row = None
+    finally:
+        db.close()
+
+    if row is None:
+        _extraction_db_misses += 1
+        return None
+
+    _extraction_db_hits += 1
+    result = {field: getattr(row, field) for field in EXTRACTION_FIELDS}
+    _extraction_memory.set(key, result, _result_size(result))
+    return dict(result)
+
+
+def store_extraction(image_hash: str, model_name: str, result: Dict[str, Optional[str]]):
+    """
+    Store an extraction result in both cache tiers.
+
+    Args:
+        image_hash: SHA-256 of the normalized image bytes (PreparedImage.image_hash)
+        model_name: Extraction pipeline that produced the result
+        result: parse_icd_codes output (extra keys such as image_url are ignored)
+    """
+    if not EXTRACTION_CACHE_ENABLED:
+        return
+
+    cached = {field: result.get(field) for field in EXTRACTION_FIELDS}
+    _extraction_memory.set((image_hash, model_name), cached, _result_size(cached))
+
+    db = SessionLocal()
+    try:
+        db.merge(ExtractionCache(
+            image_hash=image_hash,
+            model_name=model_name,
+            created_at=datetime.utcnow(),
+            **cached
+        ))
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"Extraction cache store failed: {e}")
+    finally:
+        db.close()
+
+
+def purge_expired_extractions() -> int:
+    """
+    Delete extraction cache rows older than EXTRACTION_CACHE_TTL.
+    The rows hold full report descriptions, so they are removed rather than
+    just ignored by lookups.
+
+    Returns:
+        Number of rows deleted
+    """
+    db = SessionLocal()
+    try:
+        deleted = db.query(ExtractionCache).filter(
+            ExtractionCache.created_at < _extraction_cutoff()
+        ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"Extraction cache purge failed: {e}")
+        return 0
+    finally:
+        db.close()
+
+
+def hash_text(text: str) -> str:
+    """Return the SHA-256 hex digest used as the translation memory key."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def get_cached_translation(
+    text: str,
+    source_language: Optional[str],
+    target_language: str,
+    model_name: str
+) -> Optional[str]:
+    """
+    Look up a previous translation of the same text.
+    Checks the in-process LRU first, then the persistent table.
+
+    Args:
+        text: Source text
+        source_language: Source language code, or None if unknown
+        target_language: Target language code
+        model_name: Translation model; entries from other models never match
+
+    Returns:
+        Translated text, or None on miss
+    """
+    global _translation_db_hits, _translation_db_misses
+
+    if not TRANSLATION_CACHE_ENABLED:
+        return None
+
+    text_hash = hash_text(text)
+    source_language = source_language or AUTO_SOURCE_LANGUAGE
+    key = (text_hash, source_language, target_language, model_name)
+    cached = _translation_memory.get(key)
+    if cached is not None:
+        return cached
+
+    db = SessionLocal()
+    try:
+        row = db.query(TranslationMemory).filter(
+            TranslationMemory.text_hash == text_hash,
+            TranslationMemory.source_language == source_language,
+            TranslationMemory.target_language == target_language,
+            TranslationMemory.model_name == model_name
+        ).first()
+    except SQLAlchemyError as e:
+        print(f"Translation memory lookup failed: {e}")
+        row = None
+    finally:
+        db.close()
+
+    if row is None:
+        _translation_db_misses += 1
+        return None
+
+    _translation_db_hits += 1
+    _translation_memory.set(key, row.translated_text, len(row.translated_text))
+    return row.translated_text
+
+
+def store_translation(
+    text: str,
+    source_language: Optional[str],
+    target_language: str,
+    model_name: str,
+    translated_text: str
+):
+    """
+    Store a translation in both cache tiers.
+
+    Args:
+        text: Source text
+        source_language: Source language code, or None if unknown
+        target_language: Target language code
+        model_name: Model that produced the translation
+        translated_text: Translation to store
+    """
+    if not TRANSLATION_CACHE_ENABLED or not translated_text:
+        return
+
+    text_hash = hash_text(text)
+    source_language = source_language or AUTO_SOURCE_LANGUAGE
+    key = (text_hash, source_language, target_language, model_name)
+    _translation_memory.set(key, translated_text, len(translated_text))
+
+    db = SessionLocal()
+    try:
+        db.merge(TranslationMemory(
+            text_hash=text_hash,
+            source_language=source_language,
+            target_language=target_language,
+            model_name=model_name,
+            translated_text=translated_text,
+        ))
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"Translation memory store failed: {e}")
+    finally:
+        db.close()
+
+
+def purge_stale_translations(current_model: str) -> int:
+    """
+    Delete translation memory rows produced by any model other than the current one.
+
+    Args:
+        current_model: Translation model currently in use
+
+    Returns:
+        Number of rows deleted
+    """
+    db = SessionLocal()
+    try:
+        deleted = db.query(TranslationMemory).filter(
+            TranslationMemory.model_name != current_model
+        ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"Translation memory purge failed: {e}")
+        return 0
+    finally:
+        db.close()
+
+
+def get_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Return hit/miss counters for each cache."""
+    return {
+        "extraction": {
+            "memory": _extraction_memory.stats(),
+            "db_hits": _extraction_db_hits,
+            "db_misses": _extraction_db_misses,
+        },
+        "translation": {
+            "memory": _translation_memory.stats(),
+            "db_hits": _translation_db_hits,
+            "db_misses": _translation_db_misses,
+        },
+    }
@@ -0,0 +1,133 @@
+from typing import AsyncIterator, Dict, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+
+from app.schemas.report import ExtractedReport
+from app.services.groq_service import stream_groq_vlm, get_extraction_pipeline, EXTRACTION_OUTPUT
+from app.services.cache_service import get_cached_extraction, store_extraction
+from app.services.image_service import PreparedImage
+from app.utils.icd_parser import (
+    parse_icd_codes,
+    normalize_extracted_fields,
+    StreamingICDParser,
+    STRUCTURED_FIELDS,
+)
+
+# Keys the JSON output must carry (see groq_service.EXTRACTION_JSON_SCHEMA)
+JSON_OUTPUT_FIELDS = frozenset(STRUCTURED_FIELDS) | {"full_description"}
+
+
+def parse_extraction_response(response_text: str, output: str = EXTRACTION_OUTPUT) -> Dict[str, Optional[str]]:
+    """
+    Turn the structured model output into report fields.
+    JSON output is validated straight into ExtractedReport; output that does
+    not match the schema is scraped with parse_icd_codes instead.
+
+    Args:
+        response_text: Pass-2 (or single-pass) response text
+        output: One of groq_service.EXTRACTION_OUTPUTS
+
+    Returns:
+        parse_icd_codes-shaped dict
+    """
+    if output == "json":
+        try:
+            report = ExtractedReport.model_validate_json(response_text)
+        except ValidationError as e:
+            print(f"Extraction JSON does not match the schema ({e.error_count()} errors), parsing it as text")
+        else:
+            if JSON_OUTPUT_FIELDS <= report.model_fields_set:
+                return normalize_extracted_fields(report.model_dump(include=JSON_OUTPUT_FIELDS))
+            print("Extraction JSON is missing fields, parsing it as text")
+    return parse_icd_codes(response_text)
+
+
+async def stream_extraction(
+    image_hash: str,
+    image_data_url: str,
+    fields_only: bool = False
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Run the VLM passes and parse pass-2 output as it streams.
+
+    Args:
+        image_hash: Extraction cache key of the image
+        image_data_url: Base64 encoded image data URL
+        fields_only: Stop generation once the Full Description section
+            starts, skipping its long body
+
+    Yields:
+        ("token", {"pass", "content"}), ("field", {"name", "value"}) and
+        finally ("result", parse_icd_codes-shaped dict)
+    """
+    parser = StreamingICDParser()
+    description_parts = []
+    json_parts = []
+    stopped_early = False
+
+    stream = stream_groq_vlm(image_data_url)
+    try:
+        async for pass_number, content in stream:
+            yield "token", {"pass": pass_number, "content": content}
+            if pass_number == 1:
+                description_parts.append(content)
+                continue
+            if EXTRACTION_OUTPUT == "json":
+                # JSON output arrives whole and is parsed once complete
+                json_parts.append(content)
+                continue
+
+            for name, value in parser.feed(content).items():
+                yield "field", {"name": name, "value": value}
+            if fields_only and parser.is_complete:
+                stopped_early = True
+                break
+    finally:
+        # Closing the generator closes the upstream connection, which stops generation
+        await stream.aclose()
+
+    description = "".join(description_parts)
+    if stopped_early:
+        # Partial results are not cached so full requests still get the full description
+        yield "result", parser.early_result(description)
+        return
+
+    for name, value in parser.finish().items():
+        yield "field", {"name": name, "value": value}
+
+    json_response = "".join(json_parts)
+    groq_response = json_response or parser.text or description
+    if not groq_response:
+        raise ValueError("No response from Groq API")
+
+    if json_response:
+        result = parse_extraction_response(json_response, "json")
+        for name in STRUCTURED_FIELDS:
+            if result[name] is not None:
+                yield "field", {"name": name, "value": result[name]}
+    else:
+        result = parse_icd_codes(groq_response)
+    await run_in_threadpool(store_extraction, image_hash, get_extraction_pipeline(), result)
+    yield "result", result
+
+
+async def extract_prepared_image(prepared: PreparedImage, fields_only: bool = False) -> Dict[str, Optional[str]]:
+    """
+    Extract report fields from a prepared image, using the extraction cache.
+
+    Args:
+        prepared: Normalized image from image_service.prepare_image
+        fields_only: Stop once the structured fields are parsed
+
+    Returns:
+        parse_icd_codes-shaped dict (without image_url)
+    """
+    cached = await run_in_threadpool(get_cached_extraction, prepared.image_hash, get_extraction_pipeline())
+    if cached is not None:
+        return cached
+
+    result = None
+    async for event, data in stream_extraction(prepared.image_hash, prepared.data_url, fields_only):
+        if event == "result":
+            result = data
+    return result
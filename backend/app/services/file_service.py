@@ -1,14 +1,60 @@
 import os
+import time
 import uuid
-from datetime import datetime
+import hashlib
 from pathlib import Path
 from fastapi import UploadFile
-from typing import Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import BinaryIO, List, Optional
+
+from app.database import SessionLocal
+from app.models.report import Report
+from app.models.user import User
+from app.models.extraction_job import ExtractionJob
 
 # Base upload directory
 UPLOAD_DIR = Path("/app/uploads")
 MEMBERS_DIR = UPLOAD_DIR / "members"
 REPORTS_DIR = UPLOAD_DIR / "reports"
+# Resized variants of uploads (see thumbnail_service), mirroring their paths
+THUMBNAIL_CACHE_DIR = Path(os.getenv("THUMBNAIL_CACHE_DIR", str(UPLOAD_DIR / "derived")))
+
+# Files touched more recently than this are never deleted: an extraction's
+# image is unreferenced until the report is saved, and re-uploading an
+# existing blob refreshes its mtime. Younger unreferenced files are left to
+# the upload GC (see upload_gc_service).
+UPLOAD_GC_GRACE_PERIOD = float(os.getenv("UPLOAD_GC_GRACE_PERIOD", "86400"))
+
+# Largest accepted upload, and how much of it is held in memory at a time
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+
+# Leading bytes of the image formats Pillow can decode, with the extension saved
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+    (b"BM", ".bmp"),
+    (b"II*\x00", ".tif"),
+    (b"MM\x00*", ".tif"),
+)
+
+# Uploads are stored by the SHA-256 of their contents as
+# <dir>/<hash[:2]>/<hash[2:4]>/<hash><ext>, so identical images share one
+# file and no directory holds more than a few thousand entries. Partial
+# uploads are written next to the shards and renamed into place.
+PARTIAL_SUFFIX = ".part"
+
+
+class InvalidUploadError(ValueError):
+    """Raised when an upload is not an image in a supported format."""
+
+
+class UploadTooLargeError(InvalidUploadError):
+    """Raised when an upload is larger than UPLOAD_MAX_BYTES."""
 
 
 def ensure_directories():
@@ -17,112 +63,220 @@ def ensure_directories():
     REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def generate_filename(original_filename: str, prefix: str = "") -> str:
-    """Generate a unique filename with timestamp and UUID."""
-    ext = Path(original_filename).suffix.lower() or ".jpg"
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    unique_id = str(uuid.uuid4())[:8]
-    return f"{prefix}{timestamp}_{unique_id}{ext}"
+def blob_path(directory: Path, digest: str, extension: str) -> Path:
+    """Path of the blob with the given SHA-256 hex digest in an upload directory."""
+    return directory / digest[:2] / digest[2:4] / f"{digest}{extension}"
+
+
+def upload_url(filepath: Path) -> str:
+    """URL path under /uploads for a file inside UPLOAD_DIR."""
+    return "/uploads/" + filepath.relative_to(UPLOAD_DIR).as_posix()
+
+
+def detect_image_type(header: bytes) -> Optional[str]:
+    """
+    Identify an image format from the first bytes of a file.
+    
+    Args:
+        header: The first bytes of the upload (at least 12)
+        
+    Returns:
+        The file extension for the format, or None if it is not a supported image
+    """
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return ".webp"
+    for signature, extension in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    return None
+
+
+def _discard_partial(f: BinaryIO, filepath: Path):
+    f.close()
+    filepath.unlink(missing_ok=True)
 
 
-async def save_member_image(file: UploadFile, user_id: str) -> Optional[str]:
+def _commit_blob(partial: Path, filepath: Path):
+    """Move a finished upload into place, or drop it if the same content is already stored."""
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        # A fresh upload of an unreferenced blob restarts its cleanup grace period
+        os.utime(filepath)
+    except FileNotFoundError:
+        # Not stored yet, or deleted by release_upload or the upload GC since
+        os.replace(partial, filepath)
+    else:
+        partial.unlink()
+
+
+async def save_upload(file: UploadFile, directory: Path) -> Path:
+    """
+    Stream an image upload into the content-addressed store.
+    The upload is read in UPLOAD_CHUNK_SIZE chunks and hashed as it is
+    written. The format is checked on the first chunk, before anything is
+    written, and the upload is abandoned as soon as it exceeds
+    UPLOAD_MAX_BYTES. Writes run in the thread pool; the blob only appears
+    under its final name once it is complete.
+    
+    Args:
+        file: The uploaded file
+        directory: Upload directory to save into
+        
+    Returns:
+        Path of the stored blob
+        
+    Raises:
+        InvalidUploadError: If the upload is not a supported image
+        UploadTooLargeError: If the upload is larger than UPLOAD_MAX_BYTES
+    """
+    too_large = f"File is larger than {UPLOAD_MAX_BYTES // (1024 * 1024)} MB"
+    if file.size is not None and file.size > UPLOAD_MAX_BYTES:
+        raise UploadTooLargeError(too_large)
+    
+    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    extension = detect_image_type(chunk)
+    if extension is None:
+        raise InvalidUploadError("File must be a JPEG, PNG, WebP, GIF, BMP or TIFF image")
+    
+    await run_in_threadpool(ensure_directories)
+    partial = directory / f"{uuid.uuid4().hex}{PARTIAL_SUFFIX}"
+    digest = hashlib.sha256()
+    
+    f = await run_in_threadpool(open, partial, "wb")
+    try:
+        size = 0
+        while chunk:
+            size += len(chunk)
+            if size > UPLOAD_MAX_BYTES:
+                raise UploadTooLargeError(too_large)
+            digest.update(chunk)
+            await run_in_threadpool(f.write, chunk)
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        await run_in_threadpool(f.close)
+        filepath = blob_path(directory, digest.hexdigest(), extension)
+        await run_in_threadpool(_commit_blob, partial, filepath)
+    except BaseException:
+        await run_in_threadpool(_discard_partial, f, partial)
+        raise
+    
+    return filepath
+
+
+def store_bytes(data: bytes, directory: Path, extension: str) -> Path:
+    """
+    Store in-memory image data in the content-addressed store.
+    
+    Args:
+        data: The file contents
+        directory: Upload directory to save into
+        extension: File extension, including the dot
+        
+    Returns:
+        Path of the stored blob
+    """
+    ensure_directories()
+    filepath = blob_path(directory, hashlib.sha256(data).hexdigest(), extension)
+    partial = directory / f"{uuid.uuid4().hex}{PARTIAL_SUFFIX}"
+    try:
+        partial.write_bytes(data)
+        _commit_blob(partial, filepath)
+    finally:
+        partial.unlink(missing_ok=True)
+    return filepath
+
+
+async def save_member_image(file: UploadFile) -> Optional[str]:
     """
     Save a profile image for a member.
     
     Args:
         file: The uploaded file
-        user_id: The user's ID
         
     Returns:
         The URL path to access the saved image, or None if failed
+        
+    Raises:
+        InvalidUploadError: If the upload is not a supported image or is too large
     """
     if not file or not file.filename:
         return None
     
-    ensure_directories()
-    
-    # Generate unique filename
-    filename = generate_filename(file.filename, f"member_{user_id}_")
-    filepath = MEMBERS_DIR / filename
-    
     try:
-        # Read and save the file
-        contents = await file.read()
-        with open(filepath, "wb") as f:
-            f.write(contents)
+        filepath = await save_upload(file, MEMBERS_DIR)
         
         # Return the URL path (will be served by FastAPI static files)
-        return f"/uploads/members/{filename}"
+        return upload_url(filepath)
+    except InvalidUploadError:
+        raise
     except Exception as e:
         print(f"Error saving member image: {e}")
         return None
 
 
-async def save_report_image(file: UploadFile, user_id: str = "anonymous") -> Tuple[Optional[str], Optional[bytes]]:
+async def save_report_image(file: UploadFile) -> Optional[str]:
     """
-    Save a report/prescription image and return both the URL and bytes.
+    Save a report/prescription image.
+    The image is read back from disk for processing (see get_upload_path),
+    so the upload is never held in memory as a whole.
     
     Args:
         file: The uploaded file
-        user_id: The user's ID (optional, defaults to anonymous)
         
     Returns:
-        Tuple of (URL path to saved image, image bytes) or (None, None) if failed
+        The URL path to the saved image, or None if failed
+        
+    Raises:
+        InvalidUploadError: If the upload is not a supported image or is too large
     """
     if not file or not file.filename:
-        return None, None
-    
-    ensure_directories()
-    
-    # Generate unique filename
-    filename = generate_filename(file.filename, f"report_{user_id}_")
-    filepath = REPORTS_DIR / filename
+        return None
     
     try:
-        # Read the file contents
-        contents = await file.read()
-        
-        # Save to disk
-        with open(filepath, "wb") as f:
-            f.write(contents)
-        
-        # Return both URL path and bytes (for processing)
-        return f"/uploads/reports/{filename}", contents
+        return upload_url(await save_upload(file, REPORTS_DIR))
+    except InvalidUploadError:
+        raise
     except Exception as e:
         print(f"Error saving report image: {e}")
-        return None, None
+        return None
 
 
-async def save_report_image_from_bytes(image_bytes: bytes, user_id: str, extension: str = ".jpg") -> Optional[str]:
+async def save_report_image_from_bytes(image_bytes: bytes, extension: str = ".jpg") -> Optional[str]:
     """
     Save a report/prescription image from bytes.
     
     Args:
         image_bytes: The image data as bytes
-        user_id: The user's ID
         extension: File extension (default .jpg)
         
     Returns:
         The URL path to access the saved image, or None if failed
     """
-    ensure_directories()
-    
-    # Generate unique filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    unique_id = str(uuid.uuid4())[:8]
-    filename = f"report_{user_id}_{timestamp}_{unique_id}{extension}"
-    filepath = REPORTS_DIR / filename
-    
     try:
-        with open(filepath, "wb") as f:
-            f.write(image_bytes)
-        
-        return f"/uploads/reports/{filename}"
+        return upload_url(await run_in_threadpool(store_bytes, image_bytes, REPORTS_DIR, extension))
     except Exception as e:
         print(f"Error saving report image: {e}")
         return None
 
 
+def get_upload_path(url_path: str) -> Optional[Path]:
+    """
+    Resolve an /uploads/ URL path to a file path inside UPLOAD_DIR.
+    
+    Args:
+        url_path: The URL path (e.g., /uploads/reports/filename.jpg)
+        
+    Returns:
+        The file path, or None if the URL is not a local upload
+    """
+    if not url_path or not url_path.startswith("/uploads/"):
+        return None
+    
+    filepath = (UPLOAD_DIR / url_path.replace("/uploads/", "", 1)).resolve()
+    if UPLOAD_DIR.resolve() not in filepath.parents:
+        return None
+    return filepath
+
+
 def delete_file(url_path: str) -> bool:
     """
     Delete a file by its URL path.
@@ -148,3 +302,106 @@ def delete_file(url_path: str) -> bool:
     except Exception as e:
         print(f"Error deleting file: {e}")
         return False
+
+
+def count_upload_references(db: Session, url_path: str) -> int:
+    """
+    Count the rows referring to an upload: reports, profile pictures and
+    extraction jobs. Blobs are shared between rows, so a file may only be
+    deleted once this reaches zero.
+    
+    Args:
+        db: Database session
+        url_path: The URL path (e.g., /uploads/reports/ab/cd/<hash>.jpg)
+        
+    Returns:
+        Number of referencing rows
+    """
+    return sum(
+        db.query(func.count()).select_from(model).filter(column == url_path).scalar()
+        for model, column in (
+            (Report, Report.image_url),
+            (User, User.picture_url),
+            (ExtractionJob, ExtractionJob.image_url),
+        )
+    )
+
+
+def find_derivatives(filepath: Path) -> List[Path]:
+    """
+    List the cached resized variants of an upload. They are stored as
+    THUMBNAIL_CACHE_DIR/<upload dir>/<upload name without extension>.<key>.w<width>.<format>.
+    
+    Args:
+        filepath: Path of the upload inside UPLOAD_DIR
+        
+    Returns:
+        Paths of its variants
+    """
+    relative = filepath.resolve().relative_to(UPLOAD_DIR.resolve())
+    prefix = f"{relative.stem}."
+    try:
+        entries = list(os.scandir(THUMBNAIL_CACHE_DIR / relative.parent))
+    except OSError:
+        return []
+    return [Path(entry.path) for entry in entries if entry.name.startswith(prefix)]
+
+
+def delete_derivatives(filepath: Path) -> int:
+    """
+    Delete the cached resized variants of an upload.
+    
+    Returns:
+        Number of variants deleted
+    """
+    deleted = 0
+    for path in find_derivatives(filepath):
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        deleted += 1
+    return deleted
+
+
+def release_upload(url_path: str) -> bool:
+    """
+    Delete an upload, and its resized variants, if no row refers to it any
+    more. Files touched within UPLOAD_GC_GRACE_PERIOD are kept: the same
+    blob may have just been uploaded again for a report that is not saved
+    yet. The upload GC deletes them once they are old enough.
+    
+    Args:
+        url_path: The URL path of the upload
+        
+    Returns:
+        True if the file was deleted
+    """
+    filepath = get_upload_path(url_path)
+    if filepath is None:
+        return False
+    
+    try:
+        mtime = filepath.stat().st_mtime
+    except OSError:
+        return False
+    if mtime > time.time() - UPLOAD_GC_GRACE_PERIOD:
+        return False
+    
+    db = SessionLocal()
+    try:
+        if count_upload_references(db, url_path):
+            return False
+    finally:
+        db.close()
+    
+    try:
+        # Re-checked just before deleting: a blob re-uploaded since the
+        # first check has a fresh mtime and is about to be referenced
+        if filepath.stat().st_mtime != mtime:
+            return False
+        filepath.unlink()
+    except OSError:
+        return False
+    delete_derivatives(filepath)
+    return True
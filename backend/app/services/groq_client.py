@@ -0,0 +1,300 @@
+import os
+import random
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+import httpx
+
+from app.utils.rate_limit import TokenBucket, CircuitBreaker, parse_duration
+
+
+GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+# Connection pool and timeout settings (seconds)
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "10"))
+GROQ_READ_TIMEOUT = float(os.getenv("GROQ_READ_TIMEOUT", "120"))
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "64"))
+GROQ_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GROQ_MAX_KEEPALIVE_CONNECTIONS", "32"))
+GROQ_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "60"))
+
+# Maximum number of in-flight Groq requests per worker
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "32"))
+
+# Retry on 429/5xx and connection errors with jittered exponential backoff (seconds)
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "3"))
+GROQ_RETRY_BASE_DELAY = float(os.getenv("GROQ_RETRY_BASE_DELAY", "1"))
+GROQ_RETRY_MAX_DELAY = float(os.getenv("GROQ_RETRY_MAX_DELAY", "30"))
+
+# Longest a request waits for the client-side rate limiter before being sent anyway
+GROQ_RATE_LIMIT_MAX_WAIT = float(os.getenv("GROQ_RATE_LIMIT_MAX_WAIT", "30"))
+
+# Consecutive failures before failing fast, and how long to fail fast for
+GROQ_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("GROQ_CIRCUIT_FAILURE_THRESHOLD", "5"))
+GROQ_CIRCUIT_RESET_TIMEOUT = float(os.getenv("GROQ_CIRCUIT_RESET_TIMEOUT", "30"))
+
+# Rough characters-per-token ratio used to estimate a request's token cost
+CHARS_PER_TOKEN = 4
+
+_client: Optional[httpx.AsyncClient] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+# Groq limits are per model: (requests bucket, tokens bucket)
+_limiters: Dict[str, Tuple[TokenBucket, TokenBucket]] = {}
+_breaker = CircuitBreaker(GROQ_CIRCUIT_FAILURE_THRESHOLD, GROQ_CIRCUIT_RESET_TIMEOUT)
+
+
+class GroqUnavailableError(Exception):
+    """
+    Raised when Groq cannot serve a request right now (rate limited, erroring
+    or unreachable after retries, or the circuit is open).
+    status_code and retry_after are meant to be passed on to the API caller.
+    """
+
+    def __init__(self, message: str, status_code: int = 503, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class GroqRateLimitError(GroqUnavailableError):
+    """Raised when Groq still answers 429 after all retries."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message, status_code=429, retry_after=retry_after)
+
+
+class CircuitOpenError(GroqUnavailableError):
+    """Raised without calling Groq while the circuit breaker is open."""
+
+
+def get_client() -> httpx.AsyncClient:
+    """Get the shared keep-alive HTTP client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                GROQ_READ_TIMEOUT,
+                connect=GROQ_CONNECT_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=GROQ_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=GROQ_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _client
+
+
+def set_client(client: httpx.AsyncClient):
+    """Replace the shared HTTP client (e.g. with a replaying transport for benchmarks)."""
+    global _client
+    _client = client
+
+
+def get_semaphore() -> asyncio.Semaphore:
+    """Get the semaphore bounding concurrent Groq requests."""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def close_client():
+    """Close the shared HTTP client (called on app shutdown)."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+def get_headers() -> Dict[str, str]:
+    """Build request headers, raising ValueError if the API key is missing."""
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise ValueError("GROQ_API_KEY environment variable is not set")
+
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}"
+    }
+
+
+def _get_limiters(model: str) -> Tuple[TokenBucket, TokenBucket]:
+    """Get the (requests, tokens) buckets for a model."""
+    if model not in _limiters:
+        _limiters[model] = (
+            TokenBucket(GROQ_RATE_LIMIT_MAX_WAIT),
+            TokenBucket(GROQ_RATE_LIMIT_MAX_WAIT),
+        )
+    return _limiters[model]
+
+
+def estimate_tokens(payload: Dict) -> int:
+    """
+    Estimate the tokens a request will use against the tokens-per-minute limit.
+    Counts text prompt content plus the completion budget; image parts are
+    skipped since their base64 length says little about their token cost.
+    """
+    prompt_chars = 0
+    for message in payload.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            prompt_chars += len(content)
+        elif isinstance(content, list):
+            prompt_chars += sum(len(part.get("text", "")) for part in content if part.get("type") == "text")
+    completion = payload.get("max_completion_tokens") or payload.get("max_tokens") or 0
+    return prompt_chars // CHARS_PER_TOKEN + completion
+
+
+def _update_limits(model: str, response: httpx.Response):
+    """Resynchronize the model's buckets from the x-ratelimit-* response headers."""
+    for bucket, kind in zip(_get_limiters(model), ("requests", "tokens")):
+        limit = response.headers.get(f"x-ratelimit-limit-{kind}")
+        remaining = response.headers.get(f"x-ratelimit-remaining-{kind}")
+        reset = parse_duration(response.headers.get(f"x-ratelimit-reset-{kind}"))
+        if limit is None or remaining is None or reset is None:
+            continue
+        try:
+            bucket.update(float(limit), float(remaining), reset)
+        except ValueError:
+            continue
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter: a random delay in [d/2, d] for d = base * 2^attempt."""
+    delay = min(GROQ_RETRY_MAX_DELAY, GROQ_RETRY_BASE_DELAY * 2 ** attempt)
+    return random.uniform(delay / 2, delay)
+
+
+def get_rate_limit_stats() -> Dict:
+    """Get the circuit breaker state and current rate limiter levels."""
+    limiters = {}
+    for model, (requests, tokens) in _limiters.items():
+        limiters[model] = {
+            "requests_available": None if requests.capacity is None else int(requests.tokens),
+            "tokens_available": None if tokens.capacity is None else int(tokens.tokens),
+        }
+    return {
+        "circuit": _breaker.state,
+        "consecutive_failures": _breaker.failures,
+        "limiters": limiters,
+    }
+
+
+async def _send(
+    payload: Dict,
+    stream: bool = False,
+    url: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None
+) -> httpx.Response:
+    """
+    Send a chat completion request through the rate limiter, circuit breaker
+    and retry loop. Only the response status is retried; a streamed body is
+    never replayed once the caller starts reading it.
+
+    Args:
+        payload: Chat completion request body
+        stream: Return before reading the body (caller must close the response)
+        url: Chat completions endpoint (defaults to GROQ_API_URL)
+        headers: Request headers (defaults to get_headers())
+
+    Returns:
+        A response whose status is not 429 or 5xx (4xx is left to the caller)
+    """
+    url = url or GROQ_API_URL
+    if headers is None:
+        headers = get_headers()
+    model = payload.get("model", "")
+    requests_bucket, tokens_bucket = _get_limiters(model)
+    cost = estimate_tokens(payload)
+
+    attempt = 0
+    while True:
+        if not _breaker.allow():
+            raise CircuitOpenError(
+                "Groq API is unavailable, please try again later",
+                retry_after=_breaker.retry_after(),
+            )
+
+        await requests_bucket.acquire(1)
+        await tokens_bucket.acquire(cost)
+
+        client = get_client()
+        retry_after = None
+        try:
+            request = client.build_request("POST", url, headers=headers, json=payload)
+            response = await client.send(request, stream=stream)
+        except httpx.TransportError as e:
+            _breaker.record_failure()
+            if attempt >= GROQ_MAX_RETRIES:
+                raise GroqUnavailableError(f"Groq API is unreachable: {str(e)}")
+            reason = type(e).__name__
+        else:
+            _update_limits(model, response)
+            status_code = response.status_code
+            if status_code != 429 and status_code < 500:
+                _breaker.record_success()
+                return response
+
+            await response.aclose()
+            retry_after = parse_duration(response.headers.get("retry-after"))
+            if status_code == 429:
+                # The provider is healthy, just saturated; hold every caller back
+                _breaker.record_success()
+                requests_bucket.drain(retry_after or 0)
+                if attempt >= GROQ_MAX_RETRIES:
+                    raise GroqRateLimitError("Groq API rate limit exceeded", retry_after)
+            else:
+                _breaker.record_failure()
+                if attempt >= GROQ_MAX_RETRIES:
+                    raise GroqUnavailableError(f"Groq API returned {status_code}", retry_after=retry_after)
+            reason = str(status_code)
+
+        delay = max(_backoff_delay(attempt), retry_after or 0)
+        attempt += 1
+        print(f"Groq request failed ({reason}), retry {attempt}/{GROQ_MAX_RETRIES} in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+
+async def post_json(payload: Dict, url: Optional[str] = None, headers: Optional[Dict[str, str]] = None) -> Dict:
+    """
+    Send a non-streaming chat completion request.
+
+    Args:
+        payload: Chat completion request body
+        url: Chat completions endpoint (defaults to GROQ_API_URL)
+        headers: Request headers (defaults to get_headers())
+
+    Returns:
+        Decoded JSON response
+    """
+    async with get_semaphore():
+        response = await _send(payload, url=url, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+
+@asynccontextmanager
+async def stream_post(
+    payload: Dict,
+    url: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None
+) -> AsyncIterator[httpx.Response]:
+    """
+    Send a streaming chat completion request.
+    The concurrency slot is held until the stream is fully consumed.
+
+    Args:
+        payload: Chat completion request body (with stream=True)
+        url: Chat completions endpoint (defaults to GROQ_API_URL)
+        headers: Request headers (defaults to get_headers())
+
+    Yields:
+        The open streaming response
+    """
+    async with get_semaphore():
+        response = await _send(payload, stream=True, url=url, headers=headers)
+        try:
+            response.raise_for_status()
+            yield response
+        finally:
+            await response.aclose()
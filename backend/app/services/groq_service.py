@@ -1,36 +1,37 @@
 import os
-import json
-import requests
-from typing import Optional
+import httpx
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from app.services.llm_backend import get_backend
 
 
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
 MODEL_NAME = "meta-llama/llama-4-maverick-17b-128e-instruct"
+TRANSLATION_MODEL_NAME = "llama-3.3-70b-versatile"
 
+# Extraction modes:
+#   two_pass    - both passes on the VLM, image sent with each pass
+#   text_pass2  - pass 2 runs on a text-only model using only the pass-1 description
+#   single_pass - one VLM request with the structured prompt
+EXTRACTION_MODES = ("two_pass", "text_pass2", "single_pass")
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "two_pass")
+EXTRACTION_TEXT_MODEL_NAME = os.getenv("EXTRACTION_TEXT_MODEL", "llama-3.3-70b-versatile")
 
-def call_groq_vlm(image_data_url: str) -> Optional[str]:
-    """
-    Call Groq VLM API to extract ICD codes from prescription image.
-    Optimized for medical prescription analysis.
-    
-    Args:
-        image_data_url: Base64 encoded image data URL
-        
-    Returns:
-        Full response text from the API, or None if error
-    """
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        raise ValueError("GROQ_API_KEY environment variable is not set")
-    
-    # Optimized medical document analysis prompt
-    messages = [
-        {
-            "role": "user",
-            "content": [
-                {
-                    "type": "text",
-                    "text": """Please analyze this medical document image carefully and provide a detailed description. 
+if EXTRACTION_MODE not in EXTRACTION_MODES:
+    raise ValueError(f"EXTRACTION_MODE must be one of {', '.join(EXTRACTION_MODES)}")
+
+# Format of the structured (pass-2 or single-pass) output:
+#   markdown - bold section headers, streamed and scraped by icd_parser
+#   json     - a JSON object, constrained by EXTRACTION_JSON_SCHEMA on models
+#              in JSON_SCHEMA_MODELS; Groq cannot stream structured outputs,
+#              so this pass is not streamed
+EXTRACTION_OUTPUTS = ("markdown", "json")
+EXTRACTION_OUTPUT = os.getenv("EXTRACTION_OUTPUT", "markdown")
+
+if EXTRACTION_OUTPUT not in EXTRACTION_OUTPUTS:
+    raise ValueError(f"EXTRACTION_OUTPUT must be one of {', '.join(EXTRACTION_OUTPUTS)}")
+
+# Optimized medical document analysis prompt (first pass)
+DESCRIPTION_PROMPT = """Please analyze this medical document image carefully and provide a detailed description. 
 
 FIRST, identify the document type:
 - **Prescription (처방전)**: Contains medication orders, drug names, dosages, pharmacy instructions
@@ -48,108 +49,219 @@ Then focus on extracting:
 8. Any other relevant medical information
 
 Please be thorough and extract all text and medical information from the document."""
-                },
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": image_data_url
-                    }
-                }
-            ]
-        }
-    ]
-    
-    # First pass: Get detailed description
-    payload_description = {
-        "messages": messages,
-        "model": MODEL_NAME,
-        "temperature": 0.3,  # Lower temperature for more accurate medical data
-        "max_completion_tokens": 2048,  # Increased for detailed medical info
-        "top_p": 0.9,
-        "stream": True,
-        "stop": None
-    }
-    
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-    
-    try:
-        # Get detailed description first
-        response = requests.post(
-            GROQ_API_URL,
-            headers=headers,
-            json=payload_description,
-            stream=True
-        )
-        response.raise_for_status()
-        
-        description = ""
-        for line in response.iter_lines():
-            if line:
-                line_str = line.decode('utf-8')
-                if line_str.startswith('data: '):
-                    data_str = line_str[6:]
-                    if data_str.strip() == '[DONE]':
-                        break
-                    try:
-                        chunk = json.loads(data_str)
-                        if 'choices' in chunk and len(chunk['choices']) > 0:
-                            delta = chunk['choices'][0].get('delta', {})
-                            if 'content' in delta:
-                                description += delta['content']
-                    except json.JSONDecodeError:
-                        continue
-        
-        if not description:
-            return None
-        
-        # Second pass: Extract structured medical information
-        extraction_messages = [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": """Based on the document analysis, please extract and provide the following information in a structured format:
 
-**Document Type:** [Identify the type of medical document. Choose ONE from: "prescription", "medical_certificate", or "examination_report". Use these clues:
+# Structured output format shared by the two-pass and single-pass prompts
+EXTRACTION_FORMAT = """**Document Type:** [Identify the type of medical document. Choose ONE from: "prescription", "medical_certificate", or "examination_report". Use these clues:
 - prescription (처방전): Has medication orders, drug names, dosages, pharmacy/Rx instructions
 - medical_certificate (진단서): Official diagnosis document, doctor's certification of medical condition, may have hospital letterhead
 - examination_report (검진서): Health checkup, lab results, test findings, screening report]
 
 **Disease Name:** [The primary medical condition or diagnosis being treated. If multiple conditions, list the main one. If not explicitly stated, infer from the medication prescribed and its common uses.]
 
-**Disease ICD Code:** [The ICD-10 code for the disease/condition. Look for codes on the document (format: letter followed by numbers, e.g., R10, K59.0, I10). If not found, provide the most likely ICD-10 code based on the disease name and medication indication.]
+**Disease ICD Code:** [The ICD-10 code for the disease/condition as written on the document (format: letter followed by numbers, e.g., R10, K59.0, I10). Leave blank if no code is visible.]
 
 **Medicine Name:** [The full name(s) of the medication(s) prescribed. Include generic and brand names if both are present. Leave blank if not applicable.]
 
 **Full Description:** [A comprehensive description of the document including patient details, medications, dosages, instructions, test results, and any other relevant medical information.]
 
-Please be precise and accurate. For ICD codes, use standard ICD-10 format. If an ICD code is not visible on the document, infer the most appropriate code based on the medical condition and standard medical coding practices."""
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": image_data_url
-                        }
-                    }
-                ]
+Please be precise and accurate. For ICD codes, use standard ICD-10 format."""
+
+# Structured extraction prompt (second pass)
+EXTRACTION_PROMPT = "Based on the document analysis, please extract and provide the following information in a structured format:\n\n" + EXTRACTION_FORMAT
+
+# Combined prompt for single-pass mode
+SINGLE_PASS_PROMPT = "Please analyze this medical document image carefully, read all of its text, and provide the following information in a structured format:\n\n" + EXTRACTION_FORMAT
+
+# Structured output as a JSON object (EXTRACTION_OUTPUT=json)
+EXTRACTION_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "report_type": {"type": "string", "enum": ["prescription", "medical_certificate", "examination_report"]},
+        "disease_name": {"type": ["string", "null"]},
+        "disease_icd_code": {"type": ["string", "null"]},
+        "medicine_name": {"type": ["string", "null"]},
+        "full_description": {"type": "string"},
+    },
+    "required": ["report_type", "disease_name", "disease_icd_code", "medicine_name", "full_description"],
+    "additionalProperties": False,
+}
+
+EXTRACTION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "extracted_report", "schema": EXTRACTION_JSON_SCHEMA},
+}
+
+# Groq models that accept a json_schema response format. Other models (e.g.
+# the default EXTRACTION_TEXT_MODEL) only get JSON mode, which guarantees
+# valid JSON but not the schema; parse_extraction_response falls back to
+# parse_icd_codes when the object does not match.
+JSON_SCHEMA_MODELS = frozenset(filter(None, os.getenv(
+    "JSON_SCHEMA_MODELS",
+    "meta-llama/llama-4-maverick-17b-128e-instruct,meta-llama/llama-4-scout-17b-16e-instruct,"
+    "openai/gpt-oss-20b,openai/gpt-oss-120b,moonshotai/kimi-k2-instruct",
+).split(",")))
+JSON_OBJECT_RESPONSE_FORMAT = {"type": "json_object"}
+
+EXTRACTION_JSON_FORMAT = """Respond with a JSON object with these keys:
+- "report_type": "prescription" (처방전: medication orders, drug names, dosages), "medical_certificate" (진단서: official diagnosis or doctor's certification of a condition) or "examination_report" (검진서: health checkup, lab or screening results)
+- "disease_name": the primary condition or diagnosis; if not stated, infer it from the medication prescribed
+- "disease_icd_code": the ICD-10 code as written on the document (e.g. "K29.7"), or null if none is visible
+- "medicine_name": the prescribed medication(s) with doses, or null
+- "full_description": a comprehensive description of the document: patient details, medications, dosages, instructions, test results"""
+
+EXTRACTION_JSON_PROMPT = "Based on the document analysis, extract the following information.\n\n" + EXTRACTION_JSON_FORMAT
+
+SINGLE_PASS_JSON_PROMPT = "Please analyze this medical document image carefully, read all of its text, and extract the following information.\n\n" + EXTRACTION_JSON_FORMAT
+
+EXTRACTION_JSON_FOLLOWUP = "Now return the JSON object."
+
+# Bumped whenever the prompts change what the model returns, so cached results are not reused
+# 2: codes are only read from the document; missing codes come from the local ICD-10 name index
+EXTRACTION_PROMPT_VERSION = 2
+
+EXTRACTION_FOLLOWUP = "Now extract the structured information as requested: Document Type, Disease Name, Disease ICD Code, Medicine Name, and Full Description."
+
+
+def get_extraction_pipeline(mode: Optional[str] = None, output: Optional[str] = None) -> str:
+    """
+    Identify the models, mode and output format that produce extraction results.
+    Used to scope cached results so a mode or model change never serves stale output.
+    """
+    mode = mode or EXTRACTION_MODE
+    if (output or EXTRACTION_OUTPUT) == "json":
+        mode = f"{mode}+json"
+    if mode.startswith("text_pass2"):
+        return f"v{EXTRACTION_PROMPT_VERSION}:{mode}:{MODEL_NAME}:{EXTRACTION_TEXT_MODEL_NAME}"
+    return f"v{EXTRACTION_PROMPT_VERSION}:{mode}:{MODEL_NAME}"
+
+
+def _image_message(text: str, image_data_url: str) -> Dict:
+    """Build a user message carrying a prompt and an image."""
+    return {
+        "role": "user",
+        "content": [
+            {
+                "type": "text",
+                "text": text
             },
+            {
+                "type": "image_url",
+                "image_url": {
+                    "url": image_data_url
+                }
+            }
+        ]
+    }
+
+
+async def _structured_output(payload: Dict, output: str) -> AsyncIterator[str]:
+    """
+    Run the request that produces the structured output.
+    Markdown output is streamed; JSON output is requested with a response
+    schema (JSON mode on models without schema support), which Groq only
+    supports without streaming, and yielded whole.
+    """
+    if output == "json":
+        if payload["model"] in JSON_SCHEMA_MODELS:
+            response_format = EXTRACTION_RESPONSE_FORMAT
+        else:
+            response_format = JSON_OBJECT_RESPONSE_FORMAT
+        content = await get_backend().complete(dict(payload, stream=False, response_format=response_format))
+        if content:
+            yield content
+        return
+    
+    async for content in get_backend().stream(payload):
+        yield content
+
+
+async def stream_groq_vlm(
+    image_data_url: str,
+    mode: Optional[str] = None,
+    output: Optional[str] = None
+) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Run the extraction passes and yield tokens as they arrive.
+    Pass 2 is skipped if pass 1 produced no description.
+    
+    Args:
+        image_data_url: Base64 encoded image data URL
+        mode: One of EXTRACTION_MODES (defaults to EXTRACTION_MODE)
+        output: One of EXTRACTION_OUTPUTS (defaults to EXTRACTION_OUTPUT)
+        
+    Yields:
+        Tuples of (pass number, content delta). Pass 2 always carries the
+        structured output; single-pass mode only yields pass 2. JSON output
+        arrives as a single pass-2 chunk.
+    """
+    mode = mode or EXTRACTION_MODE
+    if mode not in EXTRACTION_MODES:
+        raise ValueError(f"Unknown extraction mode: {mode}")
+    output = output or EXTRACTION_OUTPUT
+    if output not in EXTRACTION_OUTPUTS:
+        raise ValueError(f"Unknown extraction output: {output}")
+    json_output = output == "json"
+    
+    try:
+        if mode == "single_pass":
+            payload_single = {
+                "messages": [_image_message(SINGLE_PASS_JSON_PROMPT if json_output else SINGLE_PASS_PROMPT, image_data_url)],
+                "model": MODEL_NAME,
+                "temperature": 0.2,
+                "max_completion_tokens": 2048,
+                "top_p": 0.8,
+                "stream": True,
+                "stop": None
+            }
+            async for content in _structured_output(payload_single, output):
+                yield 2, content
+            return
+        
+        # First pass: Get detailed description
+        payload_description = {
+            "messages": [_image_message(DESCRIPTION_PROMPT, image_data_url)],
+            "model": MODEL_NAME,
+            "temperature": 0.3,  # Lower temperature for more accurate medical data
+            "max_completion_tokens": 2048,  # Increased for detailed medical info
+            "top_p": 0.9,
+            "stream": True,
+            "stop": None
+        }
+        
+        description_parts = []
+        async for content in get_backend().stream(payload_description):
+            description_parts.append(content)
+            yield 1, content
+        
+        description = "".join(description_parts)
+        if not description:
+            return
+        
+        # Second pass: Extract structured medical information
+        extraction_prompt = EXTRACTION_JSON_PROMPT if json_output else EXTRACTION_PROMPT
+        if mode == "text_pass2":
+            # The description already holds everything read from the image
+            extraction_request = {"role": "user", "content": extraction_prompt}
+            extraction_model = EXTRACTION_TEXT_MODEL_NAME
+        else:
+            extraction_request = _image_message(extraction_prompt, image_data_url)
+            extraction_model = MODEL_NAME
+        
+        extraction_messages = [
+            extraction_request,
             {
                 "role": "assistant",
                 "content": description
             },
             {
                 "role": "user",
-                "content": "Now extract the structured information as requested: Document Type, Disease Name, Disease ICD Code, Medicine Name, and Full Description."
+                "content": EXTRACTION_JSON_FOLLOWUP if json_output else EXTRACTION_FOLLOWUP
             }
         ]
         
         payload_extraction = {
             "messages": extraction_messages,
-            "model": MODEL_NAME,
+            "model": extraction_model,
             "temperature": 0.2,  # Very low temperature for precise extraction
             "max_completion_tokens": 1536,
             "top_p": 0.8,
@@ -158,37 +270,37 @@ Please be precise and accurate. For ICD codes, use standard ICD-10 format. If an
         }
         
         # Get structured extraction
-        response = requests.post(
-            GROQ_API_URL,
-            headers=headers,
-            json=payload_extraction,
-            stream=True
-        )
-        response.raise_for_status()
-        
-        full_content = ""
-        for line in response.iter_lines():
-            if line:
-                line_str = line.decode('utf-8')
-                if line_str.startswith('data: '):
-                    data_str = line_str[6:]
-                    if data_str.strip() == '[DONE]':
-                        break
-                    try:
-                        chunk = json.loads(data_str)
-                        if 'choices' in chunk and len(chunk['choices']) > 0:
-                            delta = chunk['choices'][0].get('delta', {})
-                            if 'content' in delta:
-                                full_content += delta['content']
-                    except json.JSONDecodeError:
-                        continue
+        async for content in _structured_output(payload_extraction, output):
+            yield 2, content
         
-        return full_content if full_content else description
-        
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         raise Exception(f"Error calling Groq API: {str(e)}")
 
 
+async def call_groq_vlm(
+    image_data_url: str,
+    mode: Optional[str] = None,
+    output: Optional[str] = None
+) -> Optional[str]:
+    """
+    Call Groq VLM API to extract ICD codes from prescription image.
+    Optimized for medical prescription analysis.
+    
+    Args:
+        image_data_url: Base64 encoded image data URL
+        mode: One of EXTRACTION_MODES (defaults to EXTRACTION_MODE)
+        output: One of EXTRACTION_OUTPUTS (defaults to EXTRACTION_OUTPUT)
+        
+    Returns:
+        Full response text from the API, or None if error
+    """
+    parts = {1: [], 2: []}
+    async for pass_number, content in stream_groq_vlm(image_data_url, mode, output):
+        parts[pass_number].append(content)
+    
+    return "".join(parts[2]) or "".join(parts[1]) or None
+
+
 # Language name mapping for translation prompts
 LANGUAGE_NAMES = {
     "en": "English",
@@ -204,7 +316,7 @@ LANGUAGE_NAMES = {
 }
 
 
-def translate_with_groq(text: str, target_language: str) -> str:
+async def translate_with_groq(text: str, target_language: str) -> str:
     """
     Translate text to the target language using Groq LLM.
     
@@ -215,10 +327,6 @@ def translate_with_groq(text: str, target_language: str) -> str:
     Returns:
         Translated text
     """
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        raise ValueError("GROQ_API_KEY environment variable is not set")
-    
     language_name = LANGUAGE_NAMES.get(target_language, target_language)
     
     messages = [
@@ -235,32 +343,20 @@ def translate_with_groq(text: str, target_language: str) -> str:
     # Use text-only model for translation
     payload = {
         "messages": messages,
-        "model": "llama-3.3-70b-versatile",
+        "model": TRANSLATION_MODEL_NAME,
         "temperature": 0.2,
         "max_completion_tokens": 2048,
         "top_p": 0.9,
         "stream": False,
     }
     
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-    
     try:
-        response = requests.post(
-            GROQ_API_URL,
-            headers=headers,
-            json=payload
-        )
-        response.raise_for_status()
-        
-        data = response.json()
-        if 'choices' in data and len(data['choices']) > 0:
-            return data['choices'][0]['message']['content'].strip()
+        translated = await get_backend().complete(payload)
+        if translated is not None:
+            return translated.strip()
         
         raise Exception("No translation returned from API")
         
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         raise Exception(f"Error calling Groq API for translation: {str(e)}")
 
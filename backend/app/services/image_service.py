@@ -0,0 +1,247 @@
+import os
+import base64
+import asyncio
+import hashlib
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, BinaryIO, Callable, NamedTuple, Optional, Union
+from PIL import Image, ImageOps
+
+# Normalization settings for images sent to the VLM
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "2048"))
+IMAGE_OUTPUT_FORMAT = os.getenv("IMAGE_OUTPUT_FORMAT", "JPEG").upper()  # JPEG or WEBP
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+IMAGE_GRAYSCALE = os.getenv("IMAGE_GRAYSCALE", "false").lower() == "true"
+
+# Worker pool for CPU-bound image work ("thread" or "process")
+IMAGE_WORKER_MODE = os.getenv("IMAGE_WORKER_MODE", "thread")
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(os.cpu_count() or 2)))
+# Jobs allowed in flight (queued + running) before callers have to wait
+IMAGE_QUEUE_SIZE = int(os.getenv("IMAGE_QUEUE_SIZE", str(IMAGE_WORKERS * 4)))
+# Seconds a caller waits for a queue slot before the request is rejected
+IMAGE_QUEUE_TIMEOUT = float(os.getenv("IMAGE_QUEUE_TIMEOUT", "10"))
+
+EXIF_ORIENTATION = 0x0112
+
+if IMAGE_OUTPUT_FORMAT not in ("JPEG", "WEBP"):
+    raise ValueError("IMAGE_OUTPUT_FORMAT must be JPEG or WEBP")
+
+if IMAGE_WORKER_MODE not in ("thread", "process"):
+    raise ValueError("IMAGE_WORKER_MODE must be thread or process")
+
+_executor: Optional[Executor] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+
+class InvalidImageError(ValueError):
+    """Raised when uploaded bytes cannot be decoded as an image."""
+
+
+class ImageQueueFullError(RuntimeError):
+    """Raised when the image worker queue stays full for IMAGE_QUEUE_TIMEOUT."""
+
+
+class NormalizedImage(NamedTuple):
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    original_bytes: int
+
+    @property
+    def reduction(self) -> float:
+        """Fraction of the original size saved by normalization."""
+        if not self.original_bytes:
+            return 0.0
+        return 1 - len(self.data) / self.original_bytes
+
+
+class PreparedImage(NamedTuple):
+    image_hash: str
+    data_url: str
+    mime_type: str
+    width: int
+    height: int
+    original_bytes: int
+    normalized_bytes: int
+
+    @property
+    def reduction(self) -> float:
+        """Fraction of the original size saved by normalization."""
+        if not self.original_bytes:
+            return 0.0
+        return 1 - self.normalized_bytes / self.original_bytes
+
+
+def normalize_image(source: Union[bytes, str]) -> NormalizedImage:
+    """
+    Prepare an uploaded image for the VLM.
+    Applies EXIF orientation, flattens transparency onto white, downscales so
+    the longest edge is at most IMAGE_MAX_EDGE and re-encodes as
+    IMAGE_OUTPUT_FORMAT (optionally grayscale).
+
+    Args:
+        source: Original uploaded image bytes, or the path of the saved upload
+
+    Returns:
+        NormalizedImage with the encoded bytes and size information
+    """
+    if isinstance(source, bytes):
+        return _normalize_image(BytesIO(source))
+    with open(source, 'rb') as f:
+        return _normalize_image(f)
+
+
+def _normalize_image(fp: BinaryIO) -> NormalizedImage:
+    original_bytes = fp.seek(0, os.SEEK_END)
+    fp.seek(0)
+
+    mode = 'L' if IMAGE_GRAYSCALE else 'RGB'
+    image = Image.open(fp)
+    source_format = image.format
+    source_mode = image.mode
+    source_size = image.size
+
+    # Let the JPEG decoder downscale by a power of two while decoding
+    if image.format == 'JPEG':
+        image.draft(mode, (IMAGE_MAX_EDGE, IMAGE_MAX_EDGE))
+    resized = image.size != source_size
+
+    rotated = image.getexif().get(EXIF_ORIENTATION, 1) != 1
+    image = ImageOps.exif_transpose(image)
+
+    # Convert to RGB if necessary (for PNG with transparency)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+        rgb_image.paste(image, mask=image.split()[-1])
+        image = rgb_image
+
+    if image.mode != mode:
+        image = image.convert(mode)
+
+    if max(image.size) > IMAGE_MAX_EDGE:
+        resized = True
+        image.thumbnail((IMAGE_MAX_EDGE, IMAGE_MAX_EDGE), Image.LANCZOS)
+
+    buffered = BytesIO()
+    if IMAGE_OUTPUT_FORMAT == 'JPEG':
+        image.save(buffered, format='JPEG', quality=IMAGE_QUALITY, optimize=True)
+    else:
+        image.save(buffered, format='WEBP', quality=IMAGE_QUALITY, method=4)
+
+    # Re-encoding can inflate already compact images (e.g. text-only PNGs);
+    # send the original when it needs no geometric change and is smaller
+    data = buffered.getvalue()
+    if (
+        not resized
+        and not rotated
+        and source_mode == mode
+        and source_format in ('JPEG', 'PNG', 'WEBP')
+        and original_bytes <= len(data)
+    ):
+        fp.seek(0)
+        return NormalizedImage(
+            data=fp.read(),
+            mime_type=f"image/{source_format.lower()}",
+            width=image.width,
+            height=image.height,
+            original_bytes=original_bytes,
+        )
+
+    return NormalizedImage(
+        data=data,
+        mime_type=f"image/{IMAGE_OUTPUT_FORMAT.lower()}",
+        width=image.width,
+        height=image.height,
+        original_bytes=original_bytes,
+    )
+
+
+def prepare_image(source: Union[bytes, str]) -> PreparedImage:
+    """
+    Decode, validate and normalize an upload and build its VLM data URL.
+    The image is decoded once; decoding errors double as validation.
+    Runs in the image worker pool.
+
+    Args:
+        source: Original uploaded image bytes, or the path of the saved
+            upload (only the path is sent to a process worker)
+
+    Returns:
+        PreparedImage with the cache key and data URL
+    """
+    try:
+        normalized = normalize_image(source)
+    except Exception as e:
+        raise InvalidImageError(str(e))
+
+    image_base64 = base64.b64encode(normalized.data).decode("ascii")
+
+    return PreparedImage(
+        image_hash=hashlib.sha256(normalized.data).hexdigest(),
+        data_url=f"data:{normalized.mime_type};base64,{image_base64}",
+        mime_type=normalized.mime_type,
+        width=normalized.width,
+        height=normalized.height,
+        original_bytes=normalized.original_bytes,
+        normalized_bytes=len(normalized.data),
+    )
+
+
+def _get_executor() -> Executor:
+    """Get the shared image worker pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        if IMAGE_WORKER_MODE == "process":
+            _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image")
+    return _executor
+
+
+def _get_slots() -> asyncio.Semaphore:
+    """Get the semaphore bounding queued + running image jobs."""
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(IMAGE_QUEUE_SIZE)
+    return _slots
+
+
+async def run_image_job(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run a CPU-bound image function in the worker pool.
+    Waits for a queue slot when IMAGE_QUEUE_SIZE jobs are already in flight.
+
+    Args:
+        func: Top-level (picklable) function to run
+        *args: Arguments for func
+
+    Returns:
+        The function's return value
+    """
+    slots = _get_slots()
+    try:
+        await asyncio.wait_for(slots.acquire(), IMAGE_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise ImageQueueFullError("Image processing queue is full")
+
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), func, *args)
+    finally:
+        slots.release()
+
+
+async def prepare_image_async(source: Union[bytes, str]) -> PreparedImage:
+    """Run prepare_image in the worker pool."""
+    return await run_image_job(prepare_image, source)
+
+
+def shutdown_image_pool():
+    """Stop the image worker pool (called on app shutdown)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
@@ -0,0 +1,311 @@
+import os
+import hmac
+import json
+import hashlib
+import secrets
+import socket
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_, and_
+
+from app.database import SessionLocal
+from app.models.extraction_job import ExtractionJob, JobStatus
+from app.services.cache_service import purge_expired_extractions
+from app.services.extraction_service import extract_prepared_image
+from app.services.groq_client import GroqUnavailableError
+from app.services.file_service import get_upload_path
+from app.services.image_service import prepare_image_async, InvalidImageError
+
+# Background extraction job settings
+JOB_WORKERS_ENABLED = os.getenv("JOB_WORKERS_ENABLED", "true").lower() == "true"
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))  # concurrent jobs per app process
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "5"))  # seconds, doubled per attempt
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "300"))  # running jobs older than this are reclaimed
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "86400"))  # finished jobs are deleted after this
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+JOB_PURGE_INTERVAL = float(os.getenv("JOB_PURGE_INTERVAL", "600"))
+
+FINISHED_STATUSES = (JobStatus.SUCCEEDED.value, JobStatus.FAILED.value)
+
+_worker_id = f"{socket.gethostname()}:{os.getpid()}"
+_tasks: List[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+
+
+def _token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def enqueue_extraction(image_url: str, fields_only: bool = False) -> Tuple[str, str]:
+    """
+    Queue an extraction job for a saved upload.
+
+    Args:
+        image_url: URL path of the saved image
+        fields_only: Stop once the structured fields are parsed
+
+    Returns:
+        (job ID, job token); the token is only stored hashed, and reading
+        the job back requires it
+    """
+    token = secrets.token_urlsafe(32)
+    db = SessionLocal()
+    try:
+        job = ExtractionJob(
+            image_url=image_url,
+            fields_only=fields_only,
+            token_hash=_token_hash(token),
+            available_at=datetime.utcnow(),
+        )
+        db.add(job)
+        db.commit()
+        return job.id, token
+    finally:
+        db.close()
+
+
+def get_job(job_id: str, token: Optional[str]) -> Optional[Dict]:
+    """
+    Get a job's status and, once finished, its result or error.
+
+    Args:
+        job_id: The job ID
+        token: The job token returned by enqueue_extraction
+
+    Returns:
+        Dict shaped like ExtractionJobResponse, or None if not found or
+        the token does not match
+    """
+    if not token:
+        return None
+    db = SessionLocal()
+    try:
+        job = db.query(ExtractionJob).filter(ExtractionJob.id == job_id).first()
+        if job is None or job.token_hash is None:
+            return None
+        if not hmac.compare_digest(job.token_hash, _token_hash(token)):
+            return None
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "attempts": job.attempts,
+            "result": json.loads(job.result) if job.result else None,
+            "error": job.error,
+        }
+    finally:
+        db.close()
+
+
+def claim_job(worker_id: str) -> Optional[Tuple[str, str, bool]]:
+    """
+    Atomically claim the next runnable job.
+    Queued jobs whose retry delay has passed are runnable, as are running
+    jobs abandoned by a worker for longer than JOB_TIMEOUT.
+
+    Returns:
+        Tuple of (job ID, image URL, fields_only), or None if nothing is runnable
+    """
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        job = db.query(ExtractionJob).filter(
+            or_(
+                and_(
+                    ExtractionJob.status == JobStatus.QUEUED.value,
+                    ExtractionJob.available_at <= now
+                ),
+                and_(
+                    ExtractionJob.status == JobStatus.RUNNING.value,
+                    ExtractionJob.started_at < now - timedelta(seconds=JOB_TIMEOUT),
+                    ExtractionJob.attempts < JOB_MAX_ATTEMPTS
+                )
+            )
+        ).order_by(ExtractionJob.available_at).with_for_update(skip_locked=True).first()
+
+        if job is None:
+            db.rollback()
+            return None
+
+        # Guard on the observed state so two workers can never both claim the job
+        claimed = db.query(ExtractionJob).filter(
+            ExtractionJob.id == job.id,
+            ExtractionJob.status == job.status,
+            ExtractionJob.attempts == job.attempts
+        ).update({
+            ExtractionJob.status: JobStatus.RUNNING.value,
+            ExtractionJob.attempts: job.attempts + 1,
+            ExtractionJob.locked_by: worker_id,
+            ExtractionJob.started_at: now,
+        }, synchronize_session=False)
+        db.commit()
+
+        if claimed != 1:
+            return None
+        return job.id, job.image_url, job.fields_only
+    finally:
+        db.close()
+
+
+def complete_job(job_id: str, result: Dict):
+    """Mark a job as succeeded and store its result."""
+    db = SessionLocal()
+    try:
+        db.query(ExtractionJob).filter(ExtractionJob.id == job_id).update({
+            ExtractionJob.status: JobStatus.SUCCEEDED.value,
+            ExtractionJob.result: json.dumps(result, ensure_ascii=False),
+            ExtractionJob.error: None,
+            ExtractionJob.finished_at: datetime.utcnow(),
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def fail_job(job_id: str, error: str, retry: bool = True, retry_after: Optional[float] = None):
+    """
+    Record a failed attempt.
+    The job is requeued with exponential backoff until JOB_MAX_ATTEMPTS is reached.
+
+    Args:
+        job_id: The job ID
+        error: Error message to store
+        retry: False for permanent errors (e.g. an invalid image)
+        retry_after: Minimum delay in seconds before the next attempt (e.g. from Groq)
+    """
+    db = SessionLocal()
+    try:
+        job = db.query(ExtractionJob).filter(ExtractionJob.id == job_id).first()
+        if job is None:
+            return
+
+        now = datetime.utcnow()
+        job.error = error
+        if retry and job.attempts < JOB_MAX_ATTEMPTS:
+            job.status = JobStatus.QUEUED.value
+            delay = max(JOB_RETRY_DELAY * 2 ** (job.attempts - 1), retry_after or 0)
+            job.available_at = now + timedelta(seconds=delay)
+        else:
+            job.status = JobStatus.FAILED.value
+            job.finished_at = now
+        db.commit()
+    finally:
+        db.close()
+
+
+def purge_expired_jobs() -> int:
+    """
+    Delete finished jobs older than JOB_RESULT_TTL and fail abandoned jobs
+    that have no attempts left.
+
+    Returns:
+        Number of jobs deleted
+    """
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        db.query(ExtractionJob).filter(
+            ExtractionJob.status == JobStatus.RUNNING.value,
+            ExtractionJob.started_at < now - timedelta(seconds=JOB_TIMEOUT),
+            ExtractionJob.attempts >= JOB_MAX_ATTEMPTS
+        ).update({
+            ExtractionJob.status: JobStatus.FAILED.value,
+            ExtractionJob.error: "Job timed out",
+            ExtractionJob.finished_at: now,
+        }, synchronize_session=False)
+
+        deleted = db.query(ExtractionJob).filter(
+            ExtractionJob.status.in_(FINISHED_STATUSES),
+            ExtractionJob.finished_at < now - timedelta(seconds=JOB_RESULT_TTL)
+        ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+
+async def _process_job(job_id: str, image_url: str, fields_only: bool):
+    """Run normalize -> VLM -> parse for a claimed job and record the outcome."""
+    filepath = get_upload_path(image_url)
+    if filepath is None or not await run_in_threadpool(filepath.is_file):
+        await run_in_threadpool(fail_job, job_id, "Image not found", False)
+        return
+
+    try:
+        prepared = await prepare_image_async(str(filepath))
+        result = await extract_prepared_image(prepared, fields_only)
+    except InvalidImageError as e:
+        await run_in_threadpool(fail_job, job_id, f"Invalid image file: {str(e)}", False)
+        return
+    except GroqUnavailableError as e:
+        print(f"Extraction job {job_id} deferred: {e}")
+        await run_in_threadpool(fail_job, job_id, str(e), True, e.retry_after)
+        return
+    except Exception as e:
+        print(f"Extraction job {job_id} failed: {e}")
+        await run_in_threadpool(fail_job, job_id, str(e))
+        return
+
+    result["image_url"] = image_url
+    await run_in_threadpool(complete_job, job_id, result)
+
+
+async def _worker_loop(index: int):
+    """Claim and run jobs until cancelled."""
+    worker_id = f"{_worker_id}:{index}"
+    last_purge = 0.0
+    loop = asyncio.get_running_loop()
+
+    while True:
+        try:
+            if index == 0 and loop.time() - last_purge > JOB_PURGE_INTERVAL:
+                last_purge = loop.time()
+                purged = await run_in_threadpool(purge_expired_jobs)
+                if purged:
+                    print(f"Purged {purged} expired extraction jobs")
+                purged = await run_in_threadpool(purge_expired_extractions)
+                if purged:
+                    print(f"Purged {purged} expired extraction cache entries")
+
+            job = await run_in_threadpool(claim_job, worker_id)
+            if job is None:
+                try:
+                    await asyncio.wait_for(_wakeup.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                _wakeup.clear()
+                continue
+
+            await _process_job(*job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Extraction worker error: {e}")
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+
+def notify_workers():
+    """Wake idle workers in this process after enqueueing a job."""
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def start_workers():
+    """Start the background extraction workers (called on app startup)."""
+    global _wakeup
+    if not JOB_WORKERS_ENABLED or _tasks:
+        return
+    _wakeup = asyncio.Event()
+    for index in range(JOB_WORKERS):
+        _tasks.append(asyncio.create_task(_worker_loop(index)))
+    print(f"Started {JOB_WORKERS} extraction job workers")
+
+
+async def stop_workers():
+    """Cancel the background extraction workers (called on app shutdown)."""
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
@@ -0,0 +1,106 @@
+import os
+from typing import AsyncIterator, Dict, Optional
+
+from app.services.groq_client import GROQ_API_URL, post_json, stream_post, get_headers
+from app.utils.sse_decoder import SSEDecoder
+
+# LLM provider used for extraction and translation: "groq" or "mock"
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+# Chat completions endpoint of the local stand-in server (benchmarks/mock_groq_server.py)
+MOCK_LLM_URL = os.getenv("MOCK_LLM_URL", "http://127.0.0.1:8001/openai/v1/chat/completions")
+
+_backend: Optional["LLMBackend"] = None
+
+
+class LLMBackend:
+    """
+    Chat completion provider used by groq_service.
+    Payloads are OpenAI-style chat completion bodies; messages may carry
+    image_url content parts for vision models.
+    """
+
+    name = "base"
+
+    async def complete(self, payload: Dict) -> Optional[str]:
+        """
+        Run a non-streaming completion.
+
+        Returns:
+            The message content of the first choice, or None if there is none
+        """
+        raise NotImplementedError
+
+    async def stream(self, payload: Dict) -> AsyncIterator[str]:
+        """
+        Run a streaming completion.
+
+        Yields:
+            Content text of each streamed chunk
+        """
+        raise NotImplementedError
+        yield
+
+
+class ChatCompletionsBackend(LLMBackend):
+    """Provider speaking Groq's OpenAI-compatible chat completions API over HTTP."""
+
+    def __init__(self, name: str, url: str, requires_api_key: bool = True):
+        self.name = name
+        self.url = url
+        self.requires_api_key = requires_api_key
+
+    def _headers(self) -> Dict[str, str]:
+        if self.requires_api_key:
+            return get_headers()
+        return {"Content-Type": "application/json"}
+
+    async def complete(self, payload: Dict) -> Optional[str]:
+        data = await post_json(payload, self.url, self._headers())
+        if 'choices' in data and len(data['choices']) > 0:
+            return data['choices'][0]['message']['content']
+        return None
+
+    async def stream(self, payload: Dict) -> AsyncIterator[str]:
+        decoder = SSEDecoder()
+        async with stream_post(payload, self.url, self._headers()) as response:
+            async for data in response.aiter_bytes():
+                for content in decoder.feed(data):
+                    yield content
+                if decoder.done:
+                    break
+
+        stats = decoder.stats()
+        if stats.time_to_first_token is not None:
+            print(
+                f"{self.name} {payload.get('model')}: {stats.completion_tokens} tokens, "
+                f"first token {stats.time_to_first_token * 1000:.0f}ms, {stats.tokens_per_second:.0f} tokens/s"
+            )
+
+
+def create_backend(name: str) -> LLMBackend:
+    """
+    Build a backend by name.
+
+    Args:
+        name: "groq" for the Groq API, "mock" for the local stand-in server
+            at MOCK_LLM_URL (no API key needed)
+    """
+    if name == "groq":
+        return ChatCompletionsBackend("groq", GROQ_API_URL)
+    if name == "mock":
+        return ChatCompletionsBackend("mock", MOCK_LLM_URL, requires_api_key=False)
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+
+def get_backend() -> LLMBackend:
+    """Get the configured LLM backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        _backend = create_backend(LLM_BACKEND)
+    return _backend
+
+
+def set_backend(backend: LLMBackend):
+    """Replace the LLM backend (e.g. with an in-process fake for benchmarks)."""
+    global _backend
+    _backend = backend
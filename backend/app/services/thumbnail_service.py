@@ -0,0 +1,209 @@
+import os
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image, ImageOps
+
+from app.services.file_service import UPLOAD_DIR, THUMBNAIL_CACHE_DIR
+from app.services.image_service import InvalidImageError, run_image_job
+
+# Widths derivatives are made at; a requested width is rounded up to the
+# next one, so each upload has at most this many variants per format
+THUMBNAIL_WIDTHS = tuple(sorted(int(w) for w in os.getenv("THUMBNAIL_WIDTHS", "160,320,640,1280").split(",")))
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+# Once the cache grows past this, the least recently served variants are
+# evicted until it is back under THUMBNAIL_CACHE_LOW_WATER of it
+THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv("THUMBNAIL_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+THUMBNAIL_CACHE_LOW_WATER = 0.9
+
+FORMATS = {"webp": ("WEBP", "image/webp"), "jpg": ("JPEG", "image/jpeg")}
+
+_cache_bytes: Optional[int] = None
+_in_flight: Dict[Path, asyncio.Future] = {}
+_evicting = False
+
+
+class Derivative(NamedTuple):
+    path: Path
+    media_type: str
+    etag: str
+
+
+def snap_width(width: int) -> int:
+    """Round a requested width up to the nearest THUMBNAIL_WIDTHS entry."""
+    for allowed in THUMBNAIL_WIDTHS:
+        if width <= allowed:
+            return allowed
+    return THUMBNAIL_WIDTHS[-1]
+
+
+def make_derivative(source: str, target: str, width: int, image_format: str) -> int:
+    """
+    Resize an upload to at most `width` pixels wide and save it.
+    Runs in the image worker pool. The file is written under a temporary
+    name and renamed, so readers never see a partial variant.
+
+    Args:
+        source: Path of the original upload
+        target: Path of the variant
+        width: Maximum width in pixels (images are never enlarged)
+        image_format: "webp" or "jpg"
+
+    Returns:
+        Size of the variant in bytes
+    """
+    try:
+        return _make_derivative(source, target, width, image_format)
+    except OSError as e:
+        # Pillow raises UnidentifiedImageError (an OSError) for undecodable files
+        if not os.path.exists(source):
+            raise
+        raise InvalidImageError(str(e))
+    except (ValueError, Image.DecompressionBombError) as e:
+        raise InvalidImageError(str(e))
+
+
+def _make_derivative(source: str, target: str, width: int, image_format: str) -> int:
+    pil_format, _ = FORMATS[image_format]
+    with Image.open(source) as image:
+        # Let the JPEG decoder downscale by a power of two while decoding
+        if image.format == 'JPEG':
+            image.draft('RGB', (width, width))
+        image = ImageOps.exif_transpose(image)
+
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+            rgb_image.paste(image, mask=image.split()[-1])
+            image = rgb_image
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+
+        Path(target).parent.mkdir(parents=True, exist_ok=True)
+        temporary = f"{target}.{os.getpid()}.tmp"
+        if pil_format == 'JPEG':
+            image.save(temporary, format='JPEG', quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+        else:
+            image.save(temporary, format='WEBP', quality=THUMBNAIL_QUALITY, method=4)
+    os.replace(temporary, target)
+    return os.path.getsize(target)
+
+
+def _scan_cache() -> int:
+    """Total size of the cached variants."""
+    total = 0
+    for root, _, files in os.walk(THUMBNAIL_CACHE_DIR):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _evict() -> int:
+    """
+    Delete the least recently served variants (by mtime, refreshed on every
+    hit) until the cache is under the low-water mark.
+
+    Returns:
+        Cache size afterwards
+    """
+    entries = []
+    for root, _, files in os.walk(THUMBNAIL_CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    target = THUMBNAIL_CACHE_MAX_BYTES * THUMBNAIL_CACHE_LOW_WATER
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
+        evicted += 1
+    if evicted:
+        print(f"Evicted {evicted} thumbnails, cache now {total / (1024 * 1024):.0f} MB")
+    return total
+
+
+async def _account(size: int):
+    """Add a new variant to the cache size and evict once it is over budget."""
+    global _cache_bytes, _evicting
+    if _cache_bytes is None:
+        # Other processes write to the same cache; the scan picks up their variants
+        _cache_bytes = await run_in_threadpool(_scan_cache)
+    else:
+        _cache_bytes += size
+    if _cache_bytes > THUMBNAIL_CACHE_MAX_BYTES and not _evicting:
+        _evicting = True
+        try:
+            _cache_bytes = await run_in_threadpool(_evict)
+        finally:
+            _evicting = False
+
+
+def _touch(path: Path) -> bool:
+    """Mark a cached variant as recently served; False if it is missing."""
+    try:
+        os.utime(path)
+        return True
+    except OSError:
+        return False
+
+
+async def get_derivative(source: Path, width: int, image_format: str) -> Derivative:
+    """
+    Get a resized variant of an upload, generating it on first request.
+    Concurrent requests for the same variant share one generation job.
+
+    Args:
+        source: Path of the original upload inside UPLOAD_DIR
+        width: Requested width in pixels (rounded up to THUMBNAIL_WIDTHS)
+        image_format: "webp" or "jpg"
+
+    Returns:
+        Derivative with the cached file, media type and strong ETag
+
+    Raises:
+        FileNotFoundError: If the upload does not exist
+        InvalidImageError: If the upload cannot be decoded
+        ImageQueueFullError: If the image worker queue stays full
+    """
+    if THUMBNAIL_CACHE_DIR.resolve() in source.parents:
+        raise FileNotFoundError(source)
+    width = snap_width(width)
+    size = (await run_in_threadpool(source.stat)).st_size
+    relative = source.relative_to(UPLOAD_DIR.resolve())
+    # Upload names are never reused for different contents (content-addressed,
+    # or unique for legacy uploads), so name, size and settings identify a variant
+    key = hashlib.sha256(f"{relative}:{size}:{THUMBNAIL_QUALITY}".encode("utf-8")).hexdigest()[:16]
+    path = THUMBNAIL_CACHE_DIR / relative.parent / f"{relative.stem}.{key}.w{width}.{image_format}"
+    derivative = Derivative(path, FORMATS[image_format][1], f'"{key}-w{width}-{image_format}"')
+
+    if await run_in_threadpool(_touch, path):
+        return derivative
+
+    future = _in_flight.get(path)
+    if future is None:
+        future = asyncio.ensure_future(run_image_job(make_derivative, str(source), str(path), width, image_format))
+        _in_flight[path] = future
+        future.add_done_callback(lambda _: _in_flight.pop(path, None))
+        await _account(await asyncio.shield(future))
+    else:
+        await asyncio.shield(future)
+    return derivative
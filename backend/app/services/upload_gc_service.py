@@ -0,0 +1,235 @@
+import os
+import time
+import fcntl
+import asyncio
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from fastapi.concurrency import run_in_threadpool
+
+from app.database import SessionLocal
+from app.models.extraction_job import ExtractionJob
+from app.models.report import Report
+from app.models.user import User
+from app.services.file_service import (
+    UPLOAD_DIR,
+    MEMBERS_DIR,
+    REPORTS_DIR,
+    PARTIAL_SUFFIX,
+    UPLOAD_GC_GRACE_PERIOD,
+    delete_derivatives,
+    upload_url,
+)
+
+# Orphaned upload cleanup settings
+UPLOAD_GC_ENABLED = os.getenv("UPLOAD_GC_ENABLED", "true").lower() == "true"
+UPLOAD_GC_INTERVAL = float(os.getenv("UPLOAD_GC_INTERVAL", "3600"))  # seconds between passes
+UPLOAD_GC_BATCH_SIZE = int(os.getenv("UPLOAD_GC_BATCH_SIZE", "500"))  # files checked per query
+UPLOAD_GC_DELETE_RATE = int(os.getenv("UPLOAD_GC_DELETE_RATE", "100"))  # files deleted per second
+
+# Held while a pass runs so only one process per host walks the directories
+GC_LOCK_PATH = UPLOAD_DIR / ".gc.lock"
+
+REFERENCE_COLUMNS = (Report.image_url, User.picture_url, ExtractionJob.image_url)
+
+_task: Optional[asyncio.Task] = None
+
+# (path, URL, size in bytes) of a deletion candidate
+Candidate = Tuple[Path, str, int]
+
+
+def _list_shards(directory: Path) -> List[Path]:
+    """The directory itself (legacy flat uploads) and its two levels of hash shards."""
+    if not directory.is_dir():
+        return []
+    shards = [directory]
+    for first in sorted(os.scandir(directory), key=lambda entry: entry.name):
+        if first.is_dir(follow_symlinks=False):
+            shards.extend(
+                Path(second.path)
+                for second in sorted(os.scandir(first.path), key=lambda entry: entry.name)
+                if second.is_dir(follow_symlinks=False)
+            )
+    return shards
+
+
+def _scan_shard(shard: Path, cutoff: float) -> Tuple[int, List[Candidate], List[Candidate]]:
+    """
+    List the files in one shard not touched since the cutoff.
+
+    Returns:
+        (files seen, old uploads, abandoned partial uploads)
+    """
+    seen = 0
+    uploads, partials = [], []
+    for entry in os.scandir(shard):
+        if not entry.is_file(follow_symlinks=False):
+            continue
+        seen += 1
+        try:
+            stat = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        if stat.st_mtime >= cutoff:
+            continue
+        path = Path(entry.path)
+        candidate = (path, upload_url(path), stat.st_size)
+        if entry.name.endswith(PARTIAL_SUFFIX):
+            partials.append(candidate)
+        else:
+            uploads.append(candidate)
+    return seen, uploads, partials
+
+
+def find_referenced_uploads(urls: Iterable[str]) -> Set[str]:
+    """
+    Find which of the given upload URLs a report, profile or extraction job
+    refers to. Each lookup is an IN query on an indexed column.
+    """
+    urls = list(urls)
+    referenced = set()
+    db = SessionLocal()
+    try:
+        for column in REFERENCE_COLUMNS:
+            referenced.update(url for (url,) in db.query(column).filter(column.in_(urls)).distinct())
+    finally:
+        db.close()
+    return referenced
+
+
+def _delete_stale(candidates: List[Candidate], cutoff: float, derivatives: bool = True) -> Tuple[int, int]:
+    """
+    Delete files that are still older than the cutoff, with their cached
+    resized variants unless derivatives is False (partial uploads have none).
+
+    Returns:
+        (files deleted, bytes reclaimed)
+    """
+    deleted = reclaimed = 0
+    for path, _, size in candidates:
+        try:
+            # Re-checked just before deleting: a blob re-uploaded since the
+            # scan has a fresh mtime and is about to be referenced
+            if path.stat().st_mtime >= cutoff:
+                continue
+            path.unlink()
+        except OSError:
+            continue
+        if derivatives:
+            delete_derivatives(path)
+        deleted += 1
+        reclaimed += size
+    return deleted, reclaimed
+
+
+def _acquire_lock():
+    """Take the GC lock without waiting; returns the lock file, or None if another process holds it."""
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    f = open(GC_LOCK_PATH, "w")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return None
+    return f
+
+
+async def collect_orphaned_uploads(
+    grace_period: float = UPLOAD_GC_GRACE_PERIOD,
+    delete_rate: int = UPLOAD_GC_DELETE_RATE,
+    dry_run: bool = False,
+) -> Optional[Dict[str, int]]:
+    """
+    Delete uploads nothing refers to any more.
+    Walks REPORTS_DIR and MEMBERS_DIR one shard at a time, checks old files
+    against the database in batches of UPLOAD_GC_BATCH_SIZE and deletes the
+    unreferenced ones at most delete_rate per second, so a pass never holds
+    more than a batch in memory or floods the disk with unlinks. A deleted
+    upload's resized variants under THUMBNAIL_CACHE_DIR go with it. Partial
+    uploads older than the grace period are removed as well.
+
+    Args:
+        grace_period: Minimum age in seconds of a deleted file
+        delete_rate: Maximum files deleted per second
+        dry_run: Count orphans without deleting them
+
+    Returns:
+        Stats (scanned, orphaned, deleted, reclaimed_bytes), or None if
+        another process is already running a pass
+    """
+    lock = await run_in_threadpool(_acquire_lock)
+    if lock is None:
+        return None
+
+    stats = {"scanned": 0, "orphaned": 0, "deleted": 0, "reclaimed_bytes": 0}
+    cutoff = time.time() - grace_period
+
+    async def delete(candidates: List[Candidate], derivatives: bool = True):
+        stats["orphaned"] += len(candidates)
+        if dry_run:
+            stats["reclaimed_bytes"] += sum(size for _, _, size in candidates)
+            return
+        for start in range(0, len(candidates), delete_rate):
+            deleted, reclaimed = await run_in_threadpool(
+                _delete_stale, candidates[start:start + delete_rate], cutoff, derivatives
+            )
+            stats["deleted"] += deleted
+            stats["reclaimed_bytes"] += reclaimed
+            await asyncio.sleep(1)
+
+    async def check(batch: List[Candidate]):
+        referenced = await run_in_threadpool(find_referenced_uploads, (url for _, url, _ in batch))
+        await delete([candidate for candidate in batch if candidate[1] not in referenced])
+
+    try:
+        for directory in (REPORTS_DIR, MEMBERS_DIR):
+            batch: List[Candidate] = []
+            for shard in await run_in_threadpool(_list_shards, directory):
+                seen, uploads, partials = await run_in_threadpool(_scan_shard, shard, cutoff)
+                stats["scanned"] += seen
+                if partials:
+                    await delete(partials, derivatives=False)
+                batch.extend(uploads)
+                if len(batch) >= UPLOAD_GC_BATCH_SIZE:
+                    await check(batch)
+                    batch = []
+            if batch:
+                await check(batch)
+    finally:
+        lock.close()
+
+    return stats
+
+
+async def _gc_loop():
+    """Run a collection pass every UPLOAD_GC_INTERVAL seconds until cancelled."""
+    while True:
+        try:
+            stats = await collect_orphaned_uploads()
+            if stats and stats["deleted"]:
+                print(
+                    f"Upload GC: deleted {stats['deleted']} of {stats['scanned']} files, "
+                    f"reclaimed {stats['reclaimed_bytes'] / (1024 * 1024):.1f} MB"
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Upload GC error: {e}")
+        await asyncio.sleep(UPLOAD_GC_INTERVAL)
+
+
+def start_upload_gc():
+    """Start the background upload collector (called on app startup)."""
+    global _task
+    if not UPLOAD_GC_ENABLED or _task is not None:
+        return
+    _task = asyncio.create_task(_gc_loop())
+
+
+async def stop_upload_gc():
+    """Cancel the background upload collector (called on app shutdown)."""
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    await asyncio.gather(_task, return_exceptions=True)
+    _task = None
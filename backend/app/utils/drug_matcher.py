@@ -0,0 +1,203 @@
+"""
+Drug-name dictionary matcher.
+
+Every name in the bundled dictionary (app/data/drug_names.tsv,
+"canonical<TAB>name" per line: generics, English and Korean brand names
+and transliterations) is compiled into one Aho-Corasick automaton, so all
+medications mentioned in a text are found in a single pass over its
+characters, however many names the dictionary holds.
+
+Matching is case-insensitive. Latin names must start and end on a word
+boundary ("Ursa" does not match inside "bursa"); Hangul names are matched
+anywhere, since Korean product names are written together with their
+dosage form ("타이레놀정", "아모잘탄정 5/50mg"). Overlapping matches
+resolve to the leftmost, then longest, name.
+
+Find drugs in text from the command line:
+    python -m app.utils.drug_matcher "Amlodipine 5mg, 타이레놀정 500mg"
+"""
+import os
+import sys
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+DRUG_NAMES_PATH = os.getenv(
+    "DRUG_NAMES_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "drug_names.tsv"),
+)
+
+_matcher: Optional["DrugMatcher"] = None
+
+
+class DrugMatch(NamedTuple):
+    name: str
+    start: int
+    end: int
+
+
+def _is_latin(char: str) -> bool:
+    return char.isascii() and char.isalnum()
+
+
+def _lower(text: str) -> str:
+    """Lowercase text without changing its length, so match positions index the original."""
+    lower = text.lower()
+    if len(lower) == len(text):
+        return lower
+    return "".join(char if len(char.lower()) != 1 else char.lower() for char in text)
+
+
+class DrugMatcher:
+    """Aho-Corasick automaton over a dictionary of drug names."""
+
+    def __init__(self, entries: List[Tuple[str, str]]):
+        """
+        Args:
+            entries: (canonical name, name as written) pairs
+        """
+        # State 0 is the root; each state maps a character to the next state.
+        # Failure transitions are added to these maps as they are first taken,
+        # so the automaton turns into a DFA over the characters actually seen.
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # (pattern length, canonical name, word boundary at start, at end) of every name ending in a state
+        self._output: List[List[Tuple[int, str, bool, bool]]] = [[]]
+
+        for canonical, name in entries:
+            pattern = _lower(name.strip())
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append((len(pattern), canonical, _is_latin(pattern[0]), _is_latin(pattern[-1])))
+
+        # Breadth-first: link each state to the longest proper suffix that is
+        # also a prefix, and inherit that state's outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+        self._alphabet = frozenset(char for transitions in self._goto for char in transitions)
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def _transition(self, state: int, char: str) -> int:
+        """Follow failure links from a state on a character it has no transition for yet."""
+        if char not in self._alphabet:
+            return 0
+        fallback = self._fail[state]
+        next_state = self._goto[fallback].get(char)
+        if next_state is None:
+            next_state = self._transition(fallback, char) if fallback else 0
+        self._goto[state][char] = next_state
+        return next_state
+
+    def find(self, text: str) -> List[DrugMatch]:
+        """
+        Find every dictionary name in a text.
+
+        Args:
+            text: Text to search, e.g. a full description
+
+        Returns:
+            Non-overlapping matches in text order, with canonical names
+        """
+        if not text:
+            return []
+        lower = _lower(text)
+        goto, output, transition = self._goto, self._output, self._transition
+        length = len(lower)
+        found = []
+        state = 0
+        for index, char in enumerate(lower):
+            next_state = goto[state].get(char)
+            state = transition(state, char) if next_state is None else next_state
+            if not output[state]:
+                continue
+            end = index + 1
+            for pattern_length, canonical, bounded_start, bounded_end in output[state]:
+                start = end - pattern_length
+                if bounded_start and start > 0 and _is_latin(lower[start - 1]):
+                    continue
+                # Digits may follow a name directly, as in "Amlodipine5mg"
+                if bounded_end and end < length and lower[end].isascii() and lower[end].isalpha():
+                    continue
+                found.append((start, -pattern_length, canonical))
+
+        found.sort()
+        matches = []
+        covered = 0
+        for start, negative_length, canonical in found:
+            if start >= covered:
+                matches.append(DrugMatch(canonical, start, start - negative_length))
+                covered = start - negative_length
+        return matches
+
+    def names(self, text: str) -> List[str]:
+        """Canonical names of the drugs in a text, each once, in order of first mention."""
+        return list(dict.fromkeys(match.name for match in self.find(text)))
+
+
+def load_drug_names(path: str = DRUG_NAMES_PATH) -> List[Tuple[str, str]]:
+    """Read (canonical name, name) pairs from the dictionary file."""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            canonical, _, name = line.partition("\t")
+            if canonical.strip() and name.strip():
+                entries.append((canonical.strip(), name.strip()))
+    return entries
+
+
+def get_drug_matcher() -> DrugMatcher:
+    """Get the shared matcher, compiling the dictionary on first use."""
+    global _matcher
+    if _matcher is None:
+        _matcher = DrugMatcher(load_drug_names())
+    return _matcher
+
+
+def find_drug_names(text: Optional[str]) -> List[str]:
+    """
+    Find the medications mentioned in a text.
+
+    Args:
+        text: Model response or full description
+
+    Returns:
+        Canonical drug names, each once, in order of first mention
+    """
+    if not text:
+        return []
+    return get_drug_matcher().names(text)
+
+
+def main():
+    matcher = get_drug_matcher()
+    for text in sys.argv[1:]:
+        for match in matcher.find(text):
+            print(f"{match.start:6}-{match.end:<6} {text[match.start:match.end]!r} -> {match.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""
+ICD-10 code table.
+
+The table is a small binary file (ICD10_TABLE_PATH, by default
+app/data/icd10.bin) holding an open-addressing hash table of codes plus a
+blob of UTF-8 names. It is memory-mapped rather than loaded, so opening it
+is instant and every uvicorn worker shares the same page-cache pages; a
+lookup hashes the code and probes a slot or two.
+
+Layout (little-endian):
+    header  MAGIC, slot count, entry count, names offset
+    slots   slot count x (code: 8 ASCII bytes, NUL padded, no dot;
+            name offset: uint32; name length: uint16; padding)
+    names   UTF-8 names, concatenated
+
+The table joins WHO ICD-10 (2019), which Korean KCD codes follow, with
+US ICD-10-CM (FY2026) for its 6 and 7 character codes, plus
+app/data/icd10_kcd.tsv for codes KCD still uses that neither has (e.g. the
+pre-2009 haemorrhoid codes I84.x). When sources disagree on a name, the
+first source wins. It is generated, not committed: the Docker image builds
+it and the name index with
+    python -m app.commands.build_icd10
+which fetches the releases at pinned versions (see that module). The
+build subcommand below builds a table from other tab-separated
+"code<TAB>name" files or CMS order files (icd10cm_order_YYYY.txt).
+
+Documents also carry valid codes no table has (newer KCD subdivisions,
+national extensions), so a well-formed code is not rejected for being
+missing: normalize_icd_code keeps a code the table lacks as long as it is
+at most one level deeper than the codes the table has around it (K29.78
+under K29.7), and cuts deeper ones back to their nearest known ancestor
+(Q99.9999 -> Q99.9). is_known_icd_code says whether the table has a code.
+"""
+import os
+import re
+import sys
+import mmap
+import zlib
+import struct
+import argparse
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+ICD10_TABLE_PATH = os.getenv(
+    "ICD10_TABLE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "icd10.bin"),
+)
+
+MAGIC = b"ICD10T\x00\x01"
+HEADER = struct.Struct("<8sIII")
+SLOT = struct.Struct("<8sIH2x")
+MAX_LOAD_FACTOR = 0.6
+
+# Compact form: category letter, two more characters, up to four subdivision characters
+COMPACT_CODE = re.compile(r'^[A-Z]\d[0-9A-Z][0-9A-Z]{0,4}$')
+# Characters a subdivision can add to a code
+CODE_CHARACTERS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+_table: Optional["ICD10Table"] = None
+
+
+def compact_code(code: str) -> Optional[str]:
+    """
+    Normalize the spelling of a code: upper case, no dot or spaces.
+
+    Returns:
+        e.g. "K297" for "k29.7", or None if it is not shaped like an ICD-10 code
+    """
+    compact = code.strip().upper().replace('.', '').replace(' ', '')
+    if COMPACT_CODE.match(compact):
+        return compact
+    return None
+
+
+def format_code(compact: str) -> str:
+    """Format a compact code with its dot, e.g. "K297" -> "K29.7"."""
+    if len(compact) > 3:
+        return f"{compact[:3]}.{compact[3:]}"
+    return compact
+
+
+def _slot_index(key: bytes, mask: int) -> int:
+    return zlib.crc32(key) & mask
+
+
+class ICD10Table:
+    """Read-only, memory-mapped ICD-10 code table."""
+
+    def __init__(self, path: str = ICD10_TABLE_PATH):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.slot_count, self.entry_count, self._names_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an ICD-10 table")
+        self._mask = self.slot_count - 1
+
+    def __len__(self) -> int:
+        return self.entry_count
+
+    def __contains__(self, code: str) -> bool:
+        return self.name(code) is not None
+
+    def name(self, code: str) -> Optional[str]:
+        """
+        Get the name of a code.
+
+        Args:
+            code: Code in any spelling ("K29.7", "k297")
+
+        Returns:
+            The code's name, or None if the code is not in the table
+        """
+        compact = compact_code(code)
+        if compact is None:
+            return None
+        key = compact.encode("ascii").ljust(8, b"\x00")
+        index = _slot_index(key, self._mask)
+        while True:
+            stored, name_offset, name_length = SLOT.unpack_from(self._map, HEADER.size + index * SLOT.size)
+            if stored == key:
+                start = self._names_offset + name_offset
+                return self._map[start:start + name_length].decode("utf-8")
+            if stored[0] == 0:
+                return None
+            index = (index + 1) & self._mask
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """Iterate (formatted code, name) pairs in slot order."""
+        for index in range(self.slot_count):
+            stored, name_offset, name_length = SLOT.unpack_from(self._map, HEADER.size + index * SLOT.size)
+            if stored[0] != 0:
+                start = self._names_offset + name_offset
+                yield format_code(stored.rstrip(b"\x00").decode("ascii")), self._map[start:start + name_length].decode("utf-8")
+
+    def close(self):
+        self._map.close()
+
+
+def get_icd10_table() -> ICD10Table:
+    """Get the shared ICD-10 table, mapping it on first use."""
+    global _table
+    if _table is None:
+        if not os.path.exists(ICD10_TABLE_PATH):
+            raise FileNotFoundError(f"{ICD10_TABLE_PATH} is missing; build it with: python -m app.commands.build_icd10")
+        _table = ICD10Table()
+    return _table
+
+
+def _limit_depth(compact: str, table: ICD10Table) -> str:
+    """
+    Cut a compact code the table lacks back to its nearest known ancestor
+    when it is more than one level deeper than the known codes around it.
+    Codes whose category the table lacks are returned unchanged.
+    """
+    if len(compact) <= 4 or compact in table:
+        return compact
+    ancestor = next((compact[:length] for length in range(len(compact) - 1, 2, -1) if compact[:length] in table), None)
+    if ancestor is None or len(ancestor) == len(compact) - 1:
+        return compact
+    # Kept when its parent has a known sibling, i.e. the table goes one level less deep here
+    grandparent = compact[:-2]
+    if any(grandparent + character in table for character in CODE_CHARACTERS):
+        return compact
+    return ancestor
+
+
+def normalize_icd_code(code: Optional[str]) -> Optional[str]:
+    """
+    Put a code shaped like an ICD-10 code in canonical form. Codes the
+    table lacks are kept unless they are deeper than the table allows for
+    (see _limit_depth), which are cut back to their nearest known ancestor.
+    Ranges ("i10-i15") are kept when both ends are well-formed; any other
+    hyphenated suffix is dropped in favour of the code before it.
+
+    Args:
+        code: Code as written on the document, by the model or by the user
+
+    Returns:
+        Canonical code such as "K29.7" or "I10-I15", or None if it is not shaped like an ICD-10 code
+    """
+    if not code:
+        return None
+    first, _, second = code.partition('-')
+    first = compact_code(first)
+    if first is None:
+        return None
+    table = get_icd10_table()
+    first = _limit_depth(first, table)
+    if second:
+        second = compact_code(second)
+        if second is not None:
+            return f"{format_code(first)}-{format_code(_limit_depth(second, table))}"
+    return format_code(first)
+
+
+def is_known_icd_code(code: Optional[str]) -> bool:
+    """Whether the table has a code (both ends of a range)."""
+    canonical = normalize_icd_code(code)
+    if canonical is None:
+        return False
+    table = get_icd10_table()
+    return all(table.name(part) is not None for part in canonical.split('-'))
+
+
+def canonicalize_icd_code(code: Optional[str]) -> Optional[str]:
+    """
+    Validate a code against the table and return it in canonical form.
+    For codes found in free text, where the table tells a code from e.g. a
+    room number; a code given as a code goes through normalize_icd_code.
+
+    Args:
+        code: Code as written by the model or the user
+
+    Returns:
+        Canonical code such as "K29.7" or "I10-I15", or None if it is not in the table
+    """
+    if not code:
+        return None
+    table = get_icd10_table()
+    first, _, second = code.partition('-')
+    first = compact_code(first)
+    if first is None or table.name(first) is None:
+        return None
+    if second:
+        second = compact_code(second)
+        if second is not None and table.name(second) is not None:
+            return f"{format_code(first)}-{format_code(second)}"
+    return format_code(first)
+
+
+def icd_code_name(code: Optional[str]) -> Optional[str]:
+    """Get the name of a code (the first code of a range), or None if unknown."""
+    canonical = normalize_icd_code(code)
+    if canonical is None:
+        return None
+    return get_icd10_table().name(canonical.partition('-')[0])
+
+
+def read_source(path: str) -> List[Tuple[str, str]]:
+    """
+    Read (code, name) pairs from a tab-separated file or a CMS order file.
+    CMS order files are fixed width: order number, code, header flag,
+    short description, long description; the long description is used.
+    """
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            if "\t" in line:
+                code, name = line.split("\t", 1)
+            else:
+                code, name = line[6:13], line[77:]
+            entries.append((code.strip(), name.strip()))
+    return entries
+
+
+def build_table(entries: Iterable[Tuple[str, str]], path: str, max_length: int = 7) -> int:
+    """
+    Write a table file.
+
+    Args:
+        entries: (code, name) pairs in any spelling; the first name given for a code is kept
+        path: Output file
+        max_length: Longest compact code to include (7 keeps e.g. "S52.501A")
+
+    Returns:
+        Number of codes written
+    """
+    codes = {}
+    for code, name in entries:
+        compact = compact_code(code)
+        if compact is not None and len(compact) <= max_length and name:
+            codes.setdefault(compact, name)
+
+    slot_count = 1
+    while slot_count * MAX_LOAD_FACTOR < len(codes):
+        slot_count *= 2
+    mask = slot_count - 1
+
+    slots: List[Optional[Tuple[bytes, int, int]]] = [None] * slot_count
+    names = bytearray()
+    for compact in sorted(codes):
+        key = compact.encode("ascii").ljust(8, b"\x00")
+        name = codes[compact].encode("utf-8")[:0xFFFF]
+        index = _slot_index(key, mask)
+        while slots[index] is not None:
+            index = (index + 1) & mask
+        slots[index] = (key, len(names), len(name))
+        names += name
+
+    names_offset = HEADER.size + slot_count * SLOT.size
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, slot_count, len(codes), names_offset))
+        empty = SLOT.pack(b"", 0, 0)
+        for slot in slots:
+            f.write(SLOT.pack(*slot) if slot is not None else empty)
+        f.write(names)
+    return len(codes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the bundled ICD-10 table")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Build the table from source files")
+    build.add_argument("sources", nargs="+", help="Tab-separated code/name files or CMS ICD-10-CM order files, by priority")
+    build.add_argument("--output", default=ICD10_TABLE_PATH)
+    build.add_argument("--max-length", type=int, default=7, help="Longest code to include, without the dot")
+    lookup = subparsers.add_parser("lookup", help="Look up codes")
+    lookup.add_argument("codes", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        entries = [entry for source in args.sources for entry in read_source(source)]
+        count = build_table(entries, args.output, args.max_length)
+        print(f"Wrote {count} codes to {args.output} ({os.path.getsize(args.output):,} bytes)")
+    else:
+        for code in args.codes:
+            canonical = normalize_icd_code(code)
+            if canonical is None:
+                print(f"{code}: invalid")
+            else:
+                print(f"{code}: {canonical} - {icd_code_name(canonical) or 'not in the table'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
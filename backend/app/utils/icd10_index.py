@@ -0,0 +1,568 @@
+"""
+Fuzzy disease-name lookup for ICD-10 codes.
+
+A character-trigram inverted index over the names in the bundled ICD-10
+table plus a curated list of common English and Korean disease names
+(app/data/icd10_aliases.tsv: code, the code's table name, alias). A query is split
+into the same trigrams, names sharing enough of them are found through
+the postings, and they are ranked by the Dice coefficient of their trigram sets, so
+"hypertention", "Essential hypertension" and "고혈압" all resolve without
+asking the model to guess a code.
+
+Only the postings of a query's rarest trigrams are read: with a minimum
+score, a name can only qualify if it contains one of them, so common
+trigrams such as "ed " or " of" never have to be scanned.
+
+The index is prebuilt into ICD10_INDEX_PATH (by app.commands.build_icd10,
+along with the code table) and memory-mapped like the table, so workers
+start without building it and share its pages. The file records a
+fingerprint of the table, the aliases and the indexing settings; if they
+have changed since, the index is built in memory instead. Rebuild it after
+changing any of them:
+    python -m app.utils.icd10_index --build
+
+Query from the command line:
+    python -m app.utils.icd10_index "acute gastritis" 위염
+"""
+import os
+import re
+import sys
+import math
+import mmap
+import zlib
+import struct
+import argparse
+import functools
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.utils.icd10 import ICD10_TABLE_PATH, canonicalize_icd_code, get_icd10_table
+
+ICD10_ALIASES_PATH = os.getenv(
+    "ICD10_ALIASES_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "icd10_aliases.tsv"),
+)
+ICD10_INDEX_PATH = os.getenv(
+    "ICD10_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "icd10_index.bin"),
+)
+
+# Minimum Dice score for parse_icd_codes to accept a match
+MIN_MATCH_SCORE = float(os.getenv("ICD10_MIN_MATCH_SCORE", "0.6"))
+# Names scored in full per query
+MAX_CANDIDATES = 200
+# Added to alias scores so a curated name wins a tie with a table name
+ALIAS_BONUS = 0.05
+# Longest code indexed, without the dot: WHO/KCD depth. Longer codes are
+# ICD-10-CM only (laterality, encounter detail a disease name never carries),
+# so inferring one would put a US-only code on a Korean document
+MAX_INDEXED_CODE_LENGTH = 4
+# Table chapters left out: V-Y are external causes (places, activities,
+# accidents, e.g. Y92.9 "Unspecified place or not applicable") and Z is
+# contact with health services, circumstances rather than diagnoses.
+# Curated aliases for Z codes (e.g. a health checkup) are still indexed.
+EXCLUDED_CHAPTERS = frozenset("VWXYZ")
+# Words that change what a name means: a name containing one only matches
+# queries that contain it too ("blood pressure" is not "high blood pressure",
+# "infection" is not "viral infection")
+QUALIFYING_WORDS = (
+    "abnormal", "decreased", "elevated", "high", "increased", "low", "raised", "reduced", "viral", "bacterial",
+)
+QUALIFYING_BITS = {word: 1 << bit for bit, word in enumerate(QUALIFYING_WORDS)}
+# Splits a name at "with", which introduces a complication ("... with coma");
+# such a name only matches queries naming every word of the complication
+WITH_CLAUSE = re.compile(r'\bwith\b')
+# Dice score of two words' trigrams above which they count as the same word
+# ("oesophagitis" and "esophagitis")
+SAME_WORD_SCORE = 0.5
+# Normalized disease names that say there is no disease; never looked up
+NULL_NAMES = frozenset({
+    "none", "nil", "n a", "na", "not applicable", "not available", "not specified", "not found",
+    "not visible", "unknown", "normal", "no disease", "정상", "없음", "해당 없음", "해당없음", "미상",
+})
+
+NON_WORD = re.compile(r'[^\w]+')
+# Qualifiers that name the ICD-10 "unspecified" code rather than a different disease
+QUALIFIERS = re.compile(r'\b(?:unspecified|not elsewhere classified|nos|nec)\b')
+
+# Index file: magic, source fingerprint, then (offset, length) of each
+# section; a section is a flat array of the given type code
+INDEX_MAGIC = b"ICD10I\x00\x02"
+INDEX_SECTIONS = (
+    ("code_offsets", "I"), ("code_blob", "B"),
+    ("name_offsets", "I"), ("name_blob", "B"),
+    ("bonus", "f"), ("qualifiers", "H"), ("name_weights", "d"),
+    ("gram_offsets", "I"), ("grams", "I"), ("weights", "d"),
+    ("posting_offsets", "I"), ("postings", "I"),
+    ("gram_slots", "I"), ("gram_keys", "B"),
+    ("exact_slots", "I"), ("exact_keys", "B"),
+)
+INDEX_HEADER = struct.Struct("<8sI4x" + "QQ" * len(INDEX_SECTIONS))
+MAX_LOAD_FACTOR = 0.6
+
+_index: Optional["ICD10NameIndex"] = None
+
+
+class ICD10Match(NamedTuple):
+    code: str
+    name: str
+    score: float
+
+
+def normalize_name(name: str) -> str:
+    """Fold a disease name to the form that is indexed: NFKC, lower case, words separated by single spaces."""
+    name = unicodedata.normalize("NFKC", name).lower()
+    name = QUALIFIERS.sub(' ', name)
+    return NON_WORD.sub(' ', name).replace('_', ' ').strip()
+
+
+def _qualifier_mask(normalized: str) -> int:
+    mask = 0
+    for word in normalized.split():
+        mask |= QUALIFYING_BITS.get(word, 0)
+    return mask
+
+
+def _dice(first: set, second: set) -> float:
+    return 2 * len(first & second) / (len(first) + len(second))
+
+
+def _names_complications(normalized_name: str, query_words: List[str]) -> bool:
+    """Whether the query names every word of the name's "with" clauses (if any), allowing for spelling."""
+    for clause in WITH_CLAUSE.split(normalized_name)[1:]:
+        for word in clause.split():
+            if len(word) < 3:
+                continue
+            grams = set(trigrams(word))
+            if not any(_dice(grams, set(trigrams(other))) >= SAME_WORD_SCORE for other in query_words):
+                return False
+    return True
+
+
+def _pack_strings(strings) -> Tuple[array, bytes]:
+    """Concatenate strings as UTF-8; string i is blob[offsets[i]:offsets[i + 1]]."""
+    offsets = array("I", [0])
+    blob = bytearray()
+    for string in strings:
+        blob += string.encode("utf-8")
+        offsets.append(len(blob))
+    return offsets, bytes(blob)
+
+
+def _pack_string_table(mapping: Dict[str, int]) -> Tuple[array, bytes]:
+    """
+    Lay a str -> int mapping out as an open-addressing hash table: four
+    uint32s per slot (CRC-32 of the key, value + 1, key offset, key length)
+    and the UTF-8 keys concatenated. An empty slot has value 0.
+    """
+    slot_count = 1
+    while slot_count * MAX_LOAD_FACTOR < len(mapping):
+        slot_count *= 2
+    mask = slot_count - 1
+    slots = array("I", bytes(16 * slot_count))
+    keys = bytearray()
+    for key, value in mapping.items():
+        data = key.encode("utf-8")
+        crc = zlib.crc32(data)
+        index = crc & mask
+        while slots[index * 4 + 1]:
+            index = (index + 1) & mask
+        slots[index * 4:index * 4 + 4] = array("I", (crc, value + 1, len(keys), len(data)))
+        keys += data
+    return slots, bytes(keys)
+
+
+class _MappedStrings:
+    """Read-only list of strings over a packed blob (see _pack_strings)."""
+
+    def __init__(self, offsets: memoryview, blob: memoryview):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return bytes(self._blob[self._offsets[index]:self._offsets[index + 1]]).decode("utf-8")
+
+
+class _MappedSlices:
+    """Read-only list of uint32 arrays: item i is values[offsets[i]:offsets[i + 1]]."""
+
+    def __init__(self, offsets: memoryview, values: memoryview):
+        self._offsets = offsets
+        self._values = values
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> memoryview:
+        return self._values[self._offsets[index]:self._offsets[index + 1]]
+
+
+class _MappedStringTable:
+    """Read-only str -> int hash table (see _pack_string_table)."""
+
+    def __init__(self, slots: memoryview, keys: memoryview):
+        self._slots = slots
+        self._keys = keys
+        self._mask = len(slots) // 4 - 1
+
+    def get(self, key: str, default: Optional[int] = None) -> Optional[int]:
+        data = key.encode("utf-8")
+        crc = zlib.crc32(data)
+        slots = self._slots
+        index = crc & self._mask
+        while True:
+            base = index * 4
+            value = slots[base + 1]
+            if not value:
+                return default
+            if slots[base] == crc:
+                start = slots[base + 2]
+                if self._keys[start:start + slots[base + 3]] == data:
+                    return value - 1
+            index = (index + 1) & self._mask
+
+    def __getitem__(self, key: str) -> int:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+
+def trigrams(normalized: str) -> List[str]:
+    """Distinct trigrams of a normalized name, padded so short words (e.g. "감기") still produce some."""
+    padded = f" {normalized} "
+    return list({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+class ICD10NameIndex:
+    """
+    Trigram index from disease names to ICD-10 codes. Built in memory with
+    add() and build(), or mapped from a file written by save() with load().
+    """
+
+    def __init__(self):
+        self.fingerprint = 0
+        self._codes: List[str] = []
+        self._names: List[str] = []
+        self._bonus = array("f")
+        # Bit mask of the QUALIFYING_WORDS in each name
+        self._qualifiers = array("H")
+        self._exact: Dict[str, int] = {}
+        self._gram_ids: Dict[str, int] = {}
+        self._postings: List[array] = []
+        # Trigram ids of every name, concatenated; name i owns _grams[_offsets[i]:_offsets[i + 1]]
+        self._grams = array("I")
+        self._offsets = array("I", [0])
+        # Filled in by build(): IDF weight of each trigram and total weight of each name
+        self._weights = array("d")
+        self._name_weights = array("d")
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def add(self, code: str, name: str, alias: bool = False):
+        """Add a name for a code. Call build() once all names are added."""
+        normalized = normalize_name(name)
+        if not normalized:
+            return
+        doc = len(self._codes)
+        self._codes.append(code)
+        self._names.append(name)
+        self._bonus.append(ALIAS_BONUS if alias else 0.0)
+        self._qualifiers.append(_qualifier_mask(normalized))
+        if normalized not in self._exact:
+            self._exact[normalized] = doc
+        for gram in trigrams(normalized):
+            gram_id = self._gram_ids.get(gram)
+            if gram_id is None:
+                gram_id = self._gram_ids[gram] = len(self._postings)
+                self._postings.append(array("I"))
+            self._postings[gram_id].append(doc)
+            self._grams.append(gram_id)
+        self._offsets.append(len(self._grams))
+
+    def build(self):
+        """Weight every trigram by its inverse document frequency."""
+        count = len(self._codes)
+        self._weights = array("d", (math.log(1 + count / len(postings)) for postings in self._postings))
+        weights, offsets, grams = self._weights, self._offsets, self._grams
+        self._name_weights = array("d", (
+            math.fsum(weights[gram_id] for gram_id in grams[offsets[doc]:offsets[doc + 1]])
+            for doc in range(count)
+        ))
+
+    def save(self, path: str, fingerprint: int):
+        """Write the built index to a file for load()."""
+        posting_offsets = array("I", [0])
+        postings = array("I")
+        for doc_ids in self._postings:
+            postings.extend(doc_ids)
+            posting_offsets.append(len(postings))
+        code_offsets, code_blob = _pack_strings(self._codes)
+        name_offsets, name_blob = _pack_strings(self._names)
+        gram_slots, gram_keys = _pack_string_table(self._gram_ids)
+        exact_slots, exact_keys = _pack_string_table(self._exact)
+        sections = {
+            "code_offsets": code_offsets, "code_blob": code_blob,
+            "name_offsets": name_offsets, "name_blob": name_blob,
+            "bonus": self._bonus, "qualifiers": self._qualifiers, "name_weights": self._name_weights,
+            "gram_offsets": self._offsets, "grams": self._grams, "weights": self._weights,
+            "posting_offsets": posting_offsets, "postings": postings,
+            "gram_slots": gram_slots, "gram_keys": gram_keys,
+            "exact_slots": exact_slots, "exact_keys": exact_keys,
+        }
+
+        body = bytearray()
+        spans = []
+        for name, _ in INDEX_SECTIONS:
+            data = bytes(sections[name])
+            # Keep every section 8-byte aligned for the double arrays
+            body += bytes(-len(body) % 8)
+            spans.extend((INDEX_HEADER.size + len(body), len(data)))
+            body += data
+
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, fingerprint, *spans))
+            f.write(body)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ICD10NameIndex":
+        """Map an index file written by save(); searches read it in place."""
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fingerprint, *spans = INDEX_HEADER.unpack_from(data, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{path} is not an ICD-10 name index")
+        view = memoryview(data)
+        sections = {
+            name: view[offset:offset + length].cast(type_code)
+            for (name, type_code), offset, length in zip(INDEX_SECTIONS, spans[0::2], spans[1::2])
+        }
+
+        index = cls()
+        index.fingerprint = fingerprint
+        index._codes = _MappedStrings(sections["code_offsets"], sections["code_blob"])
+        index._names = _MappedStrings(sections["name_offsets"], sections["name_blob"])
+        index._bonus = sections["bonus"]
+        index._qualifiers = sections["qualifiers"]
+        index._name_weights = sections["name_weights"]
+        index._offsets = sections["gram_offsets"]
+        index._grams = sections["grams"]
+        index._weights = sections["weights"]
+        index._postings = _MappedSlices(sections["posting_offsets"], sections["postings"])
+        index._gram_ids = _MappedStringTable(sections["gram_slots"], sections["gram_keys"])
+        index._exact = _MappedStringTable(sections["exact_slots"], sections["exact_keys"])
+        return index
+
+    def search(self, name: str, limit: int = 5, min_score: float = 0.0) -> List[ICD10Match]:
+        """
+        Rank codes by how closely their names match a disease name.
+
+        Args:
+            name: Disease name as written, in English or Korean
+            limit: Maximum number of codes returned
+            min_score: Minimum score (0-1) of a returned match
+
+        Returns:
+            Best match per code, highest score first
+        """
+        normalized = normalize_name(name)
+        if not normalized:
+            return []
+
+        exact = self._exact.get(normalized)
+        if exact is not None:
+            return [ICD10Match(self._codes[exact], self._names[exact], 1.0)]
+
+        weights = self._weights
+        grams = trigrams(normalized)
+        known = sorted(
+            (self._gram_ids[gram] for gram in grams if gram in self._gram_ids),
+            key=weights.__getitem__,
+            reverse=True,
+        )
+        # Trigrams no name contains weigh as much as the rarest possible one
+        unknown_weight = math.log(1 + len(self._codes))
+        query_weight = math.fsum(map(weights.__getitem__, known)) + unknown_weight * (len(grams) - len(known))
+
+        # A name scoring at least min_score shares trigrams weighing at least
+        # `needed`, so it must contain one of the heaviest trigrams whose
+        # removal would leave less than that: only their postings are read.
+        needed = min_score * query_weight / (2.0 - min_score)
+        remaining = math.fsum(map(weights.__getitem__, known))
+        if remaining < needed or not known:
+            return []
+        prefix = 0
+        while prefix < len(known) and remaining >= needed:
+            remaining -= weights[known[prefix]]
+            prefix += 1
+        counts: Counter = Counter()
+        for gram_id in known[:prefix]:
+            counts.update(self._postings[gram_id])
+        # Only the names sharing the most of those trigrams are scored in full
+        candidates = [doc for doc, _ in counts.most_common(MAX_CANDIDATES)]
+
+        max_weight = query_weight * (2.0 - min_score) / min_score if min_score > 0 else float("inf")
+        query = set(known)
+        excluded_qualifiers = ~_qualifier_mask(normalized)
+        offsets, doc_grams, name_weights, qualifiers = self._offsets, self._grams, self._name_weights, self._qualifiers
+        scored = []
+        for doc in candidates:
+            name_weight = name_weights[doc]
+            if name_weight > max_weight or qualifiers[doc] & excluded_qualifiers:
+                continue
+            shared = math.fsum(map(weights.__getitem__, query.intersection(doc_grams[offsets[doc]:offsets[doc + 1]])))
+            score = 2.0 * shared / (query_weight + name_weight)
+            if score >= min_score:
+                scored.append((score + self._bonus[doc], score, doc))
+        # Ties go to the alphabetically first code, i.e. the category before its subdivisions
+        codes = self._codes
+        scored.sort(key=lambda entry: (-entry[0], codes[entry[2]]))
+
+        matches = []
+        seen = set()
+        query_words = normalized.split()
+        for _, score, doc in scored:
+            code = codes[doc]
+            if code in seen:
+                continue
+            name = self._names[doc]
+            if not _names_complications(normalize_name(name), query_words):
+                continue
+            seen.add(code)
+            matches.append(ICD10Match(code, name, round(min(score, 1.0), 3)))
+            if len(matches) == limit:
+                break
+        return matches
+
+
+def read_alias_file(path: str = ICD10_ALIASES_PATH) -> List[Tuple[int, str, str, str]]:
+    """Read the aliases file as written: (line number, code, table name, alias) rows."""
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            code, _, rest = line.partition("\t")
+            table_name, _, alias = rest.partition("\t")
+            rows.append((number, code.strip(), table_name.strip(), alias.strip()))
+    return rows
+
+
+def load_aliases(path: str = ICD10_ALIASES_PATH) -> List[Tuple[str, str]]:
+    """(code, alias) pairs to index, skipping codes not in the table or deeper than MAX_INDEXED_CODE_LENGTH."""
+    aliases = []
+    for _, code, _, alias in read_alias_file(path):
+        code = canonicalize_icd_code(code)
+        if code and alias and len(code.replace('.', '')) <= MAX_INDEXED_CODE_LENGTH:
+            aliases.append((code, alias))
+    return aliases
+
+
+def source_fingerprint() -> int:
+    """Checksum of what the index is built from: the table, the aliases file and the indexing settings."""
+    table = get_icd10_table()
+    with open(ICD10_ALIASES_PATH, "rb") as f:
+        checksum = zlib.crc32(f.read())
+    settings = (
+        f"{INDEX_MAGIC!r}:{os.path.getsize(ICD10_TABLE_PATH)}:{len(table)}:{table.slot_count}:"
+        f"{MAX_INDEXED_CODE_LENGTH}:{''.join(sorted(EXCLUDED_CHAPTERS))}:{','.join(QUALIFYING_WORDS)}:{ALIAS_BONUS}"
+    )
+    return zlib.crc32(settings.encode("utf-8"), checksum)
+
+
+def build_index() -> ICD10NameIndex:
+    """
+    Index the names in the ICD-10 table and the aliases file. Codes longer
+    than MAX_INDEXED_CODE_LENGTH, and table codes in EXCLUDED_CHAPTERS, are
+    left out, so inferred codes are always WHO/KCD depth.
+    """
+    index = ICD10NameIndex()
+    for code, name in load_aliases():
+        index.add(code, name, alias=True)
+    for code, name in sorted(get_icd10_table().items()):
+        if code[0] not in EXCLUDED_CHAPTERS and len(code.replace('.', '')) <= MAX_INDEXED_CODE_LENGTH:
+            index.add(code, name)
+    index.build()
+    index.fingerprint = source_fingerprint()
+    return index
+
+
+def load_index(path: str = ICD10_INDEX_PATH) -> ICD10NameIndex:
+    """Map the prebuilt index, or build one in memory if it is missing or out of date."""
+    try:
+        index = ICD10NameIndex.load(path)
+    except (OSError, ValueError) as e:
+        print(f"Could not load the ICD-10 name index ({e}), building it in memory")
+        return build_index()
+    if index.fingerprint != source_fingerprint():
+        print(f"{path} is out of date, building the ICD-10 name index in memory "
+              "(rebuild it with: python -m app.utils.icd10_index --build)")
+        return build_index()
+    return index
+
+
+def get_icd10_index() -> ICD10NameIndex:
+    """Get the shared name index, mapping (or building) it on first use."""
+    global _index
+    if _index is None:
+        _index = load_index()
+    return _index
+
+
+def infer_icd_code(disease_name: Optional[str], min_score: float = MIN_MATCH_SCORE) -> Optional[str]:
+    """
+    Find the ICD-10 code for a disease name.
+
+    Args:
+        disease_name: Disease name as parsed from the model response
+        min_score: Minimum Dice score to accept the best match
+
+    Returns:
+        Canonical code of the best match, or None if nothing matches closely
+        enough or the name says there is no disease ("Not applicable", "정상")
+    """
+    if not disease_name or normalize_name(disease_name) in NULL_NAMES:
+        return None
+    return _best_code(disease_name, min_score)
+
+
+@functools.lru_cache(maxsize=4096)
+def _best_code(disease_name: str, min_score: float) -> Optional[str]:
+    matches = get_icd10_index().search(disease_name, limit=1, min_score=min_score)
+    return matches[0].code if matches else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the ICD-10 disease-name index")
+    parser.add_argument("names", nargs="*", help="Disease names to look up")
+    parser.add_argument("--build", action="store_true", help="Rebuild the bundled index file")
+    parser.add_argument("--output", default=ICD10_INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.build:
+        index = build_index()
+        index.save(args.output, index.fingerprint)
+        print(f"Wrote {len(index)} names to {args.output} ({os.path.getsize(args.output):,} bytes)")
+
+    index = get_icd10_index()
+    for name in args.names:
+        print(name)
+        for match in index.search(name):
+            print(f"  {match.score:.3f}  {match.code:8} {match.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,167 @@
 import re
-from typing import Dict, Optional
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.utils.icd10 import icd_code_name, is_known_icd_code, normalize_icd_code
+from app.utils.icd10_index import infer_icd_code
+from app.utils.drug_matcher import find_drug_names
+
+# Patterns for parse_icd_codes, tried in order within each group.
+# Each entry is (pattern, anchors): every match starts with one of the
+# lowercase anchor literals, so the pattern only needs to be tried where an
+# anchor occurs instead of at every position of the text.
+PatternEntry = Tuple["re.Pattern", Sequence[str]]
+
+DOC_TYPE_PATTERNS: List[PatternEntry] = [
+    (re.compile(r'\*\*Document Type\*\*[:\s]+["\']?(\w+(?:_\w+)?)["\']?', re.IGNORECASE | re.MULTILINE), ("**document type**",)),
+    (re.compile(r'Document Type[:\s]+["\']?(\w+(?:_\w+)?)["\']?', re.IGNORECASE | re.MULTILINE), ("document type",)),
+    (re.compile(r'Type[:\s]+["\']?(\w+(?:_\w+)?)["\']?', re.IGNORECASE | re.MULTILINE), ("type",)),
+]
+
+DISEASE_NAME_PATTERNS: List[PatternEntry] = [
+    (re.compile(r'\*\*Disease Name\*\*[:\s]+([^\n]+(?:[^\*]|\*(?!\*))+?)(?=\n\*\*|\n\n|$)', re.IGNORECASE | re.MULTILINE), ("**disease name**",)),
+    (re.compile(r'Disease Name[:\s]+([^\n]+)', re.IGNORECASE | re.MULTILINE), ("disease name",)),
+    (re.compile(r'Disease[:\s]+([^\n]+)', re.IGNORECASE | re.MULTILINE), ("disease",)),
+    (re.compile(r'Diagnosis[:\s]+([^\n]+)', re.IGNORECASE | re.MULTILINE), ("diagnosis",)),
+    (re.compile(r'Condition[:\s]+([^\n]+)', re.IGNORECASE | re.MULTILINE), ("condition",)),
+]
+
+MEDICINE_NAME_PATTERNS: List[PatternEntry] = [
+    (re.compile(r'\*\*Medicine Name\*\*[:\s]+([^\n]+(?:[^\*]|\*(?!\*))+?)(?=\n\*\*|\n\n|$)', re.IGNORECASE | re.MULTILINE), ("**medicine name**",)),
+    (re.compile(r'Medicine Name[:\s]+([^\n]+)', re.IGNORECASE | re.MULTILINE), ("medicine name",)),
+    (re.compile(r'Medication[:\s]+([^\n]+)', re.IGNORECASE | re.MULTILINE), ("medication",)),
+    (re.compile(r'Medicine[:\s]+([^\n]+)', re.IGNORECASE | re.MULTILINE), ("medicine",)),
+    (re.compile(r'Drug[:\s]+([^\n]+)', re.IGNORECASE | re.MULTILINE), ("drug",)),
+    (re.compile(r'Prescribed[:\s]+([^\n]+)', re.IGNORECASE | re.MULTILINE), ("prescribed",)),
+]
+
+# An ICD-10 code as printed: "K29.7", "E11.65", "S52.501A" (CM), or a range "I10-I15"
+ICD_CODE = r'[A-Z]\d{2}(?:\.[0-9A-Z]{1,4})?(?:-[A-Z0-9]+)?'
+
+ICD_STRUCTURED_PATTERNS: List[PatternEntry] = [
+    (re.compile(r'\*\*Disease ICD Code\*\*[:\s]+(' + ICD_CODE + ')', re.IGNORECASE), ("**disease icd code**",)),
+    (re.compile(r'Disease ICD Code[:\s]+(' + ICD_CODE + ')', re.IGNORECASE), ("disease icd code",)),
+    (re.compile(r'ICD[-\s]?10[:\s]+(' + ICD_CODE + ')', re.IGNORECASE), ("icd",)),
+    (re.compile(r'ICD Code[:\s]+(' + ICD_CODE + ')', re.IGNORECASE), ("icd code",)),
+]
+ICD_CANDIDATE_PATTERN = re.compile(r'\b(' + ICD_CODE + r')\b')
+# Cheap scan for where a candidate can start (an uppercase letter followed by two digits)
+ICD_CANDIDATE_START = re.compile(r'[A-Z](?=\d\d)')
+
+# Context (chars before and after a candidate code) searched for disease keywords
+ICD_CONTEXT_CHARS = 150
+ICD_CONTEXT_KEYWORDS = ('disease', 'disorder', 'condition', 'diagnosis', 'icd', 'code')
+
+DISEASE_FALLBACK_PATTERNS: List[PatternEntry] = [
+    (re.compile(r'(?:for|treat|treating|diagnosis|condition|indication)[:\s]+([A-Z][a-z]+(?:\s+[a-z]+){0,5})', re.IGNORECASE),
+     ("for", "treat", "diagnosis", "condition", "indication")),
+    (re.compile(r'used to treat[:\s]+([A-Z][a-z]+(?:\s+[a-z]+){0,5})', re.IGNORECASE), ("used to treat",)),
+    (re.compile(r'indicated for[:\s]+([A-Z][a-z]+(?:\s+[a-z]+){0,5})', re.IGNORECASE), ("indicated for",)),
+]
+
+MEDICINE_FALLBACK_PATTERNS: List[PatternEntry] = [
+    (re.compile(r'prescription[:\s]+([A-Z][a-zA-Z0-9\.\s/-]+)', re.IGNORECASE), ("prescription",)),
+    (re.compile(r'medication[:\s]+([A-Z][a-zA-Z0-9\.\s/-]+)', re.IGNORECASE), ("medication",)),
+    (re.compile(r'prescribed[:\s]+([A-Z][a-zA-Z0-9\.\s/-]+)', re.IGNORECASE), ("prescribed",)),
+    (re.compile(r'drug[:\s]+([A-Z][a-zA-Z0-9\.\s/-]+)', re.IGNORECASE), ("drug",)),
+]
+
+MARKDOWN_EMPHASIS = re.compile(r'\*+')
+BRACKETS = re.compile(r'\[|\]')
+WHITESPACE = re.compile(r'\s+')
+NON_WORD = re.compile(r'[^\w\s-]')
+AFTER_DELIMITER = re.compile(r'[,\n].*$')
+
+# Characters IGNORECASE treats as ASCII letters although str.lower() does not
+# map them to one (or changes their length), e.g. dotted capital I
+CASE_FOLD_EXCEPTIONS = re.compile('[İıſ]')
+
+VALID_REPORT_TYPES = ('prescription', 'medical_certificate', 'examination_report')
+
+
+class _TextIndex:
+    """
+    Lowercased view of a response used to skip and shorten pattern searches.
+    Anchor lookups are exact only when every character lowercases to one
+    character that IGNORECASE agrees with; otherwise every search scans the
+    whole text as before.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lower = text.lower()
+        self.exact = CASE_FOLD_EXCEPTIONS.search(text) is None
+        self._occurrences: Dict[str, List[int]] = {}
+
+    def occurrences(self, literal: str) -> List[int]:
+        """Positions of every occurrence of a lowercase literal, found once per response."""
+        positions = self._occurrences.get(literal)
+        if positions is None:
+            positions = []
+            position = self.lower.find(literal)
+            while position >= 0:
+                positions.append(position)
+                position = self.lower.find(literal, position + 1)
+            self._occurrences[literal] = positions
+        return positions
+
+    def search(self, entry: PatternEntry) -> Optional["re.Match"]:
+        """Find the leftmost match of a pattern entry, trying it only at its anchors."""
+        pattern, anchors = entry
+        if not self.exact:
+            return pattern.search(self.text)
+        if len(anchors) == 1:
+            positions = self.occurrences(anchors[0])
+        else:
+            positions = sorted(set().union(*(self.occurrences(anchor) for anchor in anchors)))
+        for position in positions:
+            match = pattern.match(self.text, position)
+            if match:
+                return match
+        return None
+
+    def first_match(self, entries: List[PatternEntry]):
+        """Yield the matches of the entries that match, in order."""
+        for entry in entries:
+            match = self.search(entry)
+            if match:
+                yield match
+
+    def has_keyword_between(self, start: int, end: int, keywords: Sequence[str]) -> bool:
+        """Check whether any keyword lies entirely within text[start:end] (case-insensitive)."""
+        if not self.exact:
+            context = self.text[start:end].lower()
+            return any(keyword in context for keyword in keywords)
+
+        for keyword in keywords:
+            positions = self.occurrences(keyword)
+            index = bisect_left(positions, start)
+            if index < len(positions) and positions[index] + len(keyword) <= end:
+                return True
+        return False
+
+
+def _find_icd_candidates(text: str) -> List[str]:
+    """Same result as ICD_CANDIDATE_PATTERN.findall(text), trying only plausible starts."""
+    candidates = []
+    end = 0
+    for start in ICD_CANDIDATE_START.finditer(text):
+        position = start.start()
+        if position < end:
+            continue
+        match = ICD_CANDIDATE_PATTERN.match(text, position)
+        if match:
+            candidates.append(match.group(1))
+            end = match.end()
+    return candidates
+
+
+def _clean_match(value: str) -> str:
+    """Strip markdown, brackets and extra whitespace from a matched value."""
+    value = MARKDOWN_EMPHASIS.sub('', value)
+    value = BRACKETS.sub('', value)
+    value = WHITESPACE.sub(' ', value)
+    return value.strip()
 
 
 def parse_icd_codes(response_text: str) -> Dict[str, Optional[str]]:
@@ -26,39 +188,30 @@ def parse_icd_codes(response_text: str) -> Dict[str, Optional[str]]:
     
     # Normalize text for better parsing
     normalized_text = response_text.replace('\r\n', '\n').replace('\r', '\n')
+    index = _TextIndex(normalized_text)
     
     # Look for document type in structured format
-    doc_type_patterns = [
-        r'\*\*Document Type\*\*[:\s]+["\']?(\w+(?:_\w+)?)["\']?',
-        r'Document Type[:\s]+["\']?(\w+(?:_\w+)?)["\']?',
-        r'Type[:\s]+["\']?(\w+(?:_\w+)?)["\']?',
-    ]
-    
-    valid_types = ['prescription', 'medical_certificate', 'examination_report']
-    
-    for pattern in doc_type_patterns:
-        match = re.search(pattern, normalized_text, re.IGNORECASE | re.MULTILINE)
-        if match:
-            doc_type = match.group(1).strip().lower()
-            # Normalize the document type
-            doc_type = doc_type.replace(' ', '_').replace('-', '_')
-            # Handle variations
-            if 'prescription' in doc_type or 'rx' in doc_type or '처방' in doc_type:
-                result["report_type"] = "prescription"
-                break
-            elif 'certificate' in doc_type or 'diagnosis' in doc_type or '진단' in doc_type:
-                result["report_type"] = "medical_certificate"
-                break
-            elif 'examination' in doc_type or 'checkup' in doc_type or 'report' in doc_type or '검진' in doc_type:
-                result["report_type"] = "examination_report"
-                break
-            elif doc_type in valid_types:
-                result["report_type"] = doc_type
-                break
+    for match in index.first_match(DOC_TYPE_PATTERNS):
+        doc_type = match.group(1).strip().lower()
+        # Normalize the document type
+        doc_type = doc_type.replace(' ', '_').replace('-', '_')
+        # Handle variations
+        if 'prescription' in doc_type or 'rx' in doc_type or '처방' in doc_type:
+            result["report_type"] = "prescription"
+            break
+        elif 'certificate' in doc_type or 'diagnosis' in doc_type or '진단' in doc_type:
+            result["report_type"] = "medical_certificate"
+            break
+        elif 'examination' in doc_type or 'checkup' in doc_type or 'report' in doc_type or '검진' in doc_type:
+            result["report_type"] = "examination_report"
+            break
+        elif doc_type in VALID_REPORT_TYPES:
+            result["report_type"] = doc_type
+            break
     
     # Fallback: Try to infer document type from content
     if not result["report_type"]:
-        text_lower = normalized_text.lower()
+        text_lower = index.lower
         if any(kw in text_lower for kw in ['medication', 'dosage', 'take', 'tablet', 'capsule', 'mg', 'ml', 'pharmacy', 'rx']):
             result["report_type"] = "prescription"
         elif any(kw in text_lower for kw in ['certificate', 'certify', 'diagnosis', 'diagnosed with']):
@@ -70,140 +223,297 @@ def parse_icd_codes(response_text: str) -> Dict[str, Optional[str]]:
     
     # Look for structured format with headers (from improved prompt)
     # Pattern: **Disease Name:** or Disease Name: or Disease:
-    disease_name_patterns = [
-        r'\*\*Disease Name\*\*[:\s]+([^\n]+(?:[^\*]|\*(?!\*))+?)(?=\n\*\*|\n\n|$)',
-        r'Disease Name[:\s]+([^\n]+)',
-        r'Disease[:\s]+([^\n]+)',
-        r'Diagnosis[:\s]+([^\n]+)',
-        r'Condition[:\s]+([^\n]+)',
-    ]
-    
-    for pattern in disease_name_patterns:
-        match = re.search(pattern, normalized_text, re.IGNORECASE | re.MULTILINE)
-        if match:
-            disease_text = match.group(1).strip()
-            # Clean up markdown and formatting
-            disease_text = re.sub(r'\*+', '', disease_text)
-            disease_text = re.sub(r'\[|\]', '', disease_text)  # Remove brackets
-            disease_text = re.sub(r'\s+', ' ', disease_text)
-            disease_text = disease_text.strip()
-            if disease_text and len(disease_text) > 2:
-                result["disease_name"] = disease_text[:200]
-                break
+    for match in index.first_match(DISEASE_NAME_PATTERNS):
+        disease_text = _clean_match(match.group(1).strip())
+        if disease_text and len(disease_text) > 2:
+            result["disease_name"] = disease_text[:200]
+            break
     
     # Look for medicine name in structured format
-    medicine_name_patterns = [
-        r'\*\*Medicine Name\*\*[:\s]+([^\n]+(?:[^\*]|\*(?!\*))+?)(?=\n\*\*|\n\n|$)',
-        r'Medicine Name[:\s]+([^\n]+)',
-        r'Medication[:\s]+([^\n]+)',
-        r'Medicine[:\s]+([^\n]+)',
-        r'Drug[:\s]+([^\n]+)',
-        r'Prescribed[:\s]+([^\n]+)',
-    ]
-    
-    for pattern in medicine_name_patterns:
-        match = re.search(pattern, normalized_text, re.IGNORECASE | re.MULTILINE)
-        if match:
-            medicine_text = match.group(1).strip()
-            medicine_text = re.sub(r'\*+', '', medicine_text)
-            medicine_text = re.sub(r'\[|\]', '', medicine_text)
-            medicine_text = re.sub(r'\s+', ' ', medicine_text)
-            medicine_text = medicine_text.strip()
-            if medicine_text and len(medicine_text) > 2:
-                result["medicine_name"] = medicine_text[:200]
-                break
+    for match in index.first_match(MEDICINE_NAME_PATTERNS):
+        medicine_text = _clean_match(match.group(1).strip())
+        if medicine_text and len(medicine_text) > 2:
+            result["medicine_name"] = medicine_text[:200]
+            break
     
-    # Enhanced ICD code pattern - more accurate for ICD-10
-    # ICD-10 format: Letter + 2 digits + optional decimal + optional alphanumeric
-    icd_patterns = [
-        r'\*\*Disease ICD Code\*\*[:\s]+([A-Z]\d{2}(?:\.\d+)?(?:-[A-Z0-9]+)?)',
-        r'Disease ICD Code[:\s]+([A-Z]\d{2}(?:\.\d+)?(?:-[A-Z0-9]+)?)',
-        r'ICD[-\s]?10[:\s]+([A-Z]\d{2}(?:\.\d+)?(?:-[A-Z0-9]+)?)',
-        r'ICD Code[:\s]+([A-Z]\d{2}(?:\.\d+)?(?:-[A-Z0-9]+)?)',
-        r'\b([A-Z]\d{2}(?:\.\d+)?(?:-[A-Z0-9]+)?)\b',  # General pattern
-    ]
-    
-    # Try structured extraction first
-    for pattern in icd_patterns[:4]:  # First 4 are structured patterns
-        match = re.search(pattern, normalized_text, re.IGNORECASE)
+    # Keep the labelled value (with its doses) only if it names a known drug;
+    # otherwise list every medication the drug dictionary finds in the text
+    if not find_drug_names(result["medicine_name"]):
+        drug_names = find_drug_names(normalized_text)
+        if drug_names:
+            result["medicine_name"] = ", ".join(drug_names)[:200]
+    
+    # Try structured extraction first. A code labelled as the ICD code is
+    # kept as printed even if the table lacks it (newer KCD subdivisions,
+    # national extensions) unless it is deeper than the table allows for;
+    # responses flag it as unverified
+    for entry in ICD_STRUCTURED_PATTERNS:
+        match = index.search(entry)
         if match:
-            code = match.group(1).strip().upper()
-            # Validate ICD-10 format
-            if re.match(r'^[A-Z]\d{2}(\.\d+)?(-[A-Z0-9]+)?$', code):
+            code = normalize_icd_code(match.group(1).strip())
+            if code:
                 result["disease_icd_code"] = code
                 break
     
     # If not found in structured format, search for ICD codes with context
+    printed_codes = False
     if not result["disease_icd_code"]:
-        # Find all potential ICD codes
-        all_codes = re.findall(r'\b([A-Z]\d{2}(?:\.\d+)?(?:-[A-Z0-9]+)?)\b', normalized_text)
-        
-        # Filter and validate ICD codes
+        # Find all potential ICD codes (the pattern only matches uppercase codes)
+        # and keep those in the ICD-10 table: unlabelled, a code the table
+        # lacks is as likely a room number like "A12"
+        candidates = _find_icd_candidates(normalized_text)
+        printed_codes = any('.' in code for code in candidates)
         valid_icd_codes = []
-        for code in all_codes:
-            code_upper = code.upper()
-            # ICD-10 codes start with A-Z and have 2 digits
-            if re.match(r'^[A-Z]\d{2}', code_upper):
-                valid_icd_codes.append(code_upper)
-        
-        # Look for disease-related context around codes
-        disease_keywords = ['disease', 'disorder', 'condition', 'diagnosis', 'icd', 'code']
+        for code in candidates:
+            canonical = normalize_icd_code(code)
+            if canonical and is_known_icd_code(canonical):
+                valid_icd_codes.append((code, canonical))
+        if not valid_icd_codes:
+            # A dotted code (not a room number) the table lacks, kept as printed
+            for code in candidates:
+                canonical = normalize_icd_code(code)
+                if '.' in code and canonical:
+                    valid_icd_codes.append((code, canonical))
         
-        for code in valid_icd_codes:
+        # Look for disease-related context around the first occurrence of each code
+        checked = set()
+        for code, canonical in valid_icd_codes:
+            if code in checked:
+                continue
+            checked.add(code)
             code_index = normalized_text.find(code)
-            if code_index != -1:
-                # Get context (150 chars before and after)
-                start = max(0, code_index - 150)
-                end = min(len(normalized_text), code_index + len(code) + 150)
-                context = normalized_text[start:end].lower()
-                
-                # Check if it's in a disease-related context
-                if any(keyword in context for keyword in disease_keywords):
-                    result["disease_icd_code"] = code
-                    break
+            start = max(0, code_index - ICD_CONTEXT_CHARS)
+            end = min(len(normalized_text), code_index + len(code) + ICD_CONTEXT_CHARS)
+            if index.has_keyword_between(start, end, ICD_CONTEXT_KEYWORDS):
+                result["disease_icd_code"] = canonical
+                break
         
         # If still not found, use first valid ICD code
         if not result["disease_icd_code"] and valid_icd_codes:
-            result["disease_icd_code"] = valid_icd_codes[0]
+            result["disease_icd_code"] = valid_icd_codes[0][1]
     
     # Fallback: Extract disease name from medication context if not found
     if not result["disease_name"]:
         # Look for patterns like "for [condition]", "treat [condition]", etc.
-        disease_fallback_patterns = [
-            r'(?:for|treat|treating|diagnosis|condition|indication)[:\s]+([A-Z][a-z]+(?:\s+[a-z]+){0,5})',
-            r'used to treat[:\s]+([A-Z][a-z]+(?:\s+[a-z]+){0,5})',
-            r'indicated for[:\s]+([A-Z][a-z]+(?:\s+[a-z]+){0,5})',
-        ]
-        
-        for pattern in disease_fallback_patterns:
-            match = re.search(pattern, normalized_text, re.IGNORECASE)
-            if match:
-                disease_text = match.group(1).strip()
-                # Clean up
-                disease_text = re.sub(r'[^\w\s-]', '', disease_text)
-                disease_text = re.sub(r'\s+', ' ', disease_text)
-                if disease_text and len(disease_text) > 3:
-                    result["disease_name"] = disease_text[:200]
-                    break
+        for match in index.first_match(DISEASE_FALLBACK_PATTERNS):
+            disease_text = match.group(1).strip()
+            # Clean up
+            disease_text = NON_WORD.sub('', disease_text)
+            disease_text = WHITESPACE.sub(' ', disease_text)
+            if disease_text and len(disease_text) > 3:
+                result["disease_name"] = disease_text[:200]
+                break
+    
+    # No code on the document: look the disease name up in the ICD-10 name index.
+    # A dotted code the table lacks is still a printed code, and a guess from
+    # the name would only contradict it
+    if not result["disease_icd_code"] and not printed_codes and result["disease_name"]:
+        result["disease_icd_code"] = infer_icd_code(result["disease_name"])
+    
+    # Last resort: name the disease after its ICD-10 code
+    if not result["disease_name"] and result["disease_icd_code"]:
+        result["disease_name"] = icd_code_name(result["disease_icd_code"])
     
     # Fallback: Extract medicine name from prescription context if not found
     if not result["medicine_name"]:
-        medicine_fallback_patterns = [
-            r'prescription[:\s]+([A-Z][a-zA-Z0-9\.\s/-]+)',
-            r'medication[:\s]+([A-Z][a-zA-Z0-9\.\s/-]+)',
-            r'prescribed[:\s]+([A-Z][a-zA-Z0-9\.\s/-]+)',
-            r'drug[:\s]+([A-Z][a-zA-Z0-9\.\s/-]+)',
-        ]
-        
-        for pattern in medicine_fallback_patterns:
-            match = re.search(pattern, normalized_text, re.IGNORECASE)
-            if match:
-                medicine_text = match.group(1).strip()
-                # Clean up - remove extra info after common delimiters
-                medicine_text = re.sub(r'[,\n].*$', '', medicine_text)  # Remove after comma/newline
-                medicine_text = re.sub(r'\s+', ' ', medicine_text)
-                if medicine_text and len(medicine_text) > 2:
-                    result["medicine_name"] = medicine_text[:200]
-                    break
+        for match in index.first_match(MEDICINE_FALLBACK_PATTERNS):
+            medicine_text = match.group(1).strip()
+            # Clean up - remove extra info after common delimiters
+            medicine_text = AFTER_DELIMITER.sub('', medicine_text)  # Remove after comma/newline
+            medicine_text = WHITESPACE.sub(' ', medicine_text)
+            if medicine_text and len(medicine_text) > 2:
+                result["medicine_name"] = medicine_text[:200]
+                break
     
     return result
+
+
+# Section headers of the pass-2 structured output, e.g. "**Disease Name:**"
+SECTION_MARKER = re.compile(
+    r'\*\*\s*(Document Type|Disease Name|Disease ICD Code|Medicine Name|Full Description)\s*:?\s*\*\*\s*:?',
+    re.IGNORECASE
+)
+
+# Colon and spacing between a header and its value; the colon may arrive
+# after the closing '**' that completes the header
+SECTION_BODY_PREFIX = re.compile(r'^[:\s]+')
+
+SECTION_FIELDS = {
+    "document type": "report_type",
+    "disease name": "disease_name",
+    "disease icd code": "disease_icd_code",
+    "medicine name": "medicine_name",
+    "full description": "full_description",
+}
+
+STRUCTURED_FIELDS = ("report_type", "disease_name", "disease_icd_code", "medicine_name")
+
+ICD_CODE_PATTERN = re.compile(r'\b(' + ICD_CODE + r')\b', re.IGNORECASE)
+
+
+def _normalize_report_type(value: str) -> Optional[str]:
+    """Map a free-text document type to one of the valid report types."""
+    doc_type = value.strip().lower().replace(' ', '_').replace('-', '_')
+    if 'prescription' in doc_type or 'rx' in doc_type or '처방' in doc_type:
+        return "prescription"
+    if 'certificate' in doc_type or 'diagnosis' in doc_type or '진단' in doc_type:
+        return "medical_certificate"
+    if 'examination' in doc_type or 'checkup' in doc_type or 'report' in doc_type or '검진' in doc_type:
+        return "examination_report"
+    return None
+
+
+def _clean_section_value(value: str) -> Optional[str]:
+    """Strip markdown, brackets and extra whitespace from a section body."""
+    value = _clean_match(value)
+    if value and len(value) > 2:
+        return value[:200]
+    return None
+
+
+def _parse_section(field: str, body: str) -> Optional[str]:
+    """Extract a field value from the body of its section."""
+    if field == "report_type":
+        return _normalize_report_type(body)
+    if field == "disease_icd_code":
+        # The first well-formed code, as printed on the document
+        for match in ICD_CODE_PATTERN.finditer(body):
+            code = normalize_icd_code(match.group(1))
+            if code:
+                return code
+        return None
+    return _clean_section_value(body)
+
+
+def normalize_extracted_fields(fields: Dict[str, Optional[str]]) -> Dict[str, Optional[str]]:
+    """
+    Clean up fields the model returned directly (JSON output) the way
+    parse_icd_codes cleans scraped ones: valid report type, canonical
+    ICD-10 code (or one found from the disease name), trimmed values.
+    
+    Args:
+        fields: Dictionary with report_type, disease_name, disease_icd_code, medicine_name, full_description
+        
+    Returns:
+        parse_icd_codes-shaped dict
+    """
+    result = {
+        "report_type": _normalize_report_type(fields.get("report_type") or ""),
+        "disease_name": _clean_match(fields.get("disease_name") or "")[:200] or None,
+        "disease_icd_code": _parse_section("disease_icd_code", fields.get("disease_icd_code") or ""),
+        "medicine_name": _clean_match(fields.get("medicine_name") or "")[:200] or None,
+        "full_description": fields.get("full_description"),
+    }
+    if not result["report_type"]:
+        result["report_type"] = "prescription"  # Default, as in parse_icd_codes
+    if not result["disease_icd_code"] and result["disease_name"]:
+        result["disease_icd_code"] = infer_icd_code(result["disease_name"])
+    if not result["disease_name"] and result["disease_icd_code"]:
+        result["disease_name"] = icd_code_name(result["disease_icd_code"])
+    if not find_drug_names(result["medicine_name"]):
+        drug_names = find_drug_names(result["full_description"])
+        if drug_names:
+            result["medicine_name"] = ", ".join(drug_names)[:200]
+    return result
+
+
+class StreamingICDParser:
+    """
+    Incremental parser for streamed pass-2 output.
+    Feed content deltas as they arrive; each structured field is filled in
+    as soon as the next section header starts, so callers can stop the
+    stream once the Full Description section opens.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._text = ""
+        self._dirty = False
+        self._scan_pos = 0
+        self._open_section: Optional[str] = None
+        self._open_start = 0
+        self._description_started = False
+        self.fields: Dict[str, Optional[str]] = {field: None for field in STRUCTURED_FIELDS}
+
+    @property
+    def text(self) -> str:
+        """All content fed so far."""
+        if self._dirty:
+            self._text = "".join(self._chunks)
+            self._chunks = [self._text]
+            self._dirty = False
+        return self._text
+
+    @property
+    def is_complete(self) -> bool:
+        """
+        True once the Full Description header has arrived. Every structured
+        section precedes it, so nothing more can be parsed for them; fields
+        the document leaves empty (e.g. no medicine on a certificate) stay None.
+        """
+        return self._description_started
+
+    def feed(self, delta: str) -> Dict[str, str]:
+        """
+        Consume one content delta.
+        
+        Args:
+            delta: Streamed content text
+            
+        Returns:
+            Fields newly completed by this delta
+        """
+        self._chunks.append(delta)
+        self._dirty = True
+        # Section headers are bold, so nothing can complete without a '*'
+        if '*' not in delta:
+            return {}
+
+        text = self.text
+        completed = {}
+        for match in SECTION_MARKER.finditer(text, self._scan_pos):
+            completed.update(self._close_section(text, match.start()))
+            self._open_section = SECTION_FIELDS[match.group(1).lower()]
+            self._open_start = match.end()
+            if self._open_section == "full_description":
+                self._description_started = True
+            self._scan_pos = match.end()
+        return completed
+
+    def finish(self) -> Dict[str, str]:
+        """Close the last open section at end of stream and return any new fields."""
+        return self._close_section(self.text, len(self.text))
+
+    def early_result(self, full_description: Optional[str]) -> Dict[str, Optional[str]]:
+        """
+        Build a parse_icd_codes-shaped result from the streamed fields.
+        Used when the stream was stopped before the Full Description section.
+        
+        Args:
+            full_description: Description to report in place of the unfinished section
+        """
+        result = dict(self.fields)
+        if not result["disease_icd_code"] and result["disease_name"]:
+            result["disease_icd_code"] = infer_icd_code(result["disease_name"])
+        if not result["disease_name"] and result["disease_icd_code"]:
+            result["disease_name"] = icd_code_name(result["disease_icd_code"])
+        if not find_drug_names(result["medicine_name"]):
+            drug_names = find_drug_names(self.text) or find_drug_names(full_description)
+            if drug_names:
+                result["medicine_name"] = ", ".join(drug_names)[:200]
+        result["full_description"] = full_description
+        return result
+
+    def _close_section(self, text: str, end: int) -> Dict[str, str]:
+        field = self._open_section
+        self._open_section = None
+        if field not in self.fields or self.fields[field] is not None:
+            return {}
+        value = _parse_section(field, SECTION_BODY_PREFIX.sub('', text[self._open_start:end]))
+        if value is None and field == "disease_icd_code":
+            # The prompt asks for visible codes only; an empty section falls back to the name index
+            value = infer_icd_code(self.fields["disease_name"])
+        if value is None:
+            return {}
+        self.fields[field] = value
+        return {field: value}
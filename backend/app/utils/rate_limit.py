@@ -0,0 +1,148 @@
+import re
+import time
+import asyncio
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Async token bucket.
+    Starts unbounded until the first update() tells it the provider's limit;
+    after that it refills continuously at the rate implied by the last
+    observed limit, remaining count and reset time.
+    """
+
+    def __init__(self, max_wait: float = 60):
+        self.max_wait = max_wait
+        self.capacity: Optional[float] = None
+        self.tokens = 0.0
+        self.refill_per_second = 0.0
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def update(self, limit: float, remaining: float, reset_seconds: float):
+        """
+        Resynchronize with the provider's view of the limit.
+
+        Args:
+            limit: Bucket capacity
+            remaining: Tokens currently available
+            reset_seconds: Time until the bucket is full again
+        """
+        self.capacity = limit
+        self.tokens = min(remaining, limit)
+        missing = limit - self.tokens
+        if reset_seconds > 0 and missing > 0:
+            self.refill_per_second = missing / reset_seconds
+        elif self.refill_per_second <= 0:
+            self.refill_per_second = limit
+        self._updated_at = time.monotonic()
+
+    def drain(self, reset_seconds: float):
+        """Empty the bucket until reset_seconds from now (e.g. after a 429)."""
+        if self.capacity is None:
+            return
+        self.tokens = 0.0
+        if reset_seconds > 0:
+            self.refill_per_second = self.capacity / reset_seconds
+        self._updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.refill_per_second)
+        self._updated_at = now
+
+    async def acquire(self, amount: float = 1):
+        """
+        Wait until `amount` tokens are available and take them.
+        Requests larger than the capacity wait for a full bucket. Waits are
+        capped at max_wait so a stale limit never blocks callers forever.
+        """
+        async with self._lock:
+            if self.capacity is None:
+                return
+            amount = min(amount, self.capacity)
+            deadline = time.monotonic() + self.max_wait
+            while True:
+                self._refill()
+                if self.tokens >= amount or self.refill_per_second <= 0:
+                    break
+                wait = (amount - self.tokens) / self.refill_per_second
+                remaining_wait = deadline - time.monotonic()
+                if remaining_wait <= 0:
+                    break
+                await asyncio.sleep(min(wait, remaining_wait))
+            self.tokens -= amount
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    Opens after `threshold` failures in a row, rejects calls for `cooldown`
+    seconds, then lets a single trial call through (half-open). A success
+    closes the circuit; a failed trial opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit will allow a trial call."""
+        return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and self.retry_after() <= 0:
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+        if self.state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.state = self.CLOSED
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a rate-limit reset duration such as "2m59.56s", "7.66s", "120ms" or "30".
+
+    Returns:
+        Seconds, or None if the value cannot be parsed
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
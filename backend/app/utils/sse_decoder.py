@@ -0,0 +1,160 @@
+import json
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library
+    orjson = None
+
+DATA_PREFIX = b"data:"
+DONE_MARKER = b"[DONE]"
+
+
+def _loads(data: memoryview):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(bytes(data))
+
+
+class StreamStats(NamedTuple):
+    chunks: int
+    completion_tokens: int
+    time_to_first_token: Optional[float]
+    duration: float
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Generation rate after the first token."""
+        if self.time_to_first_token is None:
+            return 0.0
+        generating = self.duration - self.time_to_first_token
+        if generating <= 0:
+            return 0.0
+        return self.completion_tokens / generating
+
+
+class SSEDecoder:
+    """
+    Incremental decoder for chat completion server-sent events.
+    Works directly on the raw response bytes: lines are located in a single
+    bytearray and handed to the JSON parser as memoryview slices, so only the
+    content deltas themselves are materialized as strings.
+
+    Usage:
+        decoder = SSEDecoder()
+        async for data in response.aiter_bytes():
+            for content in decoder.feed(data):
+                ...
+            if decoder.done:
+                break
+        decoder.text, decoder.stats()
+    """
+
+    def __init__(self, on_delta: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            on_delta: Called with each content delta as it is decoded
+        """
+        self.on_delta = on_delta
+        self.deltas: List[str] = []
+        self.done = False
+        self.chunks = 0
+        self.usage_tokens: Optional[int] = None
+        self.started_at = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._buffer = bytearray()
+
+    @property
+    def text(self) -> str:
+        """All content received so far."""
+        return "".join(self.deltas)
+
+    def feed(self, data: bytes) -> List[str]:
+        """
+        Decode a block of response bytes.
+
+        Args:
+            data: Next bytes of the response body, split anywhere
+
+        Returns:
+            Content deltas completed by this block
+        """
+        if self.done:
+            return []
+
+        buffer = self._buffer
+        buffer += data
+        deltas = self.deltas
+        new_deltas = []
+        consumed = 0
+        find = buffer.find
+        startswith = buffer.startswith
+
+        with memoryview(buffer) as view:
+            while True:
+                end = find(b"\n", consumed)
+                if end < 0:
+                    break
+                if not startswith(DATA_PREFIX, consumed):
+                    consumed = end + 1
+                    continue
+
+                start = consumed + 5
+                if buffer[start] == 32:  # optional space after "data:"
+                    start += 1
+                line_end = end - 1 if buffer[end - 1] == 13 else end  # strip \r
+                consumed = end + 1
+
+                with view[start:line_end] as payload:
+                    if payload == DONE_MARKER:
+                        self._finish()
+                        break
+                    try:
+                        chunk = _loads(payload)
+                    except ValueError:
+                        continue
+                self.chunks += 1
+
+                try:
+                    content = chunk["choices"][0]["delta"].get("content")
+                except (KeyError, IndexError, TypeError, AttributeError):
+                    content = None
+                if content:
+                    if self.first_token_at is None:
+                        self.first_token_at = time.perf_counter()
+                    deltas.append(content)
+                    new_deltas.append(content)
+                    if self.on_delta is not None:
+                        self.on_delta(content)
+
+                # Groq reports exact token usage in the last chunk
+                if "x_groq" in chunk or "usage" in chunk:
+                    self._record_usage(chunk)
+
+        del buffer[:consumed]
+        return new_deltas
+
+    def _record_usage(self, chunk: Dict):
+        usage = (chunk.get("x_groq") or {}).get("usage") or chunk.get("usage")
+        if usage and usage.get("completion_tokens") is not None:
+            self.usage_tokens = usage["completion_tokens"]
+
+    def _finish(self):
+        self.done = True
+        self.finished_at = time.perf_counter()
+
+    def stats(self) -> StreamStats:
+        """
+        Timing for the stream so far.
+        Completion tokens come from the reported usage when available,
+        otherwise each content delta is counted as one token.
+        """
+        end = self.finished_at or time.perf_counter()
+        return StreamStats(
+            chunks=self.chunks,
+            completion_tokens=self.usage_tokens if self.usage_tokens is not None else len(self.deltas),
+            time_to_first_token=None if self.first_token_at is None else self.first_token_at - self.started_at,
+            duration=end - self.started_at,
+        )
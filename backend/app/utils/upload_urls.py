@@ -0,0 +1,74 @@
+"""
+Short-lived signed URLs for uploads.
+
+<img> tags cannot send an Authorization header, so API responses carry
+upload URLs signed with an expiry and an HMAC of the path and expiry:
+    /uploads/reports/ab/cd/<hash>.jpg?expires=<unix time>&signature=<hex>
+Only rows the caller can read produce these URLs, and a URL stops working
+once it expires. The signature covers the path only, so the ?w= variants
+of a signed URL are allowed as well. Expiries are rounded up to a multiple
+of UPLOAD_URL_TTL, so a URL stays the same for a while and browsers keep
+their cached copy of the image.
+"""
+import os
+import hmac
+import time
+import hashlib
+from typing import Optional
+
+from app.utils.jwt_utils import SECRET_KEY
+
+# Signed URLs are valid for between UPLOAD_URL_TTL and twice that, in seconds
+UPLOAD_URL_TTL = int(os.getenv("UPLOAD_URL_TTL", "3600"))
+UPLOAD_URL_SECRET = os.getenv("UPLOAD_URL_SECRET", SECRET_KEY).encode("utf-8")
+
+
+def _signature(url_path: str, expires: int) -> str:
+    return hmac.new(UPLOAD_URL_SECRET, f"{url_path}:{expires}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def sign_upload_url(url_path: Optional[str], now: Optional[float] = None) -> Optional[str]:
+    """
+    Sign an upload URL path for use in responses.
+
+    Args:
+        url_path: Stored URL path (e.g. /uploads/reports/ab/cd/<hash>.jpg)
+        now: Current time, for tests
+
+    Returns:
+        The signed URL; other URLs (e.g. Google profile pictures) unchanged
+    """
+    if not url_path or not url_path.startswith("/uploads/"):
+        return url_path
+    now = time.time() if now is None else now
+    expires = (int(now) // UPLOAD_URL_TTL + 2) * UPLOAD_URL_TTL
+    return f"{url_path}?expires={expires}&signature={_signature(url_path, expires)}"
+
+
+def verify_upload_signature(
+    url_path: str,
+    expires: Optional[str],
+    signature: Optional[str],
+    now: Optional[float] = None,
+) -> bool:
+    """
+    Check the expiry and signature of a signed upload URL.
+
+    Args:
+        url_path: Requested URL path, without the query string
+        expires: The expires query parameter
+        signature: The signature query parameter
+        now: Current time, for tests
+
+    Returns:
+        True if the URL was signed by sign_upload_url and has not expired
+    """
+    if not expires or not signature:
+        return False
+    try:
+        expires_at = int(expires)
+    except ValueError:
+        return False
+    if expires_at < (time.time() if now is None else now):
+        return False
+    return hmac.compare_digest(_signature(url_path, expires_at), signature)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Compare extraction modes on bytes sent, latency and parse agreement.
+
+Record real Groq responses for a directory of images (needs GROQ_API_KEY):
+    python -m benchmarks.compare_extraction_modes --record <image_dir> <recordings_dir>
+
+Replay the recordings offline and print the comparison:
+    python -m benchmarks.compare_extraction_modes <recordings_dir>
+
+Pass --normalize to both steps to send images through the upload
+normalization pipeline, e.g. to check it does not hurt extraction accuracy.
+
+Run from the backend directory. Each recording is a subdirectory holding the
+source image plus one <mode>.json file per mode with the raw SSE body and
+latency of every Groq request that mode made.
+"""
+
+import sys
+import json
+import time
+import base64
+import asyncio
+import argparse
+import shutil
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+from PIL import Image
+
+from app.services import groq_client
+from app.services.groq_service import call_groq_vlm, EXTRACTION_MODES
+from app.services.image_service import normalize_image
+from app.utils.icd_parser import parse_icd_codes, STRUCTURED_FIELDS
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def load_data_url(image_path: Path, normalize: bool = False) -> str:
+    """Build the base64 data URL sent to Groq for an image file."""
+    image_bytes = image_path.read_bytes()
+    if normalize:
+        normalized = normalize_image(image_bytes)
+        image_bytes, mime_type = normalized.data, normalized.mime_type
+    else:
+        mime_type = f"image/{(Image.open(BytesIO(image_bytes)).format or 'JPEG').lower()}"
+    image_base64 = base64.b64encode(image_bytes).decode("utf-8")
+    return f"data:{mime_type};base64,{image_base64}"
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Forward requests to Groq and keep each response body and latency."""
+
+    def __init__(self):
+        self._transport = httpx.AsyncHTTPTransport()
+        self.responses: List[Dict] = []
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        response = await self._transport.handle_async_request(request)
+        body = await response.aread()
+        self.responses.append({
+            "latency_ms": (time.perf_counter() - start) * 1000,
+            "body": body.decode("utf-8"),
+        })
+        return httpx.Response(response.status_code, headers=response.headers, content=body)
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Serve recorded responses in order and count request bytes."""
+
+    def __init__(self, responses: List[Dict], speed: float = 1.0):
+        self._responses = list(responses)
+        self._speed = speed
+        self.bytes_sent = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.bytes_sent += len(request.content)
+        if not self._responses:
+            return httpx.Response(500, text="No recorded response left")
+        recorded = self._responses.pop(0)
+        await asyncio.sleep(recorded["latency_ms"] / 1000 / self._speed)
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            content=recorded["body"].encode("utf-8"),
+        )
+
+
+async def record(image_dir: Path, recordings_dir: Path, modes: List[str], normalize: bool):
+    """Call Groq for every image and mode, saving the raw responses."""
+    images = sorted(p for p in image_dir.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    for image_path in images:
+        sample_dir = recordings_dir / image_path.stem
+        sample_dir.mkdir(parents=True, exist_ok=True)
+        shutil.copy(image_path, sample_dir / image_path.name)
+        data_url = load_data_url(image_path, normalize)
+
+        for mode in modes:
+            transport = RecordingTransport()
+            groq_client.set_client(httpx.AsyncClient(transport=transport, timeout=groq_client.GROQ_READ_TIMEOUT))
+            await call_groq_vlm(data_url, mode)
+            (sample_dir / f"{mode}.json").write_text(json.dumps({"responses": transport.responses}))
+            print(f"Recorded {image_path.name} [{mode}]: {len(transport.responses)} request(s)")
+
+
+async def replay(recordings_dir: Path, modes: List[str], speed: float, normalize: bool) -> Dict[str, Dict]:
+    """Replay recordings for each mode and aggregate bytes, latency and agreement."""
+    baseline = "two_pass" if "two_pass" in modes else modes[0]
+    stats = {mode: {"bytes": [], "latency_ms": [], "agreement": []} for mode in modes}
+
+    for sample_dir in sorted(p for p in recordings_dir.iterdir() if p.is_dir()):
+        images = [p for p in sample_dir.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS]
+        if not images:
+            continue
+        data_url = load_data_url(images[0], normalize)
+
+        results = {}
+        for mode in modes:
+            recording = sample_dir / f"{mode}.json"
+            if not recording.exists():
+                continue
+            transport = ReplayTransport(json.loads(recording.read_text())["responses"], speed)
+            groq_client.set_client(httpx.AsyncClient(transport=transport))
+
+            start = time.perf_counter()
+            response_text = await call_groq_vlm(data_url, mode)
+            stats[mode]["latency_ms"].append((time.perf_counter() - start) * 1000)
+            stats[mode]["bytes"].append(transport.bytes_sent)
+            results[mode] = parse_icd_codes(response_text or "")
+
+        if baseline not in results:
+            continue
+        for mode, result in results.items():
+            matches = sum(
+                (result[field] or "").strip().lower() == (results[baseline][field] or "").strip().lower()
+                for field in STRUCTURED_FIELDS
+            )
+            stats[mode]["agreement"].append(matches / len(STRUCTURED_FIELDS))
+
+    return stats
+
+
+def print_report(stats: Dict[str, Dict]):
+    """Print a per-mode summary table."""
+    def mean(values):
+        return sum(values) / len(values) if values else 0.0
+
+    print(f"\n{'mode':<14}{'samples':>8}{'avg bytes sent':>16}{'avg latency ms':>16}{'agreement':>11}")
+    for mode, values in stats.items():
+        print(
+            f"{mode:<14}{len(values['bytes']):>8}{mean(values['bytes']):>16,.0f}"
+            f"{mean(values['latency_ms']):>16,.1f}{mean(values['agreement']):>10.0%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="<recordings_dir>, or <image_dir> <recordings_dir> with --record")
+    parser.add_argument("--record", action="store_true", help="Call Groq and save responses")
+    parser.add_argument("--modes", nargs="+", default=list(EXTRACTION_MODES), choices=EXTRACTION_MODES)
+    parser.add_argument("--normalize", action="store_true", help="Send images through normalize_image first")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier for recorded latency")
+    args = parser.parse_args()
+
+    if args.record:
+        if len(args.paths) != 2:
+            parser.error("--record needs <image_dir> <recordings_dir>")
+        asyncio.run(record(Path(args.paths[0]), Path(args.paths[1]), args.modes, args.normalize))
+        return 0
+
+    stats = asyncio.run(replay(Path(args.paths[0]), args.modes, args.speed, args.normalize))
+    print_report(stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
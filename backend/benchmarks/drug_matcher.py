@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Compile time and scan throughput of the drug-name matcher.
+
+    python -m benchmarks.drug_matcher --runs 200
+
+Run from the backend directory. Texts are generated full descriptions in
+English and Korean mentioning a few medications, padded to each size.
+"""
+
+import sys
+import time
+import random
+import argparse
+
+from app.utils.drug_matcher import DrugMatcher, load_drug_names
+
+SIZES = (500, 2000, 8000, 32000)
+SENTENCES = [
+    "This is a prescription (처방전) issued by Seoul Medical Clinic on 2024-03-15.",
+    "Medications: Famotidine 20mg, one tablet twice daily after meals for 7 days.",
+    "아모잘탄정 5/50mg 1일 1회 아침 식후 복용.",
+    "Metformin 500mg (Glucophage) twice daily with meals.",
+    "Patient reports epigastric pain and bursitis of the left shoulder.",
+    "타이레놀정 500mg 필요시 복용, 무코스타정 100mg 1일 3회.",
+    "Follow-up in 2 weeks; blood pressure 128/82 mmHg.",
+]
+
+
+def _text(size: int, rng: random.Random) -> str:
+    parts = []
+    while sum(len(part) + 1 for part in parts) < size:
+        parts.append(rng.choice(SENTENCES))
+    return " ".join(parts)[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    entries = load_drug_names()
+    start = time.perf_counter()
+    matcher = DrugMatcher(entries)
+    print(f"{len(entries)} names compiled into {len(matcher)} states in {(time.perf_counter() - start) * 1e3:.1f}ms")
+
+    rng = random.Random(0)
+    print(f"\n{'size':>8} {'matches':>8} {'us/call':>10} {'MB/s':>8}")
+    for size in SIZES:
+        text = _text(size, rng)
+        matches = len(matcher.find(text))
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            matcher.find(text)
+        per_call = (time.perf_counter() - start) / args.runs
+        print(f"{size:>8} {matches:>8} {per_call * 1e6:>10.1f} {len(text.encode('utf-8')) / per_call / 1e6:>8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
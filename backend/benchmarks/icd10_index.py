@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Alias check, load time, build time and query cost of the ICD-10
+disease-name index.
+
+Check the aliases file against the table, then time the index:
+    python -m benchmarks.icd10_index --runs 200
+
+Only check:
+    python -m benchmarks.icd10_index --check
+
+The check fails for an alias whose code is not in the table, is deeper
+than the index keeps (WHO/KCD depth), or whose table name column differs
+from the table's name for the code, i.e. the alias was written for a code
+that means something else.
+
+Run from the backend directory. Queries cover exact names, aliases,
+Korean names, misspellings, descriptive phrases and names that should not
+resolve to any code.
+"""
+
+import sys
+import time
+import argparse
+import resource
+
+from app.utils.icd10 import get_icd10_table, normalize_icd_code
+from app.utils.icd10_index import (
+    ICD10_ALIASES_PATH,
+    ICD10_INDEX_PATH,
+    MAX_INDEXED_CODE_LENGTH,
+    MIN_MATCH_SCORE,
+    ICD10NameIndex,
+    build_index,
+    read_alias_file,
+)
+
+QUERIES = [
+    "Gastritis, unspecified", "Essential (primary) hypertension", "고혈압", "급성 위염 (Acute gastritis)",
+    "hypertention", "acute tonsilitis", "Type II diabetes mellitus", "Hyperlipidemia and related conditions",
+    "Diabetes mellitus type 2 with hyperglycemia", "알레르기 비염", "COVID-19", "Not specified", "N/A", "Infection",
+]
+
+
+def check_aliases() -> bool:
+    """Compare every alias's code and table name column with the table; print mismatches."""
+    table = get_icd10_table()
+    rows = read_alias_file()
+    failures = 0
+    for number, code, table_name, alias in rows:
+        canonical = normalize_icd_code(code)
+        name = table.name(canonical) if canonical else None
+        if name is None:
+            problem = "code is not in the table"
+        elif len(canonical.replace('.', '')) > MAX_INDEXED_CODE_LENGTH:
+            problem = f"code is deeper than {MAX_INDEXED_CODE_LENGTH} characters"
+        elif name != table_name:
+            problem = f"the table names it {name!r}, not {table_name!r}"
+        else:
+            continue
+        failures += 1
+        print(f"{ICD10_ALIASES_PATH}:{number}: {code} {alias!r}: {problem}")
+    print(f"aliases: {len(rows) - failures}/{len(rows)} agree with the table")
+    return failures == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--check", action="store_true", help="Only check the aliases file")
+    args = parser.parse_args()
+
+    ok = check_aliases()
+    if args.check:
+        return 0 if ok else 1
+
+    start = time.perf_counter()
+    index = ICD10NameIndex.load(ICD10_INDEX_PATH)
+    elapsed = time.perf_counter() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{len(index)} names mapped in {elapsed * 1e3:.1f}ms, peak RSS {rss:.0f}MB")
+
+    start = time.perf_counter()
+    built = build_index()
+    print(f"{len(built)} names indexed in memory in {(time.perf_counter() - start) * 1e3:.0f}ms")
+
+    for query in QUERIES:
+        matches = index.search(query, limit=1, min_score=MIN_MATCH_SCORE)
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            index.search(query, limit=1, min_score=MIN_MATCH_SCORE)
+        per_query = (time.perf_counter() - start) / args.runs
+        best = f"{matches[0].code} {matches[0].name} ({matches[0].score:.2f})" if matches else "-"
+        print(f"{per_query * 1e6:8.0f}us  {query!r} -> {best}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
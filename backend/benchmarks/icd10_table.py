@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Load time, lookup cost and memory of the bundled ICD-10 table.
+
+    python -m benchmarks.icd10_table --lookups 200000
+
+Run from the backend directory. Resident memory is read from
+/proc/self/status, so the memory line is only printed on Linux.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+from app.utils.icd10 import ICD10_TABLE_PATH, ICD10Table, canonicalize_icd_code
+
+SAMPLE_CODES = ["K29.7", "I10", "E11.9", "J06.9", "M54.5", "E78.5", "D50.9", "E11.65", "C4A.0", "Z99.99", "B03", "X99"]
+
+
+def _rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=200000)
+    args = parser.parse_args()
+
+    rss_before = _rss_kb()
+    start = time.perf_counter()
+    table = ICD10Table(ICD10_TABLE_PATH)
+    load = time.perf_counter() - start
+    print(f"{len(table)} codes, {os.path.getsize(ICD10_TABLE_PATH):,} bytes, {table.slot_count} slots, "
+          f"opened in {load * 1e6:.0f}us")
+
+    for code in SAMPLE_CODES:
+        table.name(code)
+    rss_after = _rss_kb()
+
+    rng = random.Random(0)
+    codes = [rng.choice(SAMPLE_CODES) for _ in range(args.lookups)]
+    start = time.perf_counter()
+    for code in codes:
+        table.name(code)
+    per_lookup = (time.perf_counter() - start) / args.lookups
+    print(f"name(): {per_lookup * 1e9:.0f}ns per lookup")
+
+    start = time.perf_counter()
+    for code in codes:
+        canonicalize_icd_code(code)
+    per_lookup = (time.perf_counter() - start) / args.lookups
+    print(f"canonicalize_icd_code(): {per_lookup * 1e9:.0f}ns per call")
+
+    if rss_before:
+        print(f"resident memory added: {rss_after - rss_before:,} KB (mapped pages are shared page cache, not copied per worker)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Golden-corpus check and throughput benchmark for parse_icd_codes.
+
+Check the parser against the golden corpus, then time it across response sizes:
+    python -m benchmarks.icd_parser
+
+Only check, or only benchmark:
+    python -m benchmarks.icd_parser --check
+    python -m benchmarks.icd_parser --benchmark --runs 500
+
+The golden corpus (benchmarks/data/icd_parser_golden.json) holds generated
+model responses with the parser output they must produce. It covers the
+structured pass-2 format with header, case and ordering variations, missing
+sections, CRLF line endings, Korean text, unstructured pass-1 descriptions
+and Unicode characters with unusual case folding. Regenerate it with
+--regenerate only when the parser output is meant to change.
+
+Run from the backend directory.
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+from app.utils.icd_parser import parse_icd_codes, CASE_FOLD_EXCEPTIONS
+
+GOLDEN_PATH = Path(__file__).parent / "data" / "icd_parser_golden.json"
+CORPUS_SEED = 20240315
+CORPUS_SIZE = 240
+BENCHMARK_SIZES = (500, 2000, 8000, 32000)
+
+REPORT_TYPES = [
+    "prescription", "medical_certificate", "examination_report", '"prescription"', "'examination_report'",
+    "Prescription (처방전)", "medical certificate", "examination-report", "Rx", "진단서", "검진서",
+    "[prescription]", "checkup report", "diagnosis certificate", "unknown", "",
+]
+DISEASES = [
+    "Gastritis, unspecified", "Essential (primary) hypertension", "Type 2 diabetes mellitus without complications",
+    "급성 위염 (Acute gastritis)", "Acute upper respiratory infection", "[Not specified]", "N/A", "Hyperlipidemia",
+    "Low back pain", "Allergic rhinitis, unspecified", "**Influenza**", "Iron deficiency anemia", "",
+    "Hypertension\nwith secondary notes on the next line", "고혈압",
+]
+ICD_CODES = [
+    "K29.7", "I10", "E11.9", "J06.9", "[K29.7]", "k29.7", "M54.5", "J30.9", "E78.5", "D50.9", "Not found",
+    "R10-A", "", "ICD-10: I10", "E11.65", "Z00.00",
+]
+MEDICINES = [
+    "Famotidine 20mg, Almagate 1g", "Amlodipine 5mg", "Metformin 500mg (Glucophage)", "[Leave blank]",
+    "아모잘탄정 5/50mg", "Atorvastatin 10 mg tablet", "Loxoprofen 60mg; Rebamipide 100mg", "", "N/A",
+    "Cetirizine 10mg\n- Fluticasone nasal spray",
+]
+DESCRIPTION_SENTENCES = [
+    "This is a prescription (처방전) issued by Seoul Medical Clinic on 2024-03-15.",
+    "Patient: Kim Minji, 34 years old.",
+    "Prescribing physician: Dr. Lee Junho.",
+    "Diagnosis code K29.7 (gastritis, unspecified) is printed next to the diagnosis field.",
+    "Medications: Famotidine 20mg, one tablet twice daily after meals for 7 days.",
+    "Take one capsule before bedtime.",
+    "The certificate states the patient was diagnosed with essential hypertension (I10).",
+    "Blood test results show fasting glucose of 132 mg/dL; screening recommended.",
+    "Lab result: HbA1c 7.2%. Code E11.9 noted by the examining physician.",
+    "The document type: medical_certificate was stamped by the hospital.",
+    "Prescribed: Amlodipine 5mg once daily.",
+    "Drug: Atorvastatin 10mg, used to treat Hyperlipidemia and related conditions.",
+    "Condition: stable, follow-up in 2 weeks.",
+    "Indicated for Acute upper respiratory infection with cough.",
+    "Room A12 on floor B03, reference number C45.",
+    "환자는 위염 진단을 받았으며 약국에서 조제되었습니다.",
+    "Kelvin sign test \u212a29.7 and dotted \u0130CD code \u0131cd drug \u017fcreening.",
+    "Type 2 diabetes mellitus is managed with Metformin.",
+    "Visit date 2024-01-02; insurance code X99.",
+    "Pharmacy instructions: keep refrigerated, 5 ml syrup three times a day.",
+]
+HEADER_STYLES = [
+    "**{name}:** {value}",
+    "**{name}**: {value}",
+    "**{name}** {value}",
+    "{name}: {value}",
+    "**{upper}:** {value}",
+    "- **{name}:** {value}",
+    "{index}. **{name}:** {value}",
+    "### {name}\n{value}",
+]
+SECTION_NAMES = ["Document Type", "Disease Name", "Disease ICD Code", "Medicine Name", "Full Description"]
+
+
+def _description(rng: random.Random, sentences: int) -> str:
+    return " ".join(rng.choice(DESCRIPTION_SENTENCES) for _ in range(sentences))
+
+
+def _structured_response(rng: random.Random) -> str:
+    values = {
+        "Document Type": rng.choice(REPORT_TYPES),
+        "Disease Name": rng.choice(DISEASES),
+        "Disease ICD Code": rng.choice(ICD_CODES),
+        "Medicine Name": rng.choice(MEDICINES),
+        "Full Description": _description(rng, rng.randint(1, 8)),
+    }
+    names = list(SECTION_NAMES)
+    if rng.random() < 0.2:
+        rng.shuffle(names)
+    style = rng.choice(HEADER_STYLES)
+    sections = []
+    for index, name in enumerate(names, 1):
+        if rng.random() < 0.1:
+            continue  # missing section
+        line_style = rng.choice(HEADER_STYLES) if rng.random() < 0.2 else style
+        sections.append(line_style.format(name=name, upper=name.upper(), value=values[name], index=index))
+    text = "\n\n".join(sections)
+    if rng.random() < 0.3:
+        text = "Based on the document analysis, here is the structured information:\n\n" + text
+    if rng.random() < 0.2:
+        text += "\n\n" + _description(rng, rng.randint(1, 4))
+    return text
+
+
+def _unstructured_response(rng: random.Random) -> str:
+    paragraphs = [_description(rng, rng.randint(1, 6)) for _ in range(rng.randint(1, 4))]
+    return "\n\n".join(paragraphs)
+
+
+def build_corpus(seed: int = CORPUS_SEED, size: int = CORPUS_SIZE) -> List[str]:
+    """Generate the corpus inputs deterministically."""
+    rng = random.Random(seed)
+    corpus = ["", "   ", "\n", "I10", "**Disease ICD Code:**", "type: rx\r\nDrug: Aspirin 100mg"]
+    while len(corpus) < size:
+        text = _structured_response(rng) if rng.random() < 0.75 else _unstructured_response(rng)
+        if rng.random() < 0.15:
+            text = text.replace("\n", "\r\n")
+        elif rng.random() < 0.05:
+            text = text.replace("\n", "\r")
+        if rng.random() < 0.1:
+            text = text.lower()
+        corpus.append(text)
+    return corpus
+
+
+def _expected(text: str) -> Dict:
+    result = parse_icd_codes(text)
+    if result["full_description"] != text:
+        raise AssertionError("full_description must be the unmodified input")
+    del result["full_description"]
+    return result
+
+
+def regenerate():
+    corpus = build_corpus()
+    cases = [{"input": text, "expected": _expected(text)} for text in corpus]
+    GOLDEN_PATH.parent.mkdir(parents=True, exist_ok=True)
+    GOLDEN_PATH.write_text(json.dumps(cases, ensure_ascii=False, indent=1) + "\n", encoding="utf-8")
+    print(f"Wrote {len(cases)} cases to {GOLDEN_PATH}")
+
+
+def check() -> bool:
+    """Compare parse_icd_codes with every golden case; print mismatches."""
+    cases = json.loads(GOLDEN_PATH.read_text(encoding="utf-8"))
+    failures = 0
+    for index, case in enumerate(cases):
+        actual = parse_icd_codes(case["input"])
+        if actual.pop("full_description") != case["input"] or actual != case["expected"]:
+            failures += 1
+            if failures <= 5:
+                print(f"case {index}: expected {case['expected']}, got {actual}")
+    print(f"golden corpus: {len(cases) - failures}/{len(cases)} cases match")
+    return failures == 0
+
+
+def _sized(base: str, padding: List[str], size: int) -> str:
+    text = base
+    index = 0
+    while len(text) < size:
+        text += "\n\n" + padding[index % len(padding)]
+        index += 1
+    return text[:size]
+
+
+def benchmark(runs: int):
+    """
+    Time parse_icd_codes at each size for a structured pass-2 response padded
+    with extra description, and for an unstructured pass-1 description (where
+    most patterns find nothing and the context heuristic runs).
+    """
+    rng = random.Random(CORPUS_SEED)
+    structured = "\n\n".join(
+        f"**{name}:** {value}" for name, value in zip(SECTION_NAMES, (
+            "prescription", DISEASES[0], ICD_CODES[0], MEDICINES[0], DESCRIPTION_SENTENCES[0],
+        ))
+    )
+    # Leave out the unusual case-folding sample, which takes the parser's slow path
+    padding = [text for text in (_unstructured_response(rng) for _ in range(200)) if not CASE_FOLD_EXCEPTIONS.search(text)]
+
+    print(f"\n{'size':>8}{'kind':>14}{'us/call':>12}{'MB/s':>10}")
+    for size in BENCHMARK_SIZES:
+        for kind, base in (("structured", structured), ("unstructured", padding[0])):
+            text = _sized(base, padding[1:], size)
+            start = time.perf_counter()
+            for _ in range(runs):
+                parse_icd_codes(text)
+            per_call = (time.perf_counter() - start) / runs
+            print(f"{size:>8}{kind:>14}{per_call * 1e6:>12.1f}{size / per_call / 1e6:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="Only run the golden-corpus check")
+    parser.add_argument("--benchmark", action="store_true", help="Only run the benchmark")
+    parser.add_argument("--regenerate", action="store_true", help="Rewrite the golden corpus from the current parser")
+    parser.add_argument("--runs", type=int, default=300)
+    args = parser.parse_args()
+
+    if args.regenerate:
+        regenerate()
+        return 0
+
+    ok = True
+    if not args.benchmark:
+        ok = check()
+    if not args.check:
+        benchmark(args.runs)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Measure the size reduction and cost of the VLM image normalization.
+
+Usage (from the backend directory):
+    python -m benchmarks.image_normalization <image_dir>
+
+IMAGE_MAX_EDGE, IMAGE_OUTPUT_FORMAT, IMAGE_QUALITY and IMAGE_GRAYSCALE are
+read from the environment, so settings can be compared run against run.
+Check extraction accuracy for the same settings with
+benchmarks.compare_extraction_modes --normalize.
+"""
+
+import sys
+import time
+import base64
+from pathlib import Path
+
+from app.services import image_service
+from app.services.image_service import normalize_image
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python -m benchmarks.image_normalization <image_dir>")
+        return 1
+
+    images = sorted(p for p in Path(sys.argv[1]).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if not images:
+        print("No images found")
+        return 1
+
+    print(
+        f"max_edge={image_service.IMAGE_MAX_EDGE} format={image_service.IMAGE_OUTPUT_FORMAT} "
+        f"quality={image_service.IMAGE_QUALITY} grayscale={image_service.IMAGE_GRAYSCALE}\n"
+    )
+    print(f"{'image':<32}{'original':>12}{'normalized':>12}{'saved':>8}{'data URL':>12}{'ms':>8}")
+
+    total_in = total_out = 0
+    total_ms = 0.0
+    for image_path in images:
+        image_bytes = image_path.read_bytes()
+        start = time.perf_counter()
+        normalized = normalize_image(image_bytes)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        data_url_bytes = len(base64.b64encode(normalized.data))
+
+        total_in += len(image_bytes)
+        total_out += len(normalized.data)
+        total_ms += elapsed_ms
+        print(
+            f"{image_path.name[:31]:<32}{len(image_bytes):>12,}{len(normalized.data):>12,}"
+            f"{normalized.reduction:>8.0%}{data_url_bytes:>12,}{elapsed_ms:>8.1f}"
+        )
+
+    print(
+        f"\nTotal {total_in:,} -> {total_out:,} bytes "
+        f"({1 - total_out / total_in:.0%} smaller), {total_ms / len(images):.1f} ms/image"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
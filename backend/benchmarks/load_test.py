@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Load-test the extraction, translation and database-bound endpoints of a running app.
+
+Start the mock Groq server and the app with caching off so every request
+reaches the model:
+    python -m benchmarks.mock_groq_server --token-rate 150 --latency-ms 400
+    LLM_BACKEND=mock EXTRACTION_CACHE_ENABLED=false TRANSLATION_CACHE_ENABLED=false \\
+        uvicorn app.main:app --port 9090
+
+Then drive it:
+    python -m benchmarks.load_test --endpoint extract --image <image> --requests 200 --concurrency 20
+    python -m benchmarks.load_test --endpoint translate --requests 500 --concurrency 50
+
+The reports and me endpoints measure database round trips per worker. Run
+the app with a single worker (uvicorn app.main:app --port 9090 --workers 1)
+against MySQL, or SQLite for a quick local run (DATABASE_URL=sqlite:///./load.db),
+and sign a token for an existing user with the app's JWT_SECRET_KEY:
+    python -m benchmarks.load_test --endpoint reports --user-id 1 --requests 2000 --concurrency 50
+
+Comparing this against the same run before the routes moved to the async
+session shows the concurrency gained per worker: with blocking queries
+throughput stays flat as --concurrency grows, with async ones it scales
+until the connection pool (DB_POOL_SIZE + DB_MAX_OVERFLOW) is saturated.
+
+Reports throughput, latency percentiles (time to first event for the
+streaming endpoint as well) and errors by status code.
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+ENDPOINTS = ("extract", "stream", "translate", "reports", "me")
+DB_ENDPOINTS = {"reports": "/api/reports", "me": "/api/users/me"}
+
+SAMPLE_TEXT = "Take one tablet of Famotidine 20mg twice daily after meals for 7 days."
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def send_request(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    image: Optional[bytes],
+    image_name: str
+) -> Dict:
+    """Send one request and time it."""
+    start = time.perf_counter()
+    first_event = None
+
+    if endpoint == "translate":
+        response = await client.post("/api/translate", json={"text": SAMPLE_TEXT, "target_language": "ko"})
+    elif endpoint in DB_ENDPOINTS:
+        response = await client.get(DB_ENDPOINTS[endpoint])
+    else:
+        path = "/api/extract-icd/stream" if endpoint == "stream" else "/api/extract-icd"
+        files = {"file": (image_name, image, "image/jpeg")}
+        async with client.stream("POST", path, files=files) as response:
+            async for line in response.aiter_lines():
+                if first_event is None and line.startswith("event:"):
+                    first_event = time.perf_counter() - start
+                if line.startswith("event: error"):
+                    return {"status": "stream_error", "latency": time.perf_counter() - start, "first_event": first_event}
+
+    return {
+        "status": response.status_code,
+        "latency": time.perf_counter() - start,
+        "first_event": first_event,
+    }
+
+
+async def run(
+    base_url: str,
+    endpoint: str,
+    image_path: Optional[Path],
+    total: int,
+    concurrency: int,
+    token: Optional[str] = None,
+) -> Dict:
+    """Send `total` requests with at most `concurrency` in flight."""
+    image = image_path.read_bytes() if image_path else None
+    image_name = image_path.name if image_path else ""
+    results = []
+    next_index = 0
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal next_index
+        while next_index < total:
+            next_index += 1
+            try:
+                results.append(await send_request(client, endpoint, image, image_name))
+            except httpx.HTTPError as e:
+                results.append({"status": type(e).__name__, "latency": 0.0, "first_event": None})
+
+    limits = httpx.Limits(max_connections=concurrency)
+    headers = {"Authorization": f"Bearer {token}"} if token else None
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits, headers=headers) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {"results": results, "elapsed": elapsed}
+
+
+def print_report(endpoint: str, concurrency: int, run_stats: Dict):
+    """Print throughput, latency percentiles and status counts."""
+    results = run_stats["results"]
+    ok = [r for r in results if r["status"] == 200]
+    latencies = [r["latency"] * 1000 for r in ok]
+    first_events = [r["first_event"] * 1000 for r in ok if r["first_event"] is not None]
+
+    print(f"\n{endpoint}: {len(results)} requests, concurrency {concurrency}, {run_stats['elapsed']:.1f}s")
+    print(f"throughput      {len(ok) / run_stats['elapsed']:8.2f} req/s (successful)")
+    for label, values in (("latency ms", latencies), ("first event ms", first_events)):
+        if values:
+            print(
+                f"{label:<16}p50 {percentile(values, 0.5):8.1f}  p90 {percentile(values, 0.9):8.1f}  "
+                f"p99 {percentile(values, 0.99):8.1f}  max {max(values):8.1f}"
+            )
+    print("status          " + ", ".join(f"{status}: {count}" for status, count in Counter(
+        str(r["status"]) for r in results
+    ).most_common()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:9090", help="Base URL of the running app")
+    parser.add_argument("--endpoint", choices=ENDPOINTS, default="extract")
+    parser.add_argument("--image", type=Path, help="Image to upload (extract and stream endpoints)")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--token", help="Access token for the reports and me endpoints")
+    parser.add_argument("--user-id", type=int, help="Sign an access token for this user (needs the app's JWT_SECRET_KEY)")
+    args = parser.parse_args()
+
+    if args.endpoint in ("extract", "stream") and args.image is None:
+        parser.error(f"--endpoint {args.endpoint} needs --image")
+
+    token = args.token
+    if token is None and args.user_id is not None:
+        from app.utils.jwt_utils import create_access_token
+        token = create_access_token(data={"sub": str(args.user_id)})
+    if args.endpoint in DB_ENDPOINTS and token is None:
+        parser.error(f"--endpoint {args.endpoint} needs --token or --user-id")
+
+    run_stats = asyncio.run(run(args.url, args.endpoint, args.image, args.requests, args.concurrency, token))
+    print_report(args.endpoint, args.concurrency, run_stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
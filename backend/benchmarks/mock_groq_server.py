@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Groq chat completions API.
+
+Replays recorded Groq SSE responses (the recordings written by
+compare_extraction_modes --record) with a configurable token rate, latency
+distribution and error injection, so the whole pipeline can be load-tested
+without network access or an API key. Without --recordings it serves a
+built-in sample prescription.
+
+Start the stand-in, then point the app at it:
+    python -m benchmarks.mock_groq_server --recordings <recordings_dir> --token-rate 150
+    LLM_BACKEND=mock uvicorn app.main:app --port 9090
+
+Run from the backend directory. Requests carrying the structured extraction
+prompt get a recorded pass-2 (or single-pass) response, other image requests
+get a recorded pass-1 description, requests with a response_format
+(EXTRACTION_OUTPUT=json) get the sample extraction as JSON, and other
+non-streaming requests (translation) echo the user text back.
+"""
+
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.utils.sse_decoder import SSEDecoder
+
+# Marker present in both the two-pass extraction prompt and the single-pass prompt
+EXTRACTION_MARKER = "**Document Type:**"
+
+SAMPLE_DESCRIPTION = (
+    "This is a prescription (처방전) issued by Seoul Medical Clinic on 2024-03-15. "
+    "Patient: Kim Minji, 34 years old. Prescribing physician: Dr. Lee Junho. "
+    "Diagnosis code K29.7 (gastritis, unspecified) is printed next to the diagnosis field. "
+    "Medications: Famotidine 20mg, one tablet twice daily after meals for 7 days; "
+    "Almagate 1g, three times daily for 7 days."
+)
+
+SAMPLE_EXTRACTION = (
+    "**Document Type:** prescription\n\n"
+    "**Disease Name:** Gastritis, unspecified\n\n"
+    "**Disease ICD Code:** K29.7\n\n"
+    "**Medicine Name:** Famotidine 20mg, Almagate 1g\n\n"
+    "**Full Description:** " + SAMPLE_DESCRIPTION
+)
+
+SAMPLE_EXTRACTION_JSON = json.dumps({
+    "report_type": "prescription",
+    "disease_name": "Gastritis, unspecified",
+    "disease_icd_code": "K29.7",
+    "medicine_name": "Famotidine 20mg, Almagate 1g",
+    "full_description": SAMPLE_DESCRIPTION,
+}, ensure_ascii=False)
+
+app = FastAPI(title="Mock Groq API")
+
+
+def split_tokens(text: str) -> List[str]:
+    """Split text into word-sized chunks, roughly like a tokenizer's deltas."""
+    tokens = []
+    start = 0
+    for index in range(1, len(text)):
+        if text[index] == " " and text[index - 1] != " ":
+            tokens.append(text[start:index])
+            start = index
+    tokens.append(text[start:])
+    return [token for token in tokens if token]
+
+
+def load_recordings(recordings_dir: Path) -> Dict[str, List[List[str]]]:
+    """
+    Load recorded responses grouped by the kind of request they answer.
+
+    Returns:
+        {"describe": [deltas, ...], "extract": [deltas, ...]}
+    """
+    pools = {"describe": [], "extract": []}
+    for recording in sorted(recordings_dir.glob("*/*.json")):
+        responses = json.loads(recording.read_text()).get("responses", [])
+        for index, response in enumerate(responses):
+            decoder = SSEDecoder()
+            decoder.feed(response["body"].encode("utf-8"))
+            deltas = decoder.deltas
+            if not deltas:
+                continue
+            # single_pass makes one extraction request; the other modes describe first
+            if recording.stem == "single_pass" or index > 0:
+                pools["extract"].append(deltas)
+            else:
+                pools["describe"].append(deltas)
+    return pools
+
+
+class MockSettings:
+    """Behaviour of the stand-in, set from the command line."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.token_rate = args.token_rate
+        self.latency_ms = args.latency_ms
+        self.latency_dist = args.latency_dist
+        self.latency_spread = args.latency_spread
+        self.error_rate = args.error_rate
+        self.rate_limit_rate = args.rate_limit_rate
+        self.disconnect_rate = args.disconnect_rate
+        self.rpm = args.rpm
+        self.pools = {
+            "describe": [split_tokens(SAMPLE_DESCRIPTION)],
+            "extract": [split_tokens(SAMPLE_EXTRACTION)],
+        }
+        if args.recordings:
+            recorded = load_recordings(Path(args.recordings))
+            for kind, responses in recorded.items():
+                if responses:
+                    self.pools[kind] = responses
+        self.request_times = deque()
+
+    def first_token_delay(self) -> float:
+        """Draw a time-to-first-token in seconds from the latency distribution."""
+        median = self.latency_ms / 1000
+        if median <= 0:
+            return 0.0
+        if self.latency_dist == "uniform":
+            return random.uniform(median * (1 - self.latency_spread), median * (1 + self.latency_spread))
+        if self.latency_dist == "exponential":
+            return random.expovariate(1 / median)
+        if self.latency_dist == "lognormal":
+            return random.lognormvariate(math.log(median), self.latency_spread)
+        return median
+
+    def rate_limit_headers(self) -> Optional[Dict[str, str]]:
+        """
+        Count the request against the requests-per-minute window.
+
+        Returns:
+            x-ratelimit-* headers, or None when the window is full
+        """
+        if not self.rpm:
+            return {}
+        now = time.monotonic()
+        while self.request_times and now - self.request_times[0] >= 60:
+            self.request_times.popleft()
+        if len(self.request_times) >= self.rpm:
+            return None
+        self.request_times.append(now)
+        reset = 60 - (now - self.request_times[0])
+        return {
+            "x-ratelimit-limit-requests": str(self.rpm),
+            "x-ratelimit-remaining-requests": str(self.rpm - len(self.request_times)),
+            "x-ratelimit-reset-requests": f"{reset:.2f}s",
+        }
+
+
+settings: Optional[MockSettings] = None
+
+
+def _request_kind(payload: Dict) -> str:
+    """Classify a request as "describe", "extract" or "complete"."""
+    if not payload.get("stream"):
+        return "complete"
+    for message in payload.get("messages", []):
+        content = message.get("content")
+        parts = content if isinstance(content, list) else [{"type": "text", "text": content or ""}]
+        if any(EXTRACTION_MARKER in part.get("text", "") for part in parts if part.get("type") == "text"):
+            return "extract"
+    return "describe"
+
+
+def _chunk(completion_id: str, model: str, content: Optional[str], finish_reason: Optional[str] = None) -> str:
+    """Format one chat.completion.chunk SSE event."""
+    delta = {"content": content} if content is not None else {}
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+
+async def _stream_tokens(tokens: List[str], model: str, disconnect: bool):
+    """Emit tokens at the configured rate, optionally dropping the connection midway."""
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    await asyncio.sleep(settings.first_token_delay())
+    cut_at = random.randrange(1, len(tokens)) if disconnect and len(tokens) > 1 else None
+    interval = 1 / settings.token_rate if settings.token_rate > 0 else 0
+
+    started = time.perf_counter()
+    for index, token in enumerate(tokens):
+        if index == cut_at:
+            raise ConnectionResetError("Injected disconnect")
+        if interval:
+            # Pace against the start time so sleep overhead does not accumulate
+            delay = started + index * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        yield _chunk(completion_id, model, token)
+
+    yield _chunk(completion_id, model, None, "stop")
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    payload = await request.json()
+    model = payload.get("model", "mock")
+
+    headers = settings.rate_limit_headers()
+    if headers is None or random.random() < settings.rate_limit_rate:
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}},
+            headers={"retry-after": "1"},
+        )
+    if random.random() < settings.error_rate:
+        return JSONResponse(status_code=500, content={"error": {"message": "Injected server error"}}, headers=headers)
+
+    kind = _request_kind(payload)
+    if kind == "complete":
+        if payload.get("response_format"):
+            text = SAMPLE_EXTRACTION_JSON
+        else:
+            # Echo the last user message; translation output content does not matter for load tests
+            text = next(
+                (m["content"] for m in reversed(payload.get("messages", [])) if m.get("role") == "user"),
+                "",
+            )
+        await asyncio.sleep(settings.first_token_delay())
+        if settings.token_rate > 0:
+            await asyncio.sleep(len(split_tokens(text)) / settings.token_rate)
+        return JSONResponse(content={
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        }, headers=headers)
+
+    tokens = random.choice(settings.pools[kind])
+    disconnect = random.random() < settings.disconnect_rate
+    return StreamingResponse(
+        _stream_tokens(tokens, model, disconnect),
+        media_type="text/event-stream",
+        headers=headers,
+    )
+
+
+def main():
+    global settings
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recordings", help="Recordings directory from compare_extraction_modes --record")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--token-rate", type=float, default=200, help="Tokens per second per stream (0 = unthrottled)")
+    parser.add_argument("--latency-ms", type=float, default=300, help="Median time to first token")
+    parser.add_argument("--latency-dist", choices=("fixed", "uniform", "exponential", "lognormal"), default="lognormal")
+    parser.add_argument("--latency-spread", type=float, default=0.5,
+                        help="Relative half-width for uniform, sigma for lognormal")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="Fraction of streams cut off midway")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests-per-minute limit with x-ratelimit headers (0 = off)")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible runs")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    settings = MockSettings(args)
+    print(
+        f"Mock Groq API: {len(settings.pools['describe'])} description and "
+        f"{len(settings.pools['extract'])} extraction responses"
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
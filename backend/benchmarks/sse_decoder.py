@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for decoding Groq SSE streams.
+
+Compares the previous per-line loop (aiter_lines + json.loads + string
+concatenation) with SSEDecoder on synthetic Groq-shaped responses:
+    python -m benchmarks.sse_decoder --tokens 2000 --runs 200
+
+Run from the backend directory. Both decoders read the same body from an
+in-memory httpx response split into network-sized blocks, so the numbers
+cover only decoding cost.
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from typing import List
+
+import httpx
+
+from app.utils.sse_decoder import SSEDecoder, orjson
+
+WORDS = [
+    " patient", " prescribed", " Famotidine", " 20mg", " twice", " daily", " after", " meals",
+    " 처방", " 위염", " diagnosis", " K29.7", " tablet", " for", " 7", " days", ".", "\n",
+]
+
+
+def build_body(tokens: int) -> bytes:
+    """Build an SSE body with one content delta per chunk, like Groq's responses."""
+    events = []
+    for index in range(tokens):
+        chunk = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "created": 1700000000,
+            "model": "meta-llama/llama-4-maverick-17b-128e-instruct",
+            "system_fingerprint": "fp_bench",
+            "choices": [{"index": 0, "delta": {"content": WORDS[index % len(WORDS)]}, "logprobs": None,
+                         "finish_reason": None}],
+        }
+        events.append(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+    events.append("data: [DONE]\n\n")
+    return "".join(events).encode("utf-8")
+
+
+def split_blocks(body: bytes, seed: int = 0) -> List[bytes]:
+    """Split a body into 1-16 KB blocks at arbitrary byte offsets."""
+    rng = random.Random(seed)
+    blocks = []
+    start = 0
+    while start < len(body):
+        size = rng.randint(1024, 16384)
+        blocks.append(body[start:start + size])
+        start += size
+    return blocks
+
+
+def make_response(blocks: List[bytes]) -> httpx.Response:
+    async def stream():
+        for block in blocks:
+            yield block
+    return httpx.Response(200, content=stream())
+
+
+async def legacy_decode(response: httpx.Response) -> str:
+    """The per-line loop the backend used before SSEDecoder."""
+    full_content = ""
+    async for line_str in response.aiter_lines():
+        if line_str.startswith('data: '):
+            data_str = line_str[6:]
+            if data_str.strip() == '[DONE]':
+                break
+            try:
+                chunk = json.loads(data_str)
+                if 'choices' in chunk and len(chunk['choices']) > 0:
+                    delta = chunk['choices'][0].get('delta', {})
+                    if 'content' in delta:
+                        full_content += delta['content']
+            except json.JSONDecodeError:
+                continue
+    return full_content
+
+
+async def decoder_decode(response: httpx.Response) -> str:
+    decoder = SSEDecoder()
+    async for data in response.aiter_bytes():
+        decoder.feed(data)
+        if decoder.done:
+            break
+    return decoder.text
+
+
+async def measure(decode, blocks: List[bytes], runs: int) -> List[float]:
+    timings = []
+    for _ in range(runs):
+        response = make_response(blocks)
+        start = time.perf_counter()
+        await decode(response)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def run(tokens: int, runs: int):
+    body = build_body(tokens)
+    blocks = split_blocks(body)
+
+    legacy_text = await legacy_decode(make_response(blocks))
+    decoder_text = await decoder_decode(make_response(blocks))
+    if legacy_text != decoder_text:
+        raise SystemExit("Decoders disagree on the decoded text")
+
+    print(f"{tokens} tokens, {len(body):,} bytes in {len(blocks)} blocks, {runs} runs, "
+          f"JSON parser: {'orjson' if orjson is not None else 'json'}")
+    print(f"{'decoder':<14}{'median ms':>12}{'p95 ms':>10}{'us/token':>10}")
+    results = {}
+    for name, decode in (("legacy loop", legacy_decode), ("SSEDecoder", decoder_decode)):
+        timings = sorted(await measure(decode, blocks, runs))
+        median = timings[len(timings) // 2]
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        results[name] = median
+        print(f"{name:<14}{median * 1000:>12.2f}{p95 * 1000:>10.2f}{median / tokens * 1e6:>10.2f}")
+    print(f"speedup: {results['legacy loop'] / results['SSEDecoder']:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.tokens, args.runs))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
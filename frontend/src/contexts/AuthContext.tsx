@@ -5,6 +5,7 @@ import {
   useEffect,
   ReactNode,
 } from "react";
+import { authApi } from "../services/authApi";
 
 interface User {
   id: number;
@@ -50,6 +51,14 @@ export function AuthProvider({ children }: { children: ReactNode }) {
       try {
         setToken(storedToken);
         setUser(JSON.parse(storedUser));
+        // Uploaded picture URLs are signed and expire; refresh the stored user
+        authApi
+          .getCurrentUser(storedToken)
+          .then((freshUser: User) => {
+            setUser(freshUser);
+            localStorage.setItem(USER_KEY, JSON.stringify(freshUser));
+          })
+          .catch(() => {});
       } catch (e) {
         console.error("Failed to parse stored user:", e);
         localStorage.removeItem(TOKEN_KEY);
@@ -397,7 +397,7 @@ function AddReportPage() {
             </button>
             {extractedData?.image_url || imagePreview ? (
               <img
-                src={imagePreview || extractedData?.image_url || ""}
+                src={imagePreview || extractedData?.image_src || ""}
                 alt="Full size"
                 style={styles.modalImage}
                 onLoad={() => console.log("Image loaded successfully in modal")}
@@ -405,7 +405,7 @@ function AddReportPage() {
                   console.error("Image failed to load in modal");
                   console.error(
                     "Attempted URL:",
-                    imagePreview || extractedData?.image_url
+                    imagePreview || extractedData?.image_src
                   );
                 }}
               />
@@ -483,6 +483,11 @@ function AddReportPage() {
                   <span style={styles.icdBadge}>
                     {extractedData.disease_icd_code}
                   </span>
+                  {extractedData.disease_icd_code_verified === false && (
+                    <span style={styles.icdUnverified}>
+                      Not in ICD-10 table, check the document
+                    </span>
+                  )}
                 </div>
               )}
               {extractedData.medicine_name && (
@@ -838,6 +843,11 @@ const styles: Record<string, React.CSSProperties> = {
     fontSize: "0.9rem",
     fontWeight: "500",
   },
+  icdUnverified: {
+    color: "#E65100",
+    fontSize: "0.8rem",
+    marginLeft: "8px",
+  },
   textAreaContainer: {
     display: "flex",
     flexDirection: "column",
@@ -25,9 +25,10 @@ const getProfileImageUrl = (picture?: string) => {
   if (picture.startsWith("http://") || picture.startsWith("https://")) {
     return picture;
   }
-  // If it's a relative path (uploaded image), prepend backend URL
+  // If it's a relative path (signed URL of an uploaded image), prepend backend
+  // URL and ask for a resized variant; the avatar is displayed at 96px
   if (picture.startsWith("/uploads/")) {
-    return `${BACKEND_BASE_URL}${picture}`;
+    return `${BACKEND_BASE_URL}${picture}${picture.includes("?") ? "&" : "?"}w=320`;
   }
   return picture;
 };
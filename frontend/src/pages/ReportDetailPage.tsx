@@ -274,14 +274,14 @@ ${
             {/* Modal Content */}
             <div className="flex-1 overflow-y-auto p-4">
               {/* Original Image */}
-              {report.image_url && (
+              {report.image_src && (
                 <div className="mb-6">
                   <h3 className="text-sm font-semibold text-gray-500 mb-3 uppercase tracking-wide">
                     Original Document
                   </h3>
                   <div className="bg-gray-100 rounded-xl overflow-hidden">
                     <img
-                      src={`${BACKEND_BASE_URL}${report.image_url}`}
+                      src={`${BACKEND_BASE_URL}${report.image_src}&w=1280`}
                       alt="Original Report"
                       className="w-full max-h-[300px] object-contain"
                     />
@@ -207,7 +207,7 @@ export const authApi = {
 
   async getCurrentUser(token: string) {
     const apiBaseUrl = getApiBaseUrlDynamic();
-    const response = await fetch(`${apiBaseUrl}/auth/me`, {
+    const response = await fetch(`${apiBaseUrl}/users/me`, {
       headers: {
         Authorization: `Bearer ${token}`,
       },
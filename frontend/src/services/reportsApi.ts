@@ -62,9 +62,11 @@ export interface ExtractedReport {
   report_type: ReportType | null; // Detected report type from image analysis
   disease_name: string | null;
   disease_icd_code: string | null;
+  disease_icd_code_verified: boolean | null; // false: well-formed code missing from the ICD-10 table
   medicine_name: string | null;
   full_description: string | null;
   image_url: string | null; // URL where the uploaded image is saved on server
+  image_src: string | null; // Short-lived signed URL to display the image with
 }
 
 export interface SavedReport {
@@ -72,6 +74,7 @@ export interface SavedReport {
   report_type: ReportType;
   disease_name: string | null;
   disease_icd_code: string | null;
+  disease_icd_code_verified: boolean | null;
   medicine_name: string | null;
   full_description: string | null;
   translated_text: string | null;
@@ -79,6 +82,7 @@ export interface SavedReport {
   target_language: string;
   created_at: string;
   image_url?: string;
+  image_src?: string; // Short-lived signed URL to display the image with
 }
 
 export const reportsApi = {